@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from log_config import main_logger as logger
+
+
+class AsyncBridge(QObject):
+    """
+    Qt 与 asyncio 之间的桥
+
+    asyncio 事件循环运行在一个专用线程中，所有异步设备操作都在这一个线程上并发执行。
+    GUI 线程通过 submit() 提交协程；完成回调经信号回到创建本对象的线程（GUI 线程）执行，
+    回调中可以直接操作控件。
+    """
+
+    # (回调, 结果, 异常)
+    __done = pyqtSignal(object, object, object)
+
+    def __init__(self):
+        super().__init__()
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__thread: Optional[threading.Thread] = None
+        self.__ready = threading.Event()
+        self.__done.connect(self.__deliver)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self.__loop is None:
+            raise RuntimeError("Async bridge is not started")
+        return self.__loop
+
+    def start(self):
+        """启动事件循环线程"""
+        if self.__thread is not None:
+            return
+        self.__thread = threading.Thread(target=self.__run,
+                                         name="asyncio-loop",
+                                         daemon=True)
+        self.__thread.start()
+        self.__ready.wait()
+
+    def __run(self):
+        self.__loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.__loop)
+        self.__ready.set()
+        try:
+            self.__loop.run_forever()
+        finally:
+            self.__loop.close()
+
+    def submit(self,
+               coro: Awaitable,
+               callback: Optional[Callable[[Any, Optional[BaseException]],
+                                           None]] = None) -> Future:
+        """
+        在事件循环中执行协程
+
+        Args:
+            coro: 协程
+            callback: 完成后在 GUI 线程调用 callback(结果, 异常)，成功时异常为 None
+
+        Returns:
+            Future: concurrent.futures.Future，可在其他线程中等待
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if callback is not None:
+            future.add_done_callback(
+                lambda f: self.__done.emit(callback, *self.__outcome(f)))
+        return future
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """阻塞等待协程结果（不要在 GUI 线程中等待耗时操作）"""
+        return self.submit(coro).result(timeout)
+
+    def gather(self, coros: Iterable[Awaitable],
+               timeout: Optional[float] = None) -> List[Any]:
+        """并发执行多个协程并阻塞等待，异常作为结果返回"""
+
+        async def _gather():
+            return await asyncio.gather(*coros, return_exceptions=True)
+
+        return self.run(_gather(), timeout)
+
+    @staticmethod
+    def __outcome(future: Future):
+        if future.cancelled():
+            return None, asyncio.CancelledError()
+        exception = future.exception()
+        if exception is not None:
+            return None, exception
+        return future.result(), None
+
+    def __deliver(self, callback, result, exception):
+        try:
+            callback(result, exception)
+        except Exception as ex:
+            logger.error(f"Async callback failed: {ex}")
+
+    def stop(self, timeout: float = 5.0):
+        """停止事件循环并等待线程退出"""
+        if self.__thread is None:
+            return
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join(timeout)
+        self.__thread = None
+        self.__loop = None
+        self.__ready.clear()
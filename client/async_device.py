@@ -0,0 +1,112 @@
+import asyncio
+import os
+import time
+
+from async_transport import (AsyncTCPTransport, AsyncUDPTransport,
+                             AsyncUnixStreamTransport)
+from log_config import main_logger as logger
+from protocol import Protocol
+from transport_strategy import AsyncTransportStrategy
+from unix_transport import unix_socket_path
+
+
+class AsyncDevice:
+    """
+    Device 的异步版本，所有收发都是协程
+
+    同一事件循环中可以同时操作成百上千个设备，不再需要每个操作一个线程。
+    同一设备的 发送+接收 由 asyncio.Lock 串行化，避免应答被其他操作取走。
+    """
+
+    def __init__(self, ip, port, name):
+        self.__ip = ip
+        self.__port = port
+        self.__name = name
+        self.__protocol_type = os.environ.get("PROTOCOL_TYPE", "udp").lower()
+        self.__failed = 0
+        self.__last_success_ns = 0
+        # 协程锁必须在事件循环中创建，首次收发时再创建
+        self.__lock = None
+
+        if self.__protocol_type == 'tcp':
+            self.__transport: AsyncTransportStrategy = AsyncTCPTransport(
+                ip, port, name)
+        elif self.__protocol_type == 'udp':
+            self.__transport: AsyncTransportStrategy = AsyncUDPTransport(
+                ip, port, name)
+        elif self.__protocol_type == 'unix':
+            self.__transport: AsyncTransportStrategy = AsyncUnixStreamTransport(
+                unix_socket_path(port), name)
+        else:
+            raise ValueError(
+                f"Unsupported async protocol type: {self.__protocol_type}")
+
+    @property
+    def failed(self):
+        return self.__failed
+
+    @property
+    def connected(self):
+        return self.__transport.connected
+
+    @property
+    def name(self):
+        return self.__name
+
+    def idle_seconds(self) -> float:
+        """距上次成功收发的秒数"""
+        if not self.__last_success_ns:
+            return float("inf")
+        return (time.monotonic_ns() - self.__last_success_ns) / 1e9
+
+    async def connect(self):
+        """委托给传输策略"""
+        self.__last_success_ns = 0
+        await self.__transport.connect()
+
+    async def disconnect(self):
+        """委托给传输策略"""
+        self.__last_success_ns = 0
+        await self.__transport.disconnect()
+
+    async def send_heartbeat(self):
+        await self.send(Protocol.heartbeat())
+
+    async def send_set_voltage(self, voltage):
+        msg = Protocol.set_voltage(voltage)
+        logger.info(f"Send set voltage: {msg}")
+        await self.send(msg)
+
+    async def send_multi_voltage(self, voltages):
+        msg = Protocol.set_fixed_voltage(voltages)
+        logger.info(f"Send set multi voltage: {msg}")
+        await self.send(msg)
+
+    async def send_fixed_frame(self, frame):
+        """发送预编译的全量电压帧"""
+        await self.send(bytes(frame))
+
+    async def send(self, packet):
+        """发送数据包并接收响应"""
+        if isinstance(packet, bytearray):
+            packet = bytes(packet)
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        try:
+            async with self.__lock:
+                await self.__transport.send(packet)
+                response = await self.__transport.recv()
+            self.__last_success_ns = time.monotonic_ns()
+            return response
+        except asyncio.TimeoutError:
+            logger.warning(f"[{self.__name}] Receive timeout after send")
+            raise
+        except Exception as ex:
+            logger.error(f"[{self.__name}] Send/recv error: {ex}")
+            raise
+
+    def failed_incr(self):
+        self.__failed += 1
+
+    def failed_reset(self):
+        self.__failed = 0
@@ -0,0 +1,162 @@
+import asyncio
+from typing import Optional, Tuple
+
+from log_config import main_logger as logger
+from transport_strategy import AsyncTransportStrategy
+
+
+class AsyncTCPTransport(AsyncTransportStrategy):
+    """基于 asyncio.open_connection 的 TCP 传输策略"""
+
+    def __init__(self, ip: str, port: int, name: str, timeout: float = 5.0):
+        self._ip = ip
+        self._port = port
+        self._name = name
+        self._timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = False
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.open_connection(self._ip, self._port)
+
+    @property
+    def _address(self) -> str:
+        return f"{self._ip}:{self._port}"
+
+    async def connect(self) -> None:
+        """建立 TCP 连接"""
+        if self._connected:
+            return
+
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                self._open(), self._timeout)
+            self._connected = True
+            logger.info(f"[ASYNC] Device {self._name} connected to "
+                        f"{self._address}")
+        except asyncio.TimeoutError:
+            logger.error(f"[ASYNC] Connection timeout to {self._address}")
+            raise
+        except Exception as ex:
+            logger.error(f"[ASYNC] Connection failed to {self._address}: {ex}")
+            raise
+
+    async def disconnect(self) -> None:
+        """断开 TCP 连接"""
+        self._connected = False
+        if self._writer is None:
+            return
+        try:
+            self._writer.close()
+            await self._writer.wait_closed()
+            logger.info(f"[ASYNC] Device {self._name} disconnected")
+        except Exception as ex:
+            logger.warning(f"[ASYNC] Disconnect error: {ex}")
+        finally:
+            self._reader = self._writer = None
+
+    async def send(self, packet: bytes) -> None:
+        """发送数据包"""
+        if self._writer is None:
+            raise RuntimeError("Socket not connected")
+        self._writer.write(packet)
+        await self._writer.drain()
+
+    async def recv(self, buffer_size: int = 1024) -> bytes:
+        """接收数据包，超时抛出 asyncio.TimeoutError"""
+        if self._reader is None:
+            raise RuntimeError("Socket not connected")
+        return await asyncio.wait_for(self._reader.read(buffer_size),
+                                      self._timeout)
+
+    @property
+    def connected(self) -> bool:
+        """连接状态"""
+        return self._connected
+
+
+class AsyncUnixStreamTransport(AsyncTCPTransport):
+    """基于 asyncio.open_unix_connection 的 Unix 流套接字传输策略"""
+
+    def __init__(self, path: str, name: str, timeout: float = 5.0):
+        super().__init__("", 0, name, timeout)
+        self._path = path
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.open_unix_connection(self._path)
+
+    @property
+    def _address(self) -> str:
+        return self._path
+
+
+class _DatagramQueue(asyncio.DatagramProtocol):
+    """把收到的数据报放入队列"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue()
+
+    def datagram_received(self, data: bytes, addr):
+        self.queue.put_nowait(data)
+
+    def error_received(self, exc: Exception):
+        logger.warning(f"[ASYNC_UDP] {self.name} socket error: {exc}")
+
+
+class AsyncUDPTransport(AsyncTransportStrategy):
+    """基于 DatagramProtocol 的 UDP 传输策略"""
+
+    def __init__(self, ip: str, port: int, name: str, timeout: float = 2.0):
+        self._ip = ip
+        self._port = port
+        self._name = name
+        self._timeout = timeout
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._protocol: Optional[_DatagramQueue] = None
+        self._connected = False
+
+    async def connect(self) -> None:
+        """创建 UDP 端点（UDP 是无连接协议，只确定对端地址）"""
+        if self._connected:
+            return
+
+        loop = asyncio.get_running_loop()
+        self._transport, self._protocol = await loop.create_datagram_endpoint(
+            lambda: _DatagramQueue(self._name),
+            remote_addr=(self._ip, self._port))
+        self._connected = True
+        logger.info(f"[ASYNC_UDP] Device {self._name} ready to communicate "
+                    f"with {self._ip}:{self._port}")
+
+    async def disconnect(self) -> None:
+        """关闭 UDP 端点"""
+        self._connected = False
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+            logger.info(f"[ASYNC_UDP] Device {self._name} socket closed")
+
+    async def send(self, packet: bytes) -> None:
+        """发送数据包（UDP 不保证送达）"""
+        if self._transport is None:
+            raise RuntimeError("Socket not connected")
+        self._transport.sendto(packet)
+
+    async def recv(self, buffer_size: int = 1024) -> bytes:
+        """接收一个数据报，超时抛出 asyncio.TimeoutError"""
+        if self._protocol is None:
+            raise RuntimeError("Socket not connected")
+        try:
+            data = await asyncio.wait_for(self._protocol.queue.get(),
+                                          self._timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[ASYNC_UDP] Receive timeout from {self._name}")
+            raise
+        return data[:buffer_size]
+
+    @property
+    def connected(self) -> bool:
+        """连接状态"""
+        return self._connected
@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from log_config import main_logger as logger
+from metrics import metrics_registry
+from task import Task
+
+
+class CommandQueue:
+    """
+    单个设备的命令队列
+
+    同一命令只保留最新的一条待发送任务（电压设置只有最后的值有意义），
+    与正在发送的任务数据相同的新任务直接丢弃。队列由一个排空任务串行发送，
+    保证同一设备同一时刻只有一条命令在途。
+    """
+
+    def __init__(self, device_name: str):
+        self.device_name = device_name
+        self.__lock = threading.Lock()
+        self.__pending: "OrderedDict[str, Task]" = OrderedDict()
+        self.__in_flight: Optional[Task] = None
+        self.__draining = False
+        self.stats = {
+            "submitted": 0,
+            "sent": 0,
+            "coalesced": 0,
+            "deduplicated": 0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return len(self.__pending)
+
+    def submit(self, task: Task) -> bool:
+        """
+        提交任务
+
+        Returns:
+            bool: 是否需要启动新的排空任务
+        """
+        with self.__lock:
+            self.stats["submitted"] += 1
+            superseded = self.__pending.pop(task.cmd, None)
+            if superseded is not None:
+                self.__count("coalesced")
+            in_flight = self.__in_flight
+            if (in_flight is not None and in_flight.cmd == task.cmd
+                    and in_flight.data == task.data):
+                # 在途的命令已经会把设备设置为这个值
+                self.__count("deduplicated")
+                return False
+            self.__pending[task.cmd] = task
+            if self.__draining:
+                return False
+            self.__draining = True
+            return True
+
+    def drain(self, send: Callable[[Task], object]):
+        """依次发送待发送任务，直到队列为空"""
+        while True:
+            with self.__lock:
+                if not self.__pending:
+                    self.__draining = False
+                    return
+                _, task = self.__pending.popitem(last=False)
+                self.__in_flight = task
+            try:
+                send(task)
+                self.stats["sent"] += 1
+            except Exception as ex:
+                logger.error(f"[{self.device_name}] Send {task.cmd} "
+                             f"failed: {ex}")
+            finally:
+                with self.__lock:
+                    self.__in_flight = None
+
+    def __count(self, name: str):
+        self.stats[name] += 1
+        metrics_registry.incr(f"command_queue.{name}", self.device_name)
+
+
+class CommandQueues:
+    """按设备管理命令队列，排空任务交给线程池执行"""
+
+    def __init__(self, send: Callable[[Task], object],
+                 start: Callable[[Callable[[], None]], None]):
+        """
+        Args:
+            send: 发送单个任务的函数（在线程池中调用）
+            start: 在线程池中执行无参函数，如 QThreadPool.start
+        """
+        self.__send = send
+        self.__start = start
+        self.__lock = threading.Lock()
+        self.__queues: Dict[str, CommandQueue] = {}
+
+    def get(self, device_name: str) -> CommandQueue:
+        with self.__lock:
+            queue = self.__queues.get(device_name)
+            if queue is None:
+                queue = CommandQueue(device_name)
+                self.__queues[device_name] = queue
+            return queue
+
+    def submit(self, task: Task):
+        """提交任务到所属设备的队列，必要时启动排空任务"""
+        queue = self.get(task.device_name)
+        if queue.submit(task):
+            self.__start(lambda: queue.drain(self.__send))
+        else:
+            logger.debug(f"[{task.device_name}] {task.cmd} {task.data} "
+                         f"merged into queued command")
+
+    def get_stats(self) -> Dict[str, Dict]:
+        with self.__lock:
+            queues = list(self.__queues.values())
+        return {queue.device_name: dict(queue.stats) for queue in queues}
@@ -1,4 +1,5 @@
-from typing import Dict
+import threading
+from typing import Dict, List
 
 from device import Device
 
@@ -7,17 +8,27 @@ class Controller:
 
     def __init__(self):
         self.devices: Dict[str, Device] = {}
+        # 连接线程池、设备检查线程和 GUI 线程都会增删设备
+        self.__lock = threading.Lock()
 
     def add_device(self, ip, port, name):
-        if self.devices.get(name):
-            return
-        device = Device(ip, port, name)
-        self.devices.update({name: device})
-        return device
+        with self.__lock:
+            if self.devices.get(name):
+                return
+            device = Device(ip, port, name)
+            self.devices.update({name: device})
+            return device
 
     def get_device(self, name):
-        return self.devices.get(name)
+        with self.__lock:
+            return self.devices.get(name)
 
     def remove_device(self, name):
-        if self.devices.get(name):
-            del self.devices[name]
+        with self.__lock:
+            if self.devices.get(name):
+                del self.devices[name]
+
+    def all_devices(self) -> List[Device]:
+        """当前全部设备的快照，可在其他线程增删设备时遍历"""
+        with self.__lock:
+            return list(self.devices.values())
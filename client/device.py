@@ -1,11 +1,15 @@
 import os
 import socket
 
+from frame_cache import CompiledSchedule
+from impairment import ImpairedTransport, profile_for_device
+from io_scheduler import IOScheduler
 from log_config import main_logger as logger
-from protocol import Protocol
+from protocol import Protocol, ProtocolHeader
 from tcp_transport import TCPTransport
 from transport_strategy import TransportStrategy
 from udp_transport import UDPTransport
+from unix_transport import UnixDatagramTransport, UnixStreamTransport
 
 
 class Device:
@@ -16,16 +20,36 @@ class Device:
         self.__name = name
         self.__protocol_type = os.environ.get("PROTOCOL_TYPE", "udp").lower()
         self.__failed = 0
+        # 串行化套接字访问，心跳走优先通道；成功的交互即证明设备存活
+        self.__io = IOScheduler()
+        # 增量电压帧：记录设备上一帧的电压，每隔若干帧发送一次全量帧用于纠正
+        self.__delta_enabled = os.environ.get("DELTA_ENCODING", "0") == "1"
+        self.__keyframe_interval = int(
+            os.environ.get("DELTA_KEYFRAME_INTERVAL", 100))
+        self.__last_frame = None
+        self.__frames_since_keyframe = 0
 
         # 根据协议类型创建传输策略
         if self.__protocol_type == 'tcp':
             self.__transport: TransportStrategy = TCPTransport(ip, port, name)
         elif self.__protocol_type == 'udp':
             self.__transport: TransportStrategy = UDPTransport(ip, port, name)
+        elif self.__protocol_type == 'unix':
+            self.__transport: TransportStrategy = UnixStreamTransport(
+                ip, port, name)
+        elif self.__protocol_type == 'unix_dgram':
+            self.__transport: TransportStrategy = UnixDatagramTransport(
+                ip, port, name)
         else:
             raise ValueError(
                 f"Unsupported protocol type: {self.__protocol_type}")
 
+        # 链路损伤注入（IMPAIRMENT / IMPAIRMENT_<设备名> 环境变量）
+        profile = profile_for_device(name)
+        if profile:
+            self.__transport = ImpairedTransport(self.__transport, profile,
+                                                 name)
+
     @property
     def failed(self):
         return self.__failed
@@ -38,17 +62,30 @@ class Device:
     def name(self):
         return self.__name
 
+    @property
+    def address(self):
+        """设备的单播地址 (ip, port)，用于对应组播应答"""
+        return self.__ip, self.__port
+
+    def idle_seconds(self) -> float:
+        """距上次成功收发的秒数"""
+        return self.__io.idle_seconds()
+
     def connect(self):
         """委托给传输策略"""
+        self.__last_frame = None
+        self.__io.reset()
         self.__transport.connect()
 
     def disconnect(self):
         """委托给传输策略"""
+        self.__last_frame = None
+        self.__io.reset()
         self.__transport.disconnect()
 
     def send_heartbeat(self):
         msg = Protocol.heartbeat()
-        self.send(msg)
+        self.send(msg, priority=True)
 
     def send_set_voltage(self, voltage):
         msg = Protocol.set_voltage(voltage)
@@ -56,17 +93,57 @@ class Device:
         self.send(msg)
 
     def send_multi_voltage(self, voltages):
-        msg = Protocol.set_fixed_voltage(voltages)
-        logger.info(f"Send set multi voltage: {msg}")
-        self.send(msg)
-
-    def send(self, packet):
-        """发送数据包并接收响应"""
+        if not self.__delta_enabled:
+            msg = Protocol.set_fixed_voltage(voltages)
+            logger.info(f"Send set multi voltage: {msg}")
+            self.send(msg)
+            return
+
+        previous = self.__last_frame
+        if self.__frames_since_keyframe >= self.__keyframe_interval:
+            previous = None
+        msg = Protocol.set_delta_voltage(voltages, previous)
+        logger.info(f"Send set multi voltage ({len(msg)} bytes): {msg}")
+        try:
+            self.send(msg)
+        except Exception:
+            # 不确定设备是否收到，下一帧发送全量帧
+            self.__last_frame = None
+            raise
+        self.__last_frame = list(voltages)
+        if msg[:2] == ProtocolHeader.set_fixed_voltage:
+            self.__frames_since_keyframe = 0
+        else:
+            self.__frames_since_keyframe += 1
+
+    def send_fixed_frame(self, frame):
+        """
+        发送预编译的全量电压帧（memoryview，直接交给传输层，不再校验和编码）
+
+        启用增量帧时取出帧中的电压按上一帧重新编码
+        """
+        if self.__delta_enabled:
+            self.send_multi_voltage(CompiledSchedule.voltages(frame))
+            return
+        logger.debug(f"Send compiled frame ({len(frame)} bytes)")
+        self.send(frame)
+
+    def send(self, packet, priority=False):
+        """
+        发送数据包并接收响应
+
+        Args:
+            packet: 数据包
+            priority: 是否走优先通道（心跳）
+        """
         if isinstance(packet, bytearray):
             packet = bytes(packet)
         try:
-            self.__transport.send(packet)
-            return self.recv()
+            with self.__io.lane(priority):
+                self.__transport.send(packet)
+                response = self.recv()
+            self.__io.mark_alive()
+            return response
         except socket.timeout:
             logger.warning(f"[{self.__name}] Receive timeout after send")
             raise
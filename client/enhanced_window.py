@@ -1,43 +1,96 @@
+import os
 import time
 from typing import Dict
 
-from PyQt5.QtCore import Qt, QThreadPool, pyqtSlot
+from PyQt5.QtCore import Qt, QThreadPool, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QCloseEvent
 from PyQt5.QtWidgets import (QAction, QFrame, QHBoxLayout, QLabel, QLineEdit,
-                             QMainWindow, QMessageBox, QSizePolicy, QSpinBox,
-                             QVBoxLayout, QWidget)
+                             QMainWindow, QMessageBox, QPushButton,
+                             QSizePolicy, QSpinBox, QVBoxLayout, QWidget)
 
+from command_queue import CommandQueues
 from common import BtnToDeviceMap, ButtonNames, Commands, DeviceEnums
 from controller import Controller
+from frame_cache import FrameCache
 from heartbeat_thread import HeartbeatThread
+from io_backend import BackendError, IOBackendProxy
 from log_config import LoggerFactory
 from log_config import main_logger as logger
+from metrics import MetricsExporter, metrics_registry
+from multicast_transport import MulticastTransport, multicast_set_voltage
+from pacer import FramePacer
+from playback import SyncPlayback
+from recorder import FrameRecorder, SpeedTestResult
 from task import Task
-from timing import simple_timer
+from timing import timed
 from utils.styles import get_enhanced_styles
 from widgets.button_panel import ButtonPanel
 from widgets.log_widget import LogWidget
+from widgets.metrics_panel import MetricsPanel
 from widgets.section_widget import SectionWidget
-from worker import BatchWorker
+from widgets.speed_test_panel import SpeedTestPanel
+from worker import BatchWorker, ConnectSignals, ConnectWorker
+
+# 后端断开设备的最长等待时间（秒）
+BACKEND_DISCONNECT_TIMEOUT = 10
 
 
 class EnhancedWindow(QMainWindow):
     """增强版本，添加更多功能"""
 
+    # 设备检查线程发现断开的设备、后端断开完成，经信号回到 GUI 线程更新标题
+    device_changed = pyqtSignal(str, bool)
+
     def __init__(self):
         super().__init__()
         # 创建4个部分，使用自定义部件
         self.__sections: Dict[str, SectionWidget] = {}
         self.__controller = Controller()
         self.__thread_pool = QThreadPool()
-        self.__heartbeat_thread = HeartbeatThread()
-        self.__heartbeat_thread.start()
+        # IO_BACKEND=process 时设备、套接字和心跳都在独立的后端进程中
+        self.__backend = None
+        self.__heartbeat_thread = None
+        if os.environ.get("IO_BACKEND", "thread") == "process":
+            self.__backend = IOBackendProxy()
+            self.__backend.start()
+        else:
+            self.__heartbeat_thread = HeartbeatThread()
+            self.__heartbeat_thread.start()
         self.__thread_pool.setMaxThreadCount(10)
+        # 连接使用独立的线程池：设备检查线程常驻占用主线程池的一个线程，
+        # Speed Test 等任务也不能让 Connect All 排队
+        self.__connect_pool = QThreadPool()
+        self.__connect_pool.setMaxThreadCount(len(DeviceEnums))
+        self.__connecting = set()
+        # 电压设置按设备排队：合并被覆盖的设置，丢弃与在途命令相同的设置
+        self.__command_queues = CommandQueues(self.__send_single_device_task,
+                                              self.__thread_pool.start)
         self.__log_widget = LogWidget()
+        # 连接在线程池中进行，结果经信号回到 GUI 线程更新标题
+        self.__connect_signals = ConnectSignals()
+        self.__connect_signals.finished.connect(self.__on_connect_finished)
         self.__button_panel = ButtonPanel(self.__on_send_cmd)
         self.__check_device_running = True
+        self.__metrics_exporter = None
+        self.__frame_cache = FrameCache()
+        # 设置 MULTICAST_GROUP 后 Set All 用一个组播数据报发给所有设备
+        self.__multicast = (None if self.__backend else
+                            MulticastTransport.from_env())
+        self.__init_metrics()
         self.__init()
 
+    def __init_metrics(self):
+        """初始化延迟指标注册表与定期导出"""
+        metrics_registry.enabled = os.environ.get("METRICS_ENABLED",
+                                                  "1") == "1"
+        export_path = os.environ.get("METRICS_EXPORT_PATH")
+        # 使用后端进程时由后端导出设备指标
+        if metrics_registry.enabled and export_path and not self.__backend:
+            self.__metrics_exporter = MetricsExporter(
+                metrics_registry, export_path,
+                float(os.environ.get("METRICS_EXPORT_INTERVAL", 10)))
+            self.__metrics_exporter.start()
+
     def __init(self):
         self.setWindowTitle('上位机程序')
         self.setGeometry(100, 100, 1600, 700)
@@ -65,18 +118,28 @@ class EnhancedWindow(QMainWindow):
 
         # 设置样式
         self.setStyleSheet(get_enhanced_styles())
-        self.__thread_pool.start(self.__check_device)
+        self.device_changed.connect(self.__on_device_changed)
+        if self.__backend:
+            self.__backend.device_changed.connect(self.__on_device_changed)
+            self.__backend.log_received.connect(self.__log_widget.write)
+        else:
+            self.__thread_pool.start(self.__check_device)
+
+    def __on_device_changed(self, name, connected):
+        """后端或设备检查线程报告设备状态变化"""
+        section = self.__sections.get(name)
+        if section:
+            section.update_title(connected)
 
     def __check_device(self):
         while self.__check_device_running:
-            devices = list(self.__controller.devices.values())
-            for device in devices:
-                if device.connected:
+            for device in self.__controller.all_devices():
+                # 正在连接的设备尚未连上，不能当作断开移除
+                if device.connected or device.name in self.__connecting:
                     continue
                 self.__heartbeat_thread.remove_device(device)
                 self.__controller.remove_device(device.name)
-                section = self.__sections.get(device.name)
-                section.update_title(False)
+                self.device_changed.emit(device.name, False)
                 logger.info(
                     f"Device removed due to disconnection: {device.name}")
             time.sleep(5)
@@ -85,6 +148,7 @@ class EnhancedWindow(QMainWindow):
         """初始化板卡列表部分."""
         a_container = QFrame()
         a_container.setFrameStyle(QFrame.Box | QFrame.Raised)
+        a_outer = QVBoxLayout()
         a_layout = QHBoxLayout()
 
         for name in DeviceEnums:
@@ -95,8 +159,13 @@ class EnhancedWindow(QMainWindow):
             )
             a_layout.addWidget(section)
             self.__sections.update({name: section})
+        a_outer.addLayout(a_layout)
 
-        a_container.setLayout(a_layout)
+        connect_all = QPushButton("Connect All")
+        connect_all.clicked.connect(self.__connect_all)
+        a_outer.addWidget(connect_all)
+
+        a_container.setLayout(a_outer)
         main.addWidget(a_container, 3)
         logger.info("Create 4 device sections in area A.")
 
@@ -120,6 +189,15 @@ class EnhancedWindow(QMainWindow):
         self.__button_panel.add_speed_test_area()
         b_layout.addWidget(self.__button_panel)
 
+        # ---------- 延迟指标面板 ----------
+        self.__metrics_panel = MetricsPanel(
+            self.__backend.metrics if self.__backend else metrics_registry)
+        b_layout.addWidget(self.__metrics_panel)
+
+        # ---------- Speed Test 结果面板 ----------
+        self.__speed_test_panel = SpeedTestPanel()
+        b_layout.addWidget(self.__speed_test_panel)
+
         b_layout.addStretch(1)
 
         b_container.setLayout(b_layout)
@@ -129,6 +207,11 @@ class EnhancedWindow(QMainWindow):
 
     def __disconnect(self, name):
         """断开连接事件"""
+        if self.__backend:
+            # 后端可能正忙或套接字无响应，在线程池中等待结果，不阻塞界面
+            self.__connect_pool.start(
+                lambda: self.__run_backend_disconnect(name))
+            return False
         device = self.__controller.get_device(name)
         if device:
             self.__heartbeat_thread.remove_device(device)
@@ -138,8 +221,53 @@ class EnhancedWindow(QMainWindow):
         else:
             logger.info(f"Device not connected: {name}")
 
+    def __run_backend_disconnect(self, name):
+        """后端断开设备（线程池中执行）"""
+        try:
+            self.__backend.call("disconnect", name,
+                                timeout=BACKEND_DISCONNECT_TIMEOUT)
+        except BackendError as ex:
+            logger.error(f"Disconnect {name} failed: {ex}")
+        self.device_changed.emit(name, False)
+
     def __connect_device(self, ip, port, name):
-        """连接事件"""
+        """连接事件：在线程池中连接，不阻塞界面；同一设备同时只有一个连接"""
+        if name in self.__connecting:
+            logger.info(f"Device is already connecting: {name}")
+            return
+        self.__connecting.add(name)
+        self.__connect_pool.start(
+            ConnectWorker(self.__open_device, ip, port, name,
+                          self.__connect_signals))
+
+    def __connect_all(self):
+        """同时连接所有已填写地址且未连接的设备，总耗时取决于最慢的一个"""
+        for name, section in self.__sections.items():
+            try:
+                address = section.address()
+            except ValueError:
+                continue
+            if address is None:
+                continue
+            if name in self.__connecting:
+                continue
+            device = self.__controller.get_device(name)
+            if device is not None and device.connected:
+                continue
+            section.set_connecting()
+            self.__connect_device(*address, str(name))
+
+    def __on_connect_finished(self, name, connected, error):
+        """连接完成（GUI 线程）"""
+        self.__connecting.discard(name)
+        section = self.__sections.get(name)
+        if section:
+            section.update_title(connected, error)
+
+    def __open_device(self, ip, port, name):
+        """建立连接（线程池中执行）"""
+        if self.__backend:
+            return self.__backend.call("connect", ip, port, name)
         self.__controller.add_device(ip, port, name)
         device = self.__controller.get_device(name)
         if device is None:
@@ -148,7 +276,7 @@ class EnhancedWindow(QMainWindow):
         self.__heartbeat_thread.add_device(device)
         return device.connected
 
-    @simple_timer
+    @timed("on_send_cmd", device=lambda _self, cmd, name=None: name)
     def __on_send_cmd(self, cmd, name=None):
         """指令事件"""
         logger.info(f"Send {cmd} for device: {name}")
@@ -157,7 +285,7 @@ class EnhancedWindow(QMainWindow):
                 self.__handle_set_all_async()
             else:
                 task = self.__create_voltage_set_task(BtnToDeviceMap.get(name))
-                self.__send_single_device_task(task)
+                self.__command_queues.submit(task)
         elif cmd == Commands.SpeedTest:
             self.__handle_speed_test_async()
         else:
@@ -178,50 +306,157 @@ class EnhancedWindow(QMainWindow):
         return Task(Commands.SetVoltage, device_name, self.__data())
 
     def __handle_speed_test_async(self):
-        tasks = []
-        df = self.__button_panel.csv_data
-        if df is None:
+        schedule = self.__button_panel.schedule
+        if schedule is None:
             raise ValueError("No CSV data available for speed test.")
-        names = list(DeviceEnums)
-        for name in names:
-            tasks.append(self.__create_speed_test_task(name, list(df[name])))
-        worker = BatchWorker(self.__send_speed_test_task, tasks)
-        self.__thread_pool.start(worker)
+        # Speed Test 期间禁止电压设置，回放结束后由工作线程发出 busy_changed
+        self.__button_panel.set_busy(True)
+        if self.__backend:
+            self.__thread_pool.start(
+                lambda: self.__run_backend_speed_test(schedule.path))
+            return
+        self.__thread_pool.start(lambda: self.__run_speed_test(schedule))
+
+    def __run_backend_speed_test(self, path):
+        """由后端进程加载并回放，结果显示在结果面板"""
+        try:
+            summaries = self.__backend.call("speed_test", path)
+            if summaries:
+                self.__speed_test_panel.results_ready.emit(summaries)
+        except Exception as ex:
+            logger.error(f"Speed test failed: {ex}")
+        finally:
+            self.__button_panel.busy_changed.emit(False)
+
+    def __run_speed_test(self, schedule):
+        """编译（或从缓存加载）全部帧后依次发送到各设备"""
+        try:
+            try:
+                compiled = self.__frame_cache.load_or_compile(schedule)
+            except Exception as ex:
+                logger.error(f"Compile speed test frames failed: {ex}")
+                return
+            if os.environ.get("SPEED_TEST_SYNC", "1") == "1":
+                self.__run_sync_playback(compiled)
+                return
+            tasks = [
+                self.__create_speed_test_task(name, compiled)
+                for name in list(DeviceEnums)
+            ]
+            BatchWorker(self.__send_speed_test_task, tasks,
+                        self.__on_speed_test_results).run()
+        finally:
+            self.__button_panel.busy_changed.emit(False)
+
+    def __on_speed_test_results(self, results):
+        """汇总逐个设备发送的结果（未连接或失败的设备没有记录）"""
+        recorders = [r for r in results if isinstance(r, FrameRecorder)]
+        if recorders:
+            self.__publish_speed_test(recorders)
+
+    def __publish_speed_test(self, recorders):
+        """导出逐帧记录并刷新结果面板"""
+        result = SpeedTestResult(recorders)
+        summaries = result.summaries()
+        for item in summaries:
+            logger.info(f"[SpeedTest] {item['device']}: {item['ok']}/"
+                        f"{item['frames']} ok, loss {item['loss']:.2%}, "
+                        f"{item['throughput_fps']} fps, "
+                        f"p50={item['latency_p50_us']}us "
+                        f"p99={item['latency_p99_us']}us")
+        try:
+            result.export()
+        except OSError as ex:
+            logger.error(f"Export speed test results failed: {ex}")
+        self.__speed_test_panel.results_ready.emit(summaries)
+
+    def __run_sync_playback(self, compiled):
+        """所有已连接设备同步回放"""
+        devices = {}
+        for name in list(DeviceEnums):
+            device = self.__controller.get_device(name)
+            if device is None or not device.connected:
+                logger.info(f"Device not connected: {name}")
+                continue
+            devices[name] = device
+        if devices:
+            playback = SyncPlayback(devices, compiled)
+            playback.run()
+            self.__publish_speed_test(list(playback.recorders.values()))
 
     def __handle_set_all_async(self):
         """Set All"""
-        tasks = []
-        names = list(DeviceEnums)
-        for name in names:
-            tasks.append(self.__create_voltage_set_task(name))
-        worker = BatchWorker(self.__send_single_device_task, tasks)
-        self.__thread_pool.start(worker)
-
-    @simple_timer
+        voltage = self.__data()
+        if self.__backend:
+            self.__thread_pool.start(
+                lambda: self.__run_backend_set_all(voltage))
+            return
+        if self.__multicast:
+            self.__thread_pool.start(
+                lambda: self.__run_multicast_set_all(voltage))
+            return
+        for name in list(DeviceEnums):
+            self.__command_queues.submit(
+                Task(Commands.SetVoltage, name, voltage))
+
+    def __run_backend_set_all(self, voltage):
+        try:
+            self.__backend.call("set_all", voltage)
+        except Exception as ex:
+            logger.error(f"Set all failed: {ex}")
+
+    def __run_multicast_set_all(self, voltage):
+        """组播设置所有已连接设备，未应答的设备（以及未连接的设备）走单播命令队列"""
+        devices = {}
+        for name in list(DeviceEnums):
+            device = self.__controller.get_device(name)
+            if device is not None and device.connected:
+                devices[name] = device
+        try:
+            acked = set(devices) - set(
+                multicast_set_voltage(self.__multicast, devices, voltage))
+        except OSError as ex:
+            logger.error(f"Multicast set all failed: {ex}")
+            acked = set()
+        for name in list(DeviceEnums):
+            if name not in acked:
+                self.__command_queues.submit(
+                    Task(Commands.SetVoltage, name, voltage))
+
+    @timed("set_voltage", device=lambda _self, task: task.device_name)
     def __send_single_device_task(self, task: Task):
         """单个设备发送任务"""
         logger.info(
             f"Send {task.cmd} to {task.device_name} with data: {task.data}")
+        if self.__backend:
+            self.__backend.call("set_voltage", task.device_name, task.data)
+            return True
         device = self.__controller.get_device(task.device_name)
         if device is None:
-            self.__button_panel.set_busy(False)
             logger.info(f"Device not connected: {task.device_name}")
             return False
         device.send_set_voltage(task.data)
-        self.__button_panel.set_busy(False)
         return True
 
-    @simple_timer
+    @timed("speed_test", device=lambda _self, task: task.device_name)
     def __send_speed_test_task(self, task: Task):
         """Speed Test"""
         device = self.__controller.get_device(task.device_name)
         if device is None:
-            self.__button_panel.set_busy(False)
             logger.info(f"Device not connected: {task.device_name}")
             return False
-        device.send_multi_voltage(task.data)
-        self.__button_panel.set_busy(False)
-        return True
+        compiled = task.data
+        count = compiled.frame_count(task.device_name)
+        recorder = FrameRecorder.from_env(task.device_name, count)
+        try:
+            FramePacer.from_env().run(compiled.frames(task.device_name),
+                                      device.send_fixed_frame,
+                                      count,
+                                      task.device_name,
+                                      recorder=recorder)
+        except Exception as ex:
+            logger.error(f"Speed test on {task.device_name} stopped: {ex}")
+        return recorder
 
     def closeEvent(self, event: QCloseEvent):
         """窗口关闭时清理资源"""
@@ -231,11 +466,22 @@ class EnhancedWindow(QMainWindow):
         # 停止心跳线程
         if self.__heartbeat_thread:
             self.__heartbeat_thread.stop()
+        # 停止后端进程（由后端断开设备）
+        if self.__backend:
+            self.__backend.stop()
+        if self.__multicast:
+            self.__multicast.close()
+        # 停止指标导出
+        self.__metrics_panel.stop()
+        if self.__metrics_exporter:
+            self.__metrics_exporter.stop()
         # 清理线程池
+        self.__connect_pool.clear()
         self.__thread_pool.clear()
+        self.__connect_pool.waitForDone(5000)
         self.__thread_pool.waitForDone(5000)  # 等待5秒
         # 断开所有设备连接
-        for device in list(self.__controller.devices.values()):
+        for device in self.__controller.all_devices():
             device.disconnect()
         logger.info("Resources cleaned up")
         event.accept()
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import mmap
+import os
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from log_config import main_logger as logger
+from protocol import ProtocolHeader
+from schedule import Schedule
+
+
+class CompiledSchedule:
+    """
+    预编译的 Speed Test 帧：所有设备的全量电压帧连续存放在一块内存中
+
+    每个设备的帧在 blob 中连续排列，index 记录 (起始偏移, 帧数)，
+    发送时只需按帧长切出 memoryview，无需再校验和编码。
+    """
+
+    def __init__(self, blob, index: Dict[str, Tuple[int, int]],
+                 frame_size: int, key: Optional[str] = None):
+        """
+        Args:
+            blob: 帧数据（mmap 或 bytes）
+            index: {设备名: (起始偏移, 帧数)}
+            frame_size: 每帧字节数
+            key: 缓存键，未缓存时为 None
+        """
+        self.__blob = blob
+        self.__view = memoryview(blob)
+        self.index = index
+        self.frame_size = frame_size
+        self.key = key
+
+    @property
+    def size(self) -> int:
+        return len(self.__view)
+
+    def frame_count(self, device_name: str) -> int:
+        return self.index[device_name][1]
+
+    def frames(self, device_name: str) -> Iterator[memoryview]:
+        """按顺序返回设备的每一帧"""
+        offset, count = self.index[device_name]
+        size = self.frame_size
+        view = self.__view
+        for i in range(count):
+            start = offset + i * size
+            yield view[start:start + size]
+
+    @staticmethod
+    def voltages(frame: memoryview) -> np.ndarray:
+        """取出全量帧中的电压（只读视图，不复制）"""
+        header = len(ProtocolHeader.set_fixed_voltage)
+        return np.frombuffer(frame,
+                             dtype=">u2",
+                             offset=header,
+                             count=(len(frame) - header - 1) // 2)
+
+
+def compile_frames(schedule: Schedule, min_v: int, max_v: int,
+                   fixed_number: int) -> Tuple[np.ndarray, Dict[str, Tuple[
+                       int, int]], int]:
+    """
+    把电压表编译为全量电压帧
+
+    每个设备一列，每 fixed_number 行组成一帧。
+
+    Returns:
+        (帧数据 uint8 数组, 索引, 每帧字节数)
+
+    Raises:
+        ValueError: 行数不是 fixed_number 的整数倍，或电压超出范围
+    """
+    matrix = schedule.matrix
+    devices = schedule.devices
+    rows = matrix.shape[0]
+    if rows == 0 or rows % fixed_number:
+        raise ValueError(
+            f"Number of voltages {rows} is not a multiple of {fixed_number}")
+    invalid = np.argwhere((matrix < min_v) | (matrix > max_v))
+    if invalid.size:
+        row, column = invalid[0]
+        raise ValueError(f"Voltage {matrix[row, column]} at row {row + 1} of "
+                         f"{devices[column]} out of range ({min_v}~{max_v} mV)")
+
+    header = ProtocolHeader.set_fixed_voltage
+    frame_size = len(header) + 2 * fixed_number + 1
+    count = rows // fixed_number
+    values = np.ascontiguousarray(matrix.T, dtype=">u2").reshape(
+        len(devices), count, fixed_number)
+    frames = np.empty((len(devices), count, frame_size), dtype=np.uint8)
+    frames[..., :len(header)] = np.frombuffer(header, dtype=np.uint8)
+    frames[..., len(header):-1] = values.view(np.uint8).reshape(
+        len(devices), count, 2 * fixed_number)
+    frames[..., -1] = ProtocolHeader.end
+
+    device_bytes = count * frame_size
+    index = {
+        str(name): (i * device_bytes, count)
+        for i, name in enumerate(devices)
+    }
+    return frames.reshape(-1), index, frame_size
+
+
+class FrameCache:
+    """
+    Speed Test 帧缓存
+
+    以 CSV 文件内容的 SHA-256、电压上下限和每帧电压个数为键，
+    编译结果保存为 <键>.bin（帧数据）和 <键>.json（索引），再次加载同一文件时直接内存映射。
+    最多保留 max_entries 组缓存，写入新缓存后删除最久未使用的。
+    """
+
+    VERSION = 1
+
+    def __init__(self,
+                 directory: Optional[str] = None,
+                 max_entries: Optional[int] = None):
+        """
+        Args:
+            directory: 缓存目录，默认 FRAME_CACHE_DIR
+            max_entries: 最多保留的缓存组数，默认 FRAME_CACHE_MAX_ENTRIES，0 表示不限
+        """
+        self.directory = directory or os.environ.get("FRAME_CACHE_DIR",
+                                                     "cache/frames")
+        if max_entries is None:
+            max_entries = int(os.environ.get("FRAME_CACHE_MAX_ENTRIES", 8))
+        self.max_entries = max_entries
+        self.__loaded: Optional[CompiledSchedule] = None
+
+    @staticmethod
+    def __limits() -> Tuple[int, int, int]:
+        return (int(os.environ.get('VOLTAGE_MIN', 0)),
+                int(os.environ.get('VOLTAGE_MAX', 20000)),
+                int(os.environ.get("FIXED_NUMBER", 256)))
+
+    def key(self, path: str) -> str:
+        """计算缓存键"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        min_v, max_v, fixed_number = self.__limits()
+        digest.update(
+            f"|{min_v}|{max_v}|{fixed_number}|v{self.VERSION}".encode())
+        return digest.hexdigest()
+
+    def load_or_compile(self, schedule: Schedule) -> CompiledSchedule:
+        """
+        加载缓存的帧，缓存不存在时编译并写入缓存
+
+        Args:
+            schedule: 电压表，没有来源文件（path 为 None）时只在内存中编译
+        """
+        path = schedule.path
+        if path is None:
+            frames, index, frame_size = compile_frames(schedule,
+                                                       *self.__limits())
+            return CompiledSchedule(frames.tobytes(), index, frame_size)
+
+        key = self.key(path)
+        if self.__loaded is not None and self.__loaded.key == key:
+            return self.__loaded
+
+        compiled = self.__load(key)
+        if compiled is None:
+            frames, index, frame_size = compile_frames(schedule,
+                                                       *self.__limits())
+            self.__store(key, frames, index, frame_size)
+            compiled = self.__load(key)
+            self.prune(keep=key)
+            logger.info(f"[FrameCache] Compiled {os.path.basename(path)}: "
+                        f"{frames.size} bytes -> {key[:12]}")
+        else:
+            logger.info(f"[FrameCache] Loaded {os.path.basename(path)} "
+                        f"from cache {key[:12]}")
+        self.__loaded = compiled
+        return compiled
+
+    def __paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".bin", base + ".json"
+
+    def __load(self, key: str) -> Optional[CompiledSchedule]:
+        blob_path, index_path = self.__paths(key)
+        # 索引最后写入，存在即表示帧数据完整
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(blob_path, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as ex:
+            logger.warning(f"[FrameCache] Ignore broken cache {key[:12]}: "
+                           f"{ex}")
+            return None
+        if meta.get("version") != self.VERSION or len(blob) != meta["size"]:
+            blob.close()
+            return None
+        index = {
+            name: (offset, count)
+            for name, (offset, count) in meta["index"].items()
+        }
+        # 索引文件的修改时间作为最近使用时间
+        try:
+            os.utime(index_path)
+        except OSError:
+            pass
+        return CompiledSchedule(blob, index, meta["frame_size"], key)
+
+    def prune(self, keep: Optional[str] = None) -> int:
+        """
+        删除最久未使用的缓存，只保留 max_entries 组
+
+        Args:
+            keep: 不删除的缓存键（正在使用的）
+
+        Returns:
+            int: 删除的缓存组数
+        """
+        if self.max_entries <= 0:
+            return 0
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        entries = []
+        for name in names:
+            key, ext = os.path.splitext(name)
+            if ext != ".json":
+                continue
+            try:
+                used = os.path.getmtime(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((key != keep, -used, key))
+        entries.sort()
+        removed = 0
+        for _, _, key in entries[self.max_entries:]:
+            if key == keep:
+                continue
+            # 先删索引：索引不存在时缓存视为无效
+            for path in reversed(self.__paths(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as ex:
+                    logger.warning(
+                        f"[FrameCache] Cannot remove {path}: {ex}")
+            removed += 1
+        if removed:
+            logger.info(f"[FrameCache] Pruned {removed} old cache entries")
+        return removed
+
+    def __store(self, key: str, frames: np.ndarray,
+                index: Dict[str, Tuple[int, int]], frame_size: int):
+        os.makedirs(self.directory, exist_ok=True)
+        blob_path, index_path = self.__paths(key)
+        tmp = blob_path + ".tmp"
+        frames.tofile(tmp)
+        os.replace(tmp, blob_path)
+        meta = {
+            "version": self.VERSION,
+            "size": int(frames.size),
+            "frame_size": frame_size,
+            "index": index,
+        }
+        tmp = index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, index_path)
@@ -6,6 +6,7 @@ from PyQt5.QtCore import QThread, QTimer, pyqtSignal
 
 from device import Device
 from log_config import heartbeat_logger as logger
+from metrics import metrics_registry
 
 
 class HeartbeatThread(QThread):
@@ -23,6 +24,12 @@ class HeartbeatThread(QThread):
             # 创建快照以避免竞态条件
             devices_snapshot = list(self.devices.values())
             for device in devices_snapshot:
+                if device.idle_seconds() < self.interval:
+                    # 最近有成功的收发，设备必然在线，不必再发心跳
+                    logger.debug(f"Skip heartbeat to busy device: {device.name}")
+                    metrics_registry.incr("heartbeat.suppressed", device.name)
+                    device.failed_reset()
+                    continue
                 try:
                     logger.info(f"Send heartbeat to device: {device.name}")
                     device.send_heartbeat()
@@ -0,0 +1,206 @@
+import os
+import random
+import re
+import socket
+import time
+import zlib
+from typing import Optional
+
+from log_config import main_logger as logger
+from transport_strategy import TransportStrategy
+
+
+class ImpairmentProfile:
+    """
+    链路损伤参数（client/impairment.py 与 simu/impairment.py 中的本类保持完全一致）
+
+    字符串格式: "loss=0.05,delay=20,jitter=5,reorder=0.01,dup=0.01,rate=512,seed=42"
+        loss: 丢包率（0~1）
+        delay: 单向时延（毫秒）
+        jitter: 时延抖动（毫秒，均匀分布 ±jitter）
+        reorder: 乱序概率，被选中的包延后，让后续的包先到
+        dup: 重复概率
+        rate: 带宽上限（kbit/s），0 表示不限制
+        seed: 随机种子，相同种子得到相同的损伤序列
+    """
+
+    KEYS = {
+        "loss": "loss",
+        "delay": "delay_ms",
+        "jitter": "jitter_ms",
+        "reorder": "reorder",
+        "dup": "duplicate",
+        "rate": "rate_kbps",
+        "seed": "seed",
+    }
+
+    def __init__(self,
+                 loss: float = 0.0,
+                 delay_ms: float = 0.0,
+                 jitter_ms: float = 0.0,
+                 reorder: float = 0.0,
+                 duplicate: float = 0.0,
+                 rate_kbps: float = 0.0,
+                 seed: Optional[int] = None):
+        self.loss = loss
+        self.delay_ms = delay_ms
+        self.jitter_ms = jitter_ms
+        self.reorder = reorder
+        self.duplicate = duplicate
+        self.rate_kbps = rate_kbps
+        self.seed = seed
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "ImpairmentProfile":
+        """
+        解析 "key=value,..." 格式的损伤参数，spec 为空时返回不生效的参数
+
+        Raises:
+            ValueError: 参数格式错误
+        """
+        values = {}
+        for item in (spec or "").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            key, sep, value = item.partition("=")
+            key = key.strip().lower()
+            if not sep or key not in cls.KEYS:
+                raise ValueError(f"Invalid impairment option: {item}")
+            attr = cls.KEYS[key]
+            values[attr] = int(value) if attr == "seed" else float(value)
+        return cls(**values)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.loss or self.delay_ms or self.jitter_ms
+                    or self.reorder or self.duplicate or self.rate_kbps)
+
+    def __repr__(self):
+        return ("ImpairmentProfile(" + ",".join(
+            f"{key}={getattr(self, attr)}" for key, attr in self.KEYS.items()
+            if getattr(self, attr)) + ")")
+
+
+def profile_for_device(name: str) -> Optional[ImpairmentProfile]:
+    """
+    读取设备的损伤参数：优先 IMPAIRMENT_<设备名>，其次全局 IMPAIRMENT
+
+    设备名转为大写，非字母数字替换为下划线，例如 "Device A" -> IMPAIRMENT_DEVICE_A
+    """
+    key = "IMPAIRMENT_" + re.sub(r"[^0-9A-Za-z]+", "_", str(name)).upper()
+    spec = os.environ.get(key) or os.environ.get("IMPAIRMENT")
+    if not spec:
+        return None
+    profile = ImpairmentProfile.parse(spec)
+    return profile if profile.enabled else None
+
+
+class ImpairedTransport(TransportStrategy):
+    """
+    带链路损伤的传输策略，包装任意 TransportStrategy
+
+    发送方向按带宽计算发送完成时间，再叠加时延和抖动后才真正发送，
+    调用方因此感受到与真实链路一致的阻塞；丢包、重复、乱序按概率发生。
+    接收方向丢包时丢弃收到的数据并抛出 socket.timeout，用于验证超时与重试逻辑。
+    """
+
+    def __init__(self, transport: TransportStrategy,
+                 profile: ImpairmentProfile, name: str):
+        self._transport = transport
+        self._profile = profile
+        self._name = name
+        seed = profile.seed
+        if seed is not None:
+            # 同一种子下不同设备的损伤序列互不相同但可复现
+            seed = seed ^ zlib.crc32(str(name).encode("utf-8"))
+        self._random = random.Random(seed)
+        self._busy_until = 0.0
+        self._held: Optional[bytes] = None
+        self.stats = {
+            "sent": 0,
+            "dropped": 0,
+            "duplicated": 0,
+            "reordered": 0,
+            "recv_dropped": 0,
+            "delay_ms": 0.0,
+        }
+        logger.info(f"[Impairment] Device {name}: {profile}")
+
+    @property
+    def profile(self) -> ImpairmentProfile:
+        return self._profile
+
+    def connect(self) -> None:
+        self._transport.connect()
+
+    def disconnect(self) -> None:
+        self._held = None
+        self._transport.disconnect()
+
+    def send(self, packet: bytes) -> None:
+        """按损伤参数发送数据包"""
+        profile = self._profile
+        rand = self._random
+
+        if profile.loss and rand.random() < profile.loss:
+            self.stats["dropped"] += 1
+            logger.debug(f"[Impairment] {self._name} drop {len(packet)} bytes")
+            self._flush_held()
+            return
+
+        self._wait_link(len(packet))
+
+        if profile.reorder and self._held is None and rand.random(
+        ) < profile.reorder:
+            # 暂存本包，下一个包发出后再发
+            self._held = packet
+            self.stats["reordered"] += 1
+            return
+
+        self._transport.send(packet)
+        self.stats["sent"] += 1
+        if profile.duplicate and rand.random() < profile.duplicate:
+            self._transport.send(packet)
+            self.stats["duplicated"] += 1
+        self._flush_held()
+
+    def recv(self, buffer_size: int = 1024) -> bytes:
+        """接收数据，按丢包率丢弃"""
+        # 被乱序暂存的包最迟在等待响应前发出，避免同步收发卡住
+        self._flush_held()
+        data = self._transport.recv(buffer_size)
+        if (data and self._profile.loss
+                and self._random.random() < self._profile.loss):
+            self.stats["recv_dropped"] += 1
+            raise socket.timeout(f"impaired: response from {self._name} lost")
+        return data
+
+    @property
+    def connected(self) -> bool:
+        return self._transport.connected
+
+    def _wait_link(self, size: int):
+        """等待带宽排队和传播时延"""
+        profile = self._profile
+        now = time.perf_counter()
+        depart = now
+        if profile.rate_kbps:
+            start = max(now, self._busy_until)
+            depart = start + size * 8 / (profile.rate_kbps * 1000)
+            self._busy_until = depart
+        delay = profile.delay_ms
+        if profile.jitter_ms:
+            delay += self._random.uniform(-profile.jitter_ms,
+                                          profile.jitter_ms)
+        due = depart + max(delay, 0) / 1000
+        wait = due - now
+        if wait > 0:
+            self.stats["delay_ms"] += wait * 1000
+            time.sleep(wait)
+
+    def _flush_held(self):
+        if self._held is not None:
+            held, self._held = self._held, None
+            self._transport.send(held)
+            self.stats["sent"] += 1
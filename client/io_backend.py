@@ -0,0 +1,390 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from command_queue import CommandQueues
+from common import Commands, DeviceEnums
+from controller import Controller
+from frame_cache import FrameCache
+from heartbeat_thread import HeartbeatThread
+from log_config import panel_log_format
+from log_config import main_logger as logger
+from metrics import MetricsExporter, metrics_registry
+from multicast_transport import MulticastTransport, multicast_set_voltage
+from pacer import FramePacer
+from playback import SyncPlayback
+from recorder import FrameRecorder, SpeedTestResult
+from schedule import load_schedule
+from task import Task
+from timing import timed
+
+# GUI 与 I/O 后端之间的消息（均为元组，经 multiprocessing.Pipe 传输）
+#   GUI -> 后端: ("call", 请求号, 操作, 参数元组) / ("shutdown",)
+#   后端 -> GUI: ("result", 请求号, 是否成功, 返回值或错误信息)
+#                ("device", 设备名, 是否连接) / ("log", 文本) / ("metrics", 快照)
+MSG_CALL = "call"
+MSG_SHUTDOWN = "shutdown"
+MSG_RESULT = "result"
+MSG_DEVICE = "device"
+MSG_LOG = "log"
+MSG_METRICS = "metrics"
+
+
+class BackendError(RuntimeError):
+    """后端执行请求失败，或后端进程已退出"""
+
+
+class IOBackend:
+    """
+    I/O 后端：在独立进程中持有 Controller、所有套接字和心跳线程
+
+    GUI 进程只通过管道发送请求、接收事件，网络收发不再与界面渲染争抢 GIL。
+    每个请求在线程池中执行，慢请求（Speed Test）不会阻塞其他设备的命令。
+    """
+
+    def __init__(self, conn):
+        self.__conn = conn
+        self.__send_lock = threading.Lock()
+        self.__running = True
+        self.__controller = Controller()
+        self.__heartbeat_thread = HeartbeatThread()
+        self.__executor = ThreadPoolExecutor(max_workers=10,
+                                             thread_name_prefix="io-backend")
+        self.__command_queues = CommandQueues(self.__send_voltage,
+                                              self.__executor.submit)
+        self.__frame_cache = FrameCache()
+        self.__multicast = MulticastTransport.from_env()
+        self.__metrics_exporter: Optional[MetricsExporter] = None
+        self.__handlers: Dict[str, Callable] = {
+            "connect": self.__connect,
+            "disconnect": self.__disconnect,
+            "set_voltage": self.__set_voltage,
+            "set_all": self.__set_all,
+            "speed_test": self.__speed_test,
+        }
+
+    def run(self):
+        """处理 GUI 请求，直到收到 shutdown 或管道关闭"""
+        self.__init_logging()
+        self.__init_metrics()
+        self.__heartbeat_thread.start()
+        threading.Thread(target=self.__monitor,
+                         name="io-backend-monitor",
+                         daemon=True).start()
+        logger.info(f"[Backend] I/O backend started (pid {os.getpid()})")
+        try:
+            while True:
+                try:
+                    message = self.__conn.recv()
+                except (EOFError, OSError):
+                    break
+                if message[0] == MSG_SHUTDOWN:
+                    break
+                _, request_id, op, args = message
+                self.__executor.submit(self.__dispatch, request_id, op, args)
+        finally:
+            self.__shutdown()
+
+    def __init_logging(self):
+        """把主日志转发给 GUI 的日志面板"""
+
+        def pipe_sink(message):
+            self.__emit(MSG_LOG, str(message).rstrip("\n"))
+
+        logger.add(pipe_sink, format=panel_log_format, enqueue=True)
+
+    def __init_metrics(self):
+        metrics_registry.enabled = os.environ.get("METRICS_ENABLED",
+                                                  "1") == "1"
+        export_path = os.environ.get("METRICS_EXPORT_PATH")
+        if metrics_registry.enabled and export_path:
+            self.__metrics_exporter = MetricsExporter(
+                metrics_registry, export_path,
+                float(os.environ.get("METRICS_EXPORT_INTERVAL", 10)))
+            self.__metrics_exporter.start()
+
+    def __emit(self, *message):
+        with self.__send_lock:
+            try:
+                self.__conn.send(message)
+            except (OSError, ValueError):
+                # GUI 已退出
+                self.__running = False
+
+    def __dispatch(self, request_id: int, op: str, args: tuple):
+        handler = self.__handlers.get(op)
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown backend operation: {op}")
+            result = handler(*args)
+        except Exception as ex:
+            logger.error(f"[Backend] {op} failed: {ex}")
+            self.__emit(MSG_RESULT, request_id, False, str(ex))
+            return
+        self.__emit(MSG_RESULT, request_id, True, result)
+
+    def __monitor(self):
+        """移除心跳判定断线的设备，定期推送指标快照"""
+        while self.__running:
+            for device in self.__controller.all_devices():
+                if device.connected:
+                    continue
+                self.__heartbeat_thread.remove_device(device)
+                self.__controller.remove_device(device.name)
+                logger.info(
+                    f"Device removed due to disconnection: {device.name}")
+                self.__emit(MSG_DEVICE, device.name, False)
+            if metrics_registry.enabled:
+                self.__emit(MSG_METRICS, metrics_registry.snapshot())
+            time.sleep(2)
+
+    def __shutdown(self):
+        self.__running = False
+        self.__heartbeat_thread.stop()
+        if self.__metrics_exporter:
+            self.__metrics_exporter.stop()
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        if self.__multicast:
+            self.__multicast.close()
+        for device in self.__controller.all_devices():
+            device.disconnect()
+        logger.info("[Backend] I/O backend stopped")
+
+    # ================= 请求处理 =================
+    def __connect(self, ip: str, port: int, name: str) -> bool:
+        self.__controller.add_device(ip, port, name)
+        device = self.__controller.get_device(name)
+        if device is None:
+            raise ValueError(f"{name} is not connected")
+        device.connect()
+        self.__heartbeat_thread.add_device(device)
+        return device.connected
+
+    def __disconnect(self, name: str) -> bool:
+        device = self.__controller.get_device(name)
+        if device:
+            self.__heartbeat_thread.remove_device(device)
+            device.disconnect()
+            self.__controller.remove_device(name)
+            logger.info(f"Device disconnected: {name}")
+        else:
+            logger.info(f"Device not connected: {name}")
+        return False
+
+    def __set_voltage(self, name: str, voltage: int):
+        """电压设置进入设备命令队列（合并被覆盖的设置），立即返回"""
+        self.__command_queues.submit(Task(Commands.SetVoltage, name, voltage))
+
+    def __set_all(self, voltage: int) -> List[str]:
+        """
+        设置所有设备的电压：配置了组播时先组播，未应答的设备走单播命令队列
+
+        Returns:
+            List[str]: 走单播的设备
+        """
+        acked = set()
+        if self.__multicast:
+            devices = {}
+            for name in list(DeviceEnums):
+                device = self.__controller.get_device(name)
+                if device is not None and device.connected:
+                    devices[name] = device
+            try:
+                acked = set(devices) - set(
+                    multicast_set_voltage(self.__multicast, devices, voltage))
+            except OSError as ex:
+                logger.error(f"Multicast set all failed: {ex}")
+        unicast = [name for name in list(DeviceEnums) if name not in acked]
+        for name in unicast:
+            self.__set_voltage(name, voltage)
+        return unicast
+
+    @timed("set_voltage", device=lambda _self, task: task.device_name)
+    def __send_voltage(self, task: Task):
+        device = self.__controller.get_device(task.device_name)
+        if device is None:
+            logger.info(f"Device not connected: {task.device_name}")
+            return False
+        device.send_set_voltage(task.data)
+        return True
+
+    def __speed_test(self, path: str) -> List[Dict]:
+        """
+        加载 CSV（通常直接映射 .npy 边车文件）并在所有已连接设备上回放
+
+        Returns:
+            List[Dict]: 各设备的 FrameRecorder.summary()
+        """
+        schedule = load_schedule(path, list(DeviceEnums))
+        compiled = self.__frame_cache.load_or_compile(schedule)
+        devices = {}
+        for name in list(DeviceEnums):
+            device = self.__controller.get_device(name)
+            if device is None or not device.connected:
+                logger.info(f"Device not connected: {name}")
+                continue
+            devices[name] = device
+        if not devices:
+            return []
+
+        if os.environ.get("SPEED_TEST_SYNC", "1") == "1":
+            playback = SyncPlayback(devices, compiled)
+            playback.run()
+            recorders = list(playback.recorders.values())
+        else:
+            recorders = []
+            for name, device in devices.items():
+                count = compiled.frame_count(name)
+                recorder = FrameRecorder.from_env(name, count)
+                try:
+                    FramePacer.from_env().run(compiled.frames(name),
+                                              device.send_fixed_frame,
+                                              count,
+                                              name,
+                                              recorder=recorder)
+                except Exception as ex:
+                    logger.error(f"Speed test on {name} stopped: {ex}")
+                recorders.append(recorder)
+
+        result = SpeedTestResult(recorders)
+        try:
+            result.export()
+        except OSError as ex:
+            logger.error(f"Export speed test results failed: {ex}")
+        return result.summaries()
+
+
+def run_backend(conn):
+    """后端进程入口"""
+    IOBackend(conn).run()
+
+
+class BackendMetrics:
+    """后端推送的指标快照，接口与 MetricsRegistry 的只读部分一致"""
+
+    def __init__(self):
+        self.enabled = os.environ.get("METRICS_ENABLED", "1") == "1"
+        self.__snapshot: Dict = {"latencies": [], "counters": []}
+
+    def update(self, snapshot: Dict):
+        self.__snapshot = snapshot
+
+    def snapshot(self) -> Dict:
+        return self.__snapshot
+
+
+class IOBackendProxy(QObject):
+    """
+    GUI 进程中的后端代理
+
+    call() 阻塞等待结果，只应在线程池中调用；
+    后端事件经信号回到 GUI 线程。
+    """
+
+    device_changed = pyqtSignal(str, bool)
+    log_received = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.metrics = BackendMetrics()
+        self.__ids = itertools.count(1)
+        self.__lock = threading.Lock()
+        self.__pending: Dict[int, list] = {}
+        self.__conn = None
+        self.__process: Optional[multiprocessing.Process] = None
+        self.__reader: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动后端进程（spawn，避免 fork 带走 Qt 的线程状态）"""
+        context = multiprocessing.get_context("spawn")
+        self.__conn, child = context.Pipe()
+        self.__process = context.Process(target=run_backend,
+                                         args=(child, ),
+                                         name="io-backend",
+                                         daemon=True)
+        self.__process.start()
+        child.close()
+        self.__reader = threading.Thread(target=self.__read,
+                                         name="io-backend-reader",
+                                         daemon=True)
+        self.__reader.start()
+        logger.info(f"I/O backend process started: pid {self.__process.pid}")
+
+    def call(self, op: str, *args, timeout: Optional[float] = None) -> Any:
+        """
+        在后端执行操作并等待结果
+
+        Raises:
+            BackendError: 后端执行失败、超时或已退出
+        """
+        request_id = next(self.__ids)
+        waiter = [threading.Event(), False, None]
+        with self.__lock:
+            if self.__conn is None:
+                raise BackendError("I/O backend is not running")
+            self.__pending[request_id] = waiter
+            try:
+                self.__conn.send((MSG_CALL, request_id, op, args))
+            except (OSError, ValueError) as ex:
+                del self.__pending[request_id]
+                raise BackendError(f"I/O backend is not reachable: {ex}")
+        if not waiter[0].wait(timeout):
+            with self.__lock:
+                self.__pending.pop(request_id, None)
+            raise BackendError(f"Backend {op} timed out after {timeout}s")
+        _, ok, value = waiter
+        if not ok:
+            raise BackendError(value)
+        return value
+
+    def __read(self):
+        while True:
+            try:
+                message = self.__conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            if kind == MSG_RESULT:
+                _, request_id, ok, value = message
+                with self.__lock:
+                    waiter = self.__pending.pop(request_id, None)
+                if waiter is not None:
+                    waiter[1], waiter[2] = ok, value
+                    waiter[0].set()
+            elif kind == MSG_DEVICE:
+                self.device_changed.emit(message[1], message[2])
+            elif kind == MSG_LOG:
+                self.log_received.emit(message[1])
+            elif kind == MSG_METRICS:
+                self.metrics.update(message[1])
+        # 后端退出：唤醒所有等待中的请求
+        with self.__lock:
+            pending, self.__pending = self.__pending, {}
+        for waiter in pending.values():
+            waiter[1], waiter[2] = False, "I/O backend exited"
+            waiter[0].set()
+
+    def stop(self, timeout: float = 10.0):
+        """通知后端断开所有设备并退出"""
+        if self.__process is None:
+            return
+        with self.__lock:
+            try:
+                self.__conn.send((MSG_SHUTDOWN, ))
+            except (OSError, ValueError):
+                pass
+        self.__process.join(timeout)
+        if self.__process.is_alive():
+            logger.warning("I/O backend did not exit in time, terminating")
+            self.__process.terminate()
+            self.__process.join(1)
+        with self.__lock:
+            self.__conn.close()
+            self.__conn = None
+        self.__process = None
@@ -0,0 +1,60 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class IOScheduler:
+    """
+    单个设备的 I/O 调度器
+
+    同一时刻只允许一次 发送+接收 交互，避免心跳与 Speed Test 在同一个套接字上
+    交错收发、互相抢走应答。心跳走优先通道：有心跳在等待时，普通交互不再进入，
+    当前交互结束后心跳先执行。任意一次成功的交互都视为设备存活。
+    """
+
+    def __init__(self):
+        self.__cond = threading.Condition()
+        self.__busy = False
+        self.__priority_waiting = 0
+        self.__last_success_ns = 0
+
+    @contextmanager
+    def lane(self, priority: bool = False):
+        """
+        占用设备的 I/O 通道
+
+        Args:
+            priority: 是否走优先通道（心跳）
+        """
+        with self.__cond:
+            if priority:
+                self.__priority_waiting += 1
+                try:
+                    while self.__busy:
+                        self.__cond.wait()
+                finally:
+                    self.__priority_waiting -= 1
+            else:
+                while self.__busy or self.__priority_waiting:
+                    self.__cond.wait()
+            self.__busy = True
+        try:
+            yield
+        finally:
+            with self.__cond:
+                self.__busy = False
+                self.__cond.notify_all()
+
+    def mark_alive(self):
+        """记录一次成功的交互"""
+        self.__last_success_ns = time.monotonic_ns()
+
+    def reset(self):
+        """连接状态改变后清除存活记录"""
+        self.__last_success_ns = 0
+
+    def idle_seconds(self) -> float:
+        """距上次成功交互的秒数，从未成功时为无穷大"""
+        if not self.__last_success_ns:
+            return float("inf")
+        return (time.monotonic_ns() - self.__last_success_ns) / 1e9
@@ -22,6 +22,44 @@ def config():
         os.environ["PROTOCOL_TYPE"] = "UDP"
     if os.environ.get("FIXED_NUMBER") is None:
         os.environ["FIXED_NUMBER"] = "256"
+    if os.environ.get("DELTA_ENCODING") is None:
+        os.environ["DELTA_ENCODING"] = "0"
+    if os.environ.get("DELTA_KEYFRAME_INTERVAL") is None:
+        os.environ["DELTA_KEYFRAME_INTERVAL"] = "100"
+    if os.environ.get("SPEED_TEST_SYNC") is None:
+        os.environ["SPEED_TEST_SYNC"] = "1"
+    if os.environ.get("PLAYBACK_LEAD_US") is None:
+        os.environ["PLAYBACK_LEAD_US"] = "5000"
+    if os.environ.get("FRAME_INTERVAL_US") is None:
+        os.environ["FRAME_INTERVAL_US"] = "0"
+    if os.environ.get("PACER_SPIN_US") is None:
+        os.environ["PACER_SPIN_US"] = "200"
+    if os.environ.get("PACER_OVERRUN") is None:
+        os.environ["PACER_OVERRUN"] = "catchup"
+    if os.environ.get("FRAME_CACHE_DIR") is None:
+        os.environ["FRAME_CACHE_DIR"] = "cache/frames"
+    if os.environ.get("FRAME_CACHE_MAX_ENTRIES") is None:
+        os.environ["FRAME_CACHE_MAX_ENTRIES"] = "8"
+    if os.environ.get("SPEED_TEST_RETRIES") is None:
+        os.environ["SPEED_TEST_RETRIES"] = "0"
+    if os.environ.get("SPEED_TEST_RESULT_DIR") is None:
+        os.environ["SPEED_TEST_RESULT_DIR"] = "logs/speed_test"
+    if os.environ.get("IO_BACKEND") is None:
+        os.environ["IO_BACKEND"] = "thread"
+    if os.environ.get("MULTICAST_GROUP") is None:
+        os.environ["MULTICAST_GROUP"] = ""
+    if os.environ.get("MULTICAST_PORT") is None:
+        os.environ["MULTICAST_PORT"] = "9990"
+    if os.environ.get("MULTICAST_TTL") is None:
+        os.environ["MULTICAST_TTL"] = "1"
+    if os.environ.get("MULTICAST_TIMEOUT_MS") is None:
+        os.environ["MULTICAST_TIMEOUT_MS"] = "200"
+    if os.environ.get("METRICS_ENABLED") is None:
+        os.environ["METRICS_ENABLED"] = "1"
+    if os.environ.get("METRICS_EXPORT_PATH") is None:
+        os.environ["METRICS_EXPORT_PATH"] = "logs/metrics.json"
+    if os.environ.get("METRICS_EXPORT_INTERVAL") is None:
+        os.environ["METRICS_EXPORT_INTERVAL"] = "10"
 
 
 def exception_hook(exc_type, exc_value, exc_traceback):
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from log_config import main_logger as logger
+
+# 每个 2 的幂区间内划分的子桶位数，5 位 => 32 个子桶，相对误差约 3%
+SUB_BUCKET_BITS = 5
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+# 可记录的最大耗时（纳秒），超出部分计入最后一个桶
+MAX_TRACKABLE_NS = 60 * 1_000_000_000
+
+
+def bucket_index(value_ns: int) -> int:
+    """计算耗时落入的桶下标（对数-线性分桶）"""
+    if value_ns < 0:
+        value_ns = 0
+    shift = value_ns.bit_length() - SUB_BUCKET_BITS - 1
+    if shift < 0:
+        shift = 0
+    return (shift << SUB_BUCKET_BITS) + (value_ns >> shift)
+
+
+def bucket_lower_bound(index: int) -> int:
+    """桶下标对应的最小耗时（纳秒）"""
+    if index < 2 * SUB_BUCKET_COUNT:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    return (index - (shift << SUB_BUCKET_BITS)) << shift
+
+
+BUCKETS = bucket_index(MAX_TRACKABLE_NS) + 1
+
+
+class LatencyHistogram:
+    """HDR 风格的延迟直方图
+
+    只由一个线程写入，读取方在快照时合并，因此写入路径不加锁。
+    """
+
+    __slots__ = ("counts", "total", "sum_ns", "min_ns", "max_ns")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * BUCKETS
+        self.total = 0
+        self.sum_ns = 0
+        self.min_ns = 0
+        self.max_ns = 0
+
+    def record(self, value_ns: int):
+        """记录一次耗时"""
+        index = bucket_index(value_ns)
+        if index >= BUCKETS:
+            index = BUCKETS - 1
+        self.counts[index] += 1
+        if self.total == 0 or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+        self.total += 1
+        self.sum_ns += value_ns
+
+    def merge(self, other: "LatencyHistogram"):
+        """把另一个直方图累加到当前直方图"""
+        if other.total == 0:
+            return
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        if self.total == 0 or other.min_ns < self.min_ns:
+            self.min_ns = other.min_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.total += other.total
+        self.sum_ns += other.sum_ns
+
+    def percentile(self, percent: float) -> int:
+        """返回给定百分位的耗时（纳秒，取桶下界）"""
+        if self.total == 0:
+            return 0
+        rank = max(1, int(self.total * percent / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(bucket_lower_bound(index), self.min_ns),
+                           self.max_ns)
+        return self.max_ns
+
+    def summary(self) -> Dict:
+        """生成统计摘要（单位：微秒）"""
+        mean = self.sum_ns / self.total if self.total else 0
+        return {
+            "count": self.total,
+            "min_us": self.min_ns / 1000,
+            "mean_us": mean / 1000,
+            "p50_us": self.percentile(50) / 1000,
+            "p95_us": self.percentile(95) / 1000,
+            "p99_us": self.percentile(99) / 1000,
+            "max_us": self.max_ns / 1000,
+        }
+
+
+class _ThreadShard:
+    """单个线程私有的指标分片"""
+
+    __slots__ = ("histograms", "counters")
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.counters: Dict[Tuple[str, str], int] = {}
+
+
+class MetricsRegistry:
+    """指标注册表
+
+    按 (操作, 设备) 维护延迟直方图与计数器。每个线程写自己的分片，
+    只有首次写入时才需要加锁登记分片；快照时再合并所有分片。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.__local = threading.local()
+        self.__shards: List[_ThreadShard] = []
+        self.__lock = threading.Lock()
+        self.__started_at = time.time()
+
+    def __shard(self) -> _ThreadShard:
+        shard = getattr(self.__local, "shard", None)
+        if shard is None:
+            shard = _ThreadShard()
+            self.__local.shard = shard
+            with self.__lock:
+                self.__shards.append(shard)
+        return shard
+
+    def record(self, operation: str, device: Optional[str], elapsed_ns: int):
+        """记录一次操作耗时"""
+        if not self.enabled:
+            return
+        key = (operation, str(device) if device else "")
+        histograms = self.__shard().histograms
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            histograms[key] = histogram
+        histogram.record(elapsed_ns)
+
+    def incr(self, name: str, device: Optional[str] = None, value: int = 1):
+        """计数器累加"""
+        if not self.enabled:
+            return
+        key = (name, str(device) if device else "")
+        counters = self.__shard().counters
+        counters[key] = counters.get(key, 0) + value
+
+    def reset(self):
+        """清空所有已记录的数据"""
+        with self.__lock:
+            self.__shards = []
+            self.__local = threading.local()
+            self.__started_at = time.time()
+
+    def snapshot(self) -> Dict:
+        """合并所有线程分片，生成当前快照"""
+        with self.__lock:
+            shards = list(self.__shards)
+
+        histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        counters: Dict[Tuple[str, str], int] = {}
+        for shard in shards:
+            for key, histogram in list(shard.histograms.items()):
+                merged = histograms.get(key)
+                if merged is None:
+                    merged = LatencyHistogram()
+                    histograms[key] = merged
+                merged.merge(histogram)
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+
+        latencies = []
+        for (operation, device), histogram in sorted(histograms.items()):
+            item = {"operation": operation, "device": device}
+            item.update(histogram.summary())
+            latencies.append(item)
+
+        return {
+            "timestamp": time.time(),
+            "since": self.__started_at,
+            "latencies": latencies,
+            "counters": [{
+                "name": name,
+                "device": device,
+                "value": value
+            } for (name, device), value in sorted(counters.items())],
+        }
+
+
+class MetricsExporter(threading.Thread):
+    """定期把指标快照写入 JSON 文件"""
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval=10):
+        super().__init__(daemon=True)
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.__stop_event = threading.Event()
+
+    def run(self):
+        while not self.__stop_event.wait(self.interval):
+            self.export()
+
+    def export(self):
+        """写出一次快照（先写临时文件再替换，避免读到半个文件）"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.registry.snapshot(), f, indent=2,
+                          ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as ex:
+            logger.warning(f"Export metrics failed: {ex}")
+
+    def stop(self):
+        """停止导出线程，并写出最后一次快照"""
+        self.__stop_event.set()
+        self.export()
+
+
+# 全局实例
+metrics_registry = MetricsRegistry()
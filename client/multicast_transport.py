@@ -0,0 +1,171 @@
+import ipaddress
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from log_config import main_logger as logger
+from metrics import metrics_registry
+from protocol import Protocol
+
+
+class MulticastTransport:
+    """
+    组播（或子网广播）发送通道
+
+    一个数据报同时发给所有设备，各设备从自己的单播端口分别应答；
+    在同一个截止时间内收集应答，按应答的来源地址对应到设备。
+    """
+
+    def __init__(self,
+                 group: str,
+                 port: int,
+                 ttl: int = 1,
+                 timeout: float = 0.2,
+                 interface: str = "0.0.0.0"):
+        """
+        Args:
+            group: 组播组地址，或子网广播地址
+            port: 设备监听的组播端口
+            ttl: 组播 TTL
+            timeout: 收集应答的总时长（秒）
+            interface: 发送组播的本机接口地址
+        """
+        self.group = group
+        self.port = port
+        self.ttl = ttl
+        self.timeout = timeout
+        self.interface = interface
+        self.__lock = threading.Lock()
+        self.__sock: Optional[socket.socket] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["MulticastTransport"]:
+        """按环境变量 MULTICAST_GROUP 等创建，未设置组地址或使用 Unix 套接字时返回 None"""
+        group = os.environ.get("MULTICAST_GROUP", "")
+        protocol_type = os.environ.get("PROTOCOL_TYPE", "udp").lower()
+        if not group or protocol_type.startswith("unix"):
+            return None
+        return cls(group, int(os.environ.get("MULTICAST_PORT", 9990)),
+                   int(os.environ.get("MULTICAST_TTL", 1)),
+                   int(os.environ.get("MULTICAST_TIMEOUT_MS", 200)) / 1000,
+                   os.environ.get("MULTICAST_INTERFACE", "0.0.0.0"))
+
+    def __open(self) -> socket.socket:
+        if self.__sock is not None:
+            return self.__sock
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            if ipaddress.IPv4Address(self.group).is_multicast:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL,
+                                self.ttl)
+                if self.interface != "0.0.0.0":
+                    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                    socket.inet_aton(self.interface))
+            else:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.bind(("", 0))
+        except OSError:
+            sock.close()
+            raise
+        logger.info(f"[MULTICAST] Sending to {self.group}:{self.port}")
+        self.__sock = sock
+        return sock
+
+    def close(self):
+        with self.__lock:
+            if self.__sock is not None:
+                self.__sock.close()
+                self.__sock = None
+
+    @staticmethod
+    def __ack_status(data: bytes) -> bool:
+        """设备应答帧 FF 00 <状态> FE 按状态判断，其他应答视为成功"""
+        if len(data) >= 3 and data[0] == 0xFF and data[1] == 0x00:
+            return data[2] == 0x00
+        return True
+
+    def send_all(self, packet: bytes,
+                 devices: Dict[str, Tuple[str, int]]) -> Dict[str, bool]:
+        """
+        发送一个数据报并收集应答
+
+        来源地址与设备地址完全一致时直接对应；否则按端口对应（本机测试时应答的
+        来源 IP 是本机网卡地址而不是 127.0.0.1），端口也不唯一时忽略该应答。
+
+        Args:
+            packet: 数据报
+            devices: {设备名: (ip, 单播端口)}
+
+        Returns:
+            Dict[str, bool]: 已应答设备的应答状态，未应答的设备不在结果中
+        """
+        by_address = {address: name for name, address in devices.items()}
+        by_port: Dict[int, List[str]] = {}
+        for name, (_, port) in devices.items():
+            by_port.setdefault(port, []).append(name)
+
+        acks: Dict[str, bool] = {}
+        with self.__lock:
+            sock = self.__open()
+            # 丢弃上一次超时后迟到的应答
+            sock.setblocking(False)
+            try:
+                while True:
+                    sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                pass
+            sock.setblocking(True)
+
+            deadline = time.monotonic() + self.timeout
+            sock.sendto(bytes(packet), (self.group, self.port))
+            while len(acks) < len(devices):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    data, address = sock.recvfrom(1024)
+                except socket.timeout:
+                    break
+                name = by_address.get(address)
+                if name is None:
+                    names = by_port.get(address[1], [])
+                    name = names[0] if len(names) == 1 else None
+                if name is None:
+                    logger.debug(f"[MULTICAST] Ignore reply from {address}")
+                    continue
+                acks[name] = self.__ack_status(data)
+        return acks
+
+
+def multicast_set_voltage(transport: MulticastTransport, devices: Dict,
+                          voltage: int) -> List[str]:
+    """
+    用一个组播数据报设置所有设备的电压
+
+    Args:
+        transport: 组播通道
+        devices: {设备名: Device}
+        voltage: 电压
+
+    Returns:
+        List[str]: 未应答或应答失败的设备，调用方应改用单播重发
+    """
+    if not devices:
+        return []
+    start = time.perf_counter_ns()
+    acks = transport.send_all(
+        Protocol.set_voltage(voltage),
+        {name: device.address for name, device in devices.items()})
+    elapsed = time.perf_counter_ns() - start
+    metrics_registry.record("multicast_set_all", None, elapsed)
+    missed = [name for name in devices if not acks.get(name)]
+    metrics_registry.incr("multicast.acked", None, len(devices) - len(missed))
+    if missed:
+        metrics_registry.incr("multicast.missed", None, len(missed))
+    logger.info(f"[MULTICAST] Set {voltage} mV: {len(devices) - len(missed)}/"
+                f"{len(devices)} acked in {elapsed / 1e6:.1f} ms"
+                + (f", unicast fallback for {missed}" if missed else ""))
+    return missed
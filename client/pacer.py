@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+from log_config import main_logger as logger
+from metrics import metrics_registry
+from recorder import FrameRecorder
+
+# 超时策略：追赶（立即连续发送落后的帧）或丢弃（跳过已错过下一个时隙的帧）
+OVERRUN_CATCHUP = "catchup"
+OVERRUN_DROP = "drop"
+
+
+class FramePacer:
+    """
+    按固定间隔发送帧的调度器
+
+    第 i 帧的计划发送时间为 start + i * interval（time.monotonic_ns 绝对时间），
+    误差不会累积。等待时先 sleep 到截止时间前 spin 纳秒，再忙等到截止时间，
+    兼顾 CPU 占用和精度。每帧的计划时间和实际发送时间都会记录下来。
+    """
+
+    def __init__(self,
+                 interval_ns: int,
+                 spin_ns: int = 200_000,
+                 policy: str = OVERRUN_CATCHUP):
+        """
+        Args:
+            interval_ns: 帧间隔（纳秒），0 表示不限速
+            spin_ns: 截止时间前改为忙等的时长（纳秒）
+            policy: 超时策略 OVERRUN_CATCHUP 或 OVERRUN_DROP
+        """
+        if interval_ns < 0 or spin_ns < 0:
+            raise ValueError("Pacer interval and spin must be non-negative")
+        if policy not in (OVERRUN_CATCHUP, OVERRUN_DROP):
+            raise ValueError(f"Unknown overrun policy: {policy}")
+        self.interval_ns = interval_ns
+        self.spin_ns = spin_ns
+        self.policy = policy
+        # 计划/实际发送时间（相对 start 的纳秒），丢弃的帧实际时间为 -1
+        self.planned = np.empty(0, dtype=np.int64)
+        self.actual = np.empty(0, dtype=np.int64)
+        self.start_ns = 0
+
+    @classmethod
+    def from_env(cls) -> "FramePacer":
+        """按环境变量 FRAME_INTERVAL_US、PACER_SPIN_US、PACER_OVERRUN 创建"""
+        return cls(
+            int(float(os.environ.get("FRAME_INTERVAL_US", 0)) * 1000),
+            int(float(os.environ.get("PACER_SPIN_US", 200)) * 1000),
+            os.environ.get("PACER_OVERRUN", OVERRUN_CATCHUP).lower())
+
+    def wait_until(self, deadline_ns: int) -> int:
+        """
+        等待到 deadline_ns（time.monotonic_ns 时间）
+
+        Returns:
+            int: 返回时的 time.monotonic_ns
+        """
+        now = time.monotonic_ns()
+        remaining = deadline_ns - now - self.spin_ns
+        if remaining > 0:
+            time.sleep(remaining / 1e9)
+            now = time.monotonic_ns()
+        while now < deadline_ns:
+            now = time.monotonic_ns()
+        return now
+
+    def run(self,
+            frames: Iterable,
+            send: Callable[[object], object],
+            count: int,
+            device_name: Optional[str] = None,
+            start_ns: Optional[int] = None,
+            barrier: Optional[threading.Barrier] = None,
+            recorder: Optional[FrameRecorder] = None) -> Dict:
+        """
+        按节拍发送全部帧
+
+        Args:
+            frames: 帧序列
+            send: 发送单帧的函数
+            count: 帧数（用于预分配记录数组）
+            device_name: 设备名，用于指标
+            start_ns: 第 0 帧的计划时间（time.monotonic_ns），默认立即开始
+            barrier: 每帧发送前等待的屏障，用于多设备逐帧同步（此时不丢帧）
+            recorder: 逐帧记录应答时间、重试和状态，由它负责调用 send
+
+        Raises:
+            threading.BrokenBarrierError: 屏障被其他发送线程中止
+
+        Returns:
+            Dict: 统计摘要，见 summary()
+        """
+        interval = self.interval_ns
+        planned = np.arange(count, dtype=np.int64) * interval
+        actual = np.full(count, -1, dtype=np.int64)
+        # 先保存记录数组，发送异常中断时 summary() 仍能统计已发送的帧
+        self.planned = planned
+        self.actual = actual
+        start = time.monotonic_ns() if start_ns is None else start_ns
+        self.start_ns = start
+        drop = self.policy == OVERRUN_DROP
+        sent = 0
+        for index, frame in enumerate(frames):
+            if index >= count:
+                break
+            deadline = start + index * interval
+            now = time.monotonic_ns()
+            if now < deadline:
+                now = self.wait_until(deadline)
+            elif (drop and interval and barrier is None
+                  and now >= deadline + interval):
+                # 已经错过下一个时隙，跳过这一帧以恢复节拍
+                metrics_registry.incr("pacer.dropped", device_name)
+                if recorder is not None:
+                    recorder.drop(index)
+                continue
+            if barrier is not None:
+                barrier.wait()
+                now = time.monotonic_ns()
+            actual[index] = now - start
+            if recorder is not None:
+                recorder.send(send, index, frame, now)
+            else:
+                send(frame)
+            sent += 1
+            if interval:
+                metrics_registry.record("pacer.lateness", device_name,
+                                        now - deadline)
+        summary = self.summary()
+        logger.info(f"[Pacer] {device_name or ''} sent {summary['sent']}/"
+                    f"{summary['frames']} frames, dropped {summary['dropped']},"
+                    f" lateness p50={summary['lateness_p50_us']}us "
+                    f"p99={summary['lateness_p99_us']}us "
+                    f"max={summary['lateness_max_us']}us")
+        return summary
+
+    def summary(self) -> Dict:
+        """
+        统计最近一次 run 的节拍精度
+
+        Returns:
+            Dict: 帧数、发送数、丢弃数、迟到时间分位数（微秒）和实际速率
+        """
+        sent_mask = self.actual >= 0
+        sent = int(sent_mask.sum())
+        result = {
+            "frames": int(self.planned.size),
+            "sent": sent,
+            "dropped": int(self.planned.size) - sent,
+            "interval_us": self.interval_ns / 1000,
+            "lateness_mean_us": 0.0,
+            "lateness_p50_us": 0.0,
+            "lateness_p99_us": 0.0,
+            "lateness_max_us": 0.0,
+            "rate_hz": 0.0,
+        }
+        if not sent:
+            return result
+        if self.interval_ns:
+            lateness = (self.actual[sent_mask] - self.planned[sent_mask]) / 1000
+            p50, p99 = np.percentile(lateness, [50, 99])
+            result.update({
+                "lateness_mean_us": round(float(lateness.mean()), 1),
+                "lateness_p50_us": round(float(p50), 1),
+                "lateness_p99_us": round(float(p99), 1),
+                "lateness_max_us": round(float(lateness.max()), 1),
+            })
+        times = self.actual[sent_mask]
+        if sent > 1 and times[-1] > times[0]:
+            elapsed = int(times[-1] - times[0])
+            result["rate_hz"] = round((sent - 1) * 1e9 / elapsed, 1)
+        return result
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from device import Device
+from frame_cache import CompiledSchedule
+from log_config import main_logger as logger
+from metrics import metrics_registry
+from pacer import FramePacer
+from recorder import FrameRecorder
+
+
+class SyncPlayback:
+    """
+    多设备同步回放
+
+    每个设备一个发送线程，帧在开始前全部准备好。所有线程在起始屏障处会合，
+    屏障动作确定共同的起始时间：
+        限速（FRAME_INTERVAL_US > 0）时各设备按同一时钟的第 i 个时隙发送第 i 帧；
+        不限速时每帧发送前再经过一次屏障，所有设备逐帧同步前进。
+    结束后统计同一帧在各设备之间的发送时间差（skew）。
+    """
+
+    def __init__(self,
+                 devices: Dict[str, Device],
+                 compiled: CompiledSchedule,
+                 lead_ns: Optional[int] = None):
+        """
+        Args:
+            devices: {设备名: 已连接的设备}
+            compiled: 预编译的帧
+            lead_ns: 起始屏障到第 0 帧的提前量，默认 PLAYBACK_LEAD_US
+        """
+        if not devices:
+            raise ValueError("No connected device for playback")
+        self.devices = devices
+        self.compiled = compiled
+        self.lead_ns = lead_ns if lead_ns is not None else int(
+            float(os.environ.get("PLAYBACK_LEAD_US", 5000)) * 1000)
+        self.pacers = {name: FramePacer.from_env() for name in devices}
+        self.count = min(compiled.frame_count(name) for name in devices)
+        self.recorders = {
+            name: FrameRecorder.from_env(name, self.count)
+            for name in devices
+        }
+        self.errors: Dict[str, str] = {}
+        self.start_ns = 0
+        # 所有设备都发送了的帧的 skew（纳秒）
+        self.skew_ns = np.empty(0, dtype=np.int64)
+        self.__start_barrier = threading.Barrier(len(devices),
+                                                 action=self.__set_start)
+        self.__frame_barrier: Optional[threading.Barrier] = None
+        interval = next(iter(self.pacers.values())).interval_ns
+        if interval == 0 and len(devices) > 1:
+            self.__frame_barrier = threading.Barrier(len(devices))
+
+    def __set_start(self):
+        self.start_ns = time.monotonic_ns() + self.lead_ns
+
+    def run(self) -> Dict:
+        """
+        启动所有发送线程并等待结束
+
+        Returns:
+            Dict: 同步统计，见 summary()
+        """
+        threads = [
+            threading.Thread(target=self.__play,
+                             args=(name, ),
+                             name=f"playback-{name}",
+                             daemon=True) for name in self.devices
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.skew_ns = self.__measure_skew()
+        for value in self.skew_ns:
+            metrics_registry.record("playback.skew", None, int(value))
+        summary = self.summary()
+        logger.info(f"[Playback] {len(self.devices)} devices, "
+                    f"{summary['frames']} frames, skew "
+                    f"p50={summary['skew_p50_us']}us "
+                    f"p99={summary['skew_p99_us']}us "
+                    f"max={summary['skew_max_us']}us")
+        return summary
+
+    def __play(self, name: str):
+        device = self.devices[name]
+        # 提前切好所有帧，起跑后只剩发送
+        frames: List[memoryview] = list(
+            self.compiled.frames(name))[:self.count]
+        try:
+            self.__start_barrier.wait()
+            self.pacers[name].run(frames,
+                                  device.send_fixed_frame,
+                                  self.count,
+                                  name,
+                                  start_ns=self.start_ns,
+                                  barrier=self.__frame_barrier,
+                                  recorder=self.recorders[name])
+        except threading.BrokenBarrierError:
+            self.errors.setdefault(name, "aborted by another device")
+            logger.warning(f"[Playback] {name} stopped: another device failed")
+        except Exception as ex:
+            self.errors[name] = str(ex)
+            logger.error(f"[Playback] {name} failed: {ex}")
+            # 让其他线程从屏障中退出，避免永久等待
+            self.__start_barrier.abort()
+            if self.__frame_barrier is not None:
+                self.__frame_barrier.abort()
+
+    def __measure_skew(self) -> np.ndarray:
+        """同一帧在各设备之间的最大发送时间差，只统计所有设备都发送了的帧"""
+        if len(self.devices) < 2:
+            return np.empty(0, dtype=np.int64)
+        # 各 pacer 的起始时间相同，actual 可以直接比较
+        actual = np.stack([
+            pacer.actual if pacer.actual.size == self.count else np.full(
+                self.count, -1, dtype=np.int64)
+            for pacer in self.pacers.values()
+        ])
+        times = actual[:, (actual >= 0).all(axis=0)]
+        return times.max(axis=0) - times.min(axis=0)
+
+    def summary(self) -> Dict:
+        """
+        统计各设备的发送结果和设备间的 skew（微秒）
+
+        Returns:
+            Dict: 帧数、skew 分位数、各设备的节拍统计和错误
+        """
+        result = {
+            "frames": self.count,
+            "synced_frames": int(self.skew_ns.size),
+            "skew_mean_us": 0.0,
+            "skew_p50_us": 0.0,
+            "skew_p99_us": 0.0,
+            "skew_max_us": 0.0,
+            "devices": {
+                name: pacer.summary()
+                for name, pacer in self.pacers.items()
+            },
+            "errors": dict(self.errors),
+        }
+        if not self.skew_ns.size:
+            return result
+        skew_us = self.skew_ns / 1000
+        p50, p99 = np.percentile(skew_us, [50, 99])
+        result.update({
+            "skew_mean_us": round(float(skew_us.mean()), 1),
+            "skew_p50_us": round(float(p50), 1),
+            "skew_p99_us": round(float(p99), 1),
+            "skew_max_us": round(float(skew_us.max()), 1),
+        })
+        return result
@@ -1,11 +1,16 @@
 import os
 
+import numpy as np
+
 
 class ProtocolHeader:
 
     heartbeat = bytes([0xFF, 0x01])
     set_voltage = bytes([0xFF, 0x02])
     set_fixed_voltage = bytes([0xFF, 0x03])
+    set_delta_voltage = bytes([0xFF, 0x04])
+    delta_runs = 0x01
+    delta_bitmap = 0x02
     start = 0xFF
     end = 0xFE
 
@@ -38,6 +43,9 @@ class Protocol:
         msg = bytearray()
         msg.extend(ProtocolHeader.set_voltage)
         length = len(voltages)
+        # 个数为 0 的帧与设置电压 0 的单值帧字节相同
+        if length == 0:
+            raise ValueError("Number of voltages must be > 0")
         msg.append((length >> 8) & 0xFF)
         msg.append(length & 0xFF)
         min_v = int(os.environ.get('VOLTAGE_MIN', 0))
@@ -69,6 +77,80 @@ class Protocol:
         msg.append(ProtocolHeader.end)
         return msg
 
+    @classmethod
+    def set_delta_voltage(cls, voltages, previous=None):
+        """
+        按上一帧编码全量电压，只发送变化的通道
+
+        增量帧格式: FF 04 <编码方式> <数据> FE
+            0x01 区段: 区段数(2) + [起始通道(2) 通道数(2)]*区段数 + 电压(2)*通道总数
+            0x02 位图: 位图(通道数/8，高位在前) + 电压(2)*置位数
+        全量帧、区段、位图三者取最短；没有上一帧时发送全量帧。
+
+        Args:
+            voltages: 本帧全部通道的电压
+            previous: 设备上一帧的电压，None 表示未知
+        """
+        min_v = int(os.environ.get('VOLTAGE_MIN', 0))
+        max_v = int(os.environ.get('VOLTAGE_MAX', 20000))
+        fixed_number = int(os.environ.get("FIXED_NUMBER", 256))
+        current = np.asarray(voltages, dtype=np.int64)
+        if current.shape != (fixed_number, ):
+            raise ValueError(f"Number of voltages != {fixed_number}")
+        invalid = np.flatnonzero((current < min_v) | (current > max_v))
+        if invalid.size:
+            raise ValueError(f"Voltage {current[invalid[0]]} out of range "
+                             f"({min_v}~{max_v} mV)")
+        current = current.astype(">u2")
+
+        full_size = len(ProtocolHeader.set_fixed_voltage) + 2 * current.size + 1
+        if previous is None or len(previous) != current.size:
+            return cls.__frame(ProtocolHeader.set_fixed_voltage, current)
+
+        mask = current != np.asarray(previous, dtype=">u2")
+        changed = np.flatnonzero(mask)
+
+        # 位图：每个通道一位，变化的通道依次附带电压
+        bitmap = np.packbits(mask)
+        bitmap_size = 4 + bitmap.size + 2 * changed.size
+
+        # 区段：相隔一个通道的变化合并为一段（多发 2 字节，省一个 4 字节的区段头）
+        if changed.size:
+            breaks = np.flatnonzero(np.diff(changed) > 2)
+            starts = changed[np.r_[0, breaks + 1]]
+            ends = changed[np.r_[breaks, changed.size - 1]] + 1
+        else:
+            starts = ends = np.empty(0, dtype=np.int64)
+        counts = ends - starts
+        runs_size = 6 + 4 * starts.size + 2 * int(counts.sum())
+
+        if full_size <= min(bitmap_size, runs_size):
+            return cls.__frame(ProtocolHeader.set_fixed_voltage, current)
+        msg = bytearray(ProtocolHeader.set_delta_voltage)
+        if bitmap_size <= runs_size:
+            msg.append(ProtocolHeader.delta_bitmap)
+            msg.extend(bitmap.tobytes())
+            msg.extend(current[mask].tobytes())
+        else:
+            covered = np.zeros(current.size + 1, dtype=np.int64)
+            np.add.at(covered, starts, 1)
+            np.add.at(covered, ends, -1)
+            covered = np.cumsum(covered[:-1]) > 0
+            msg.append(ProtocolHeader.delta_runs)
+            msg.extend(np.array([starts.size], dtype=">u2").tobytes())
+            msg.extend(
+                np.column_stack((starts, counts)).astype(">u2").tobytes())
+            msg.extend(current[covered].tobytes())
+        msg.append(ProtocolHeader.end)
+        return msg
+
+    @classmethod
+    def __frame(cls, header, values):
+        msg = bytearray(header)
+        msg.extend(values.tobytes())
+        msg.append(ProtocolHeader.end)
+        return msg
+
 
 if __name__ == '__main__':
     msg = Protocol.set_voltage(10)
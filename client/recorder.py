@@ -0,0 +1,208 @@
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from log_config import main_logger as logger
+
+# 帧状态
+STATUS_OK = 0
+STATUS_TIMEOUT = 1
+STATUS_ERROR = 2
+STATUS_DROPPED = 3
+STATUS_NOT_SENT = 4
+
+STATUS_NAMES = {
+    STATUS_OK: "ok",
+    STATUS_TIMEOUT: "timeout",
+    STATUS_ERROR: "error",
+    STATUS_DROPPED: "dropped",
+    STATUS_NOT_SENT: "not_sent",
+}
+
+
+class FrameRecorder:
+    """
+    单个设备 Speed Test 的逐帧记录
+
+    发送时间、应答时间（time.monotonic_ns，未发送/未应答为 -1）、重试次数和状态
+    存放在预分配的 NumPy 数组中，发送路径上只做下标赋值。
+    """
+
+    def __init__(self, device_name: str, count: int, retries: int = 0):
+        """
+        Args:
+            device_name: 设备名
+            count: 帧数
+            retries: 接收超时后的最大重发次数
+        """
+        self.device_name = device_name
+        self.max_retries = retries
+        self.send_ns = np.full(count, -1, dtype=np.int64)
+        self.ack_ns = np.full(count, -1, dtype=np.int64)
+        self.retries = np.zeros(count, dtype=np.uint8)
+        self.status = np.full(count, STATUS_NOT_SENT, dtype=np.uint8)
+
+    @classmethod
+    def from_env(cls, device_name: str, count: int) -> "FrameRecorder":
+        """按环境变量 SPEED_TEST_RETRIES 创建"""
+        return cls(device_name, count,
+                   int(os.environ.get("SPEED_TEST_RETRIES", 0)))
+
+    def __len__(self):
+        return self.status.size
+
+    def send(self, send: Callable[[object], object], index: int, frame,
+             now_ns: int):
+        """
+        发送第 index 帧并记录结果，接收超时时按 max_retries 重发
+
+        超时只记录为丢失，不中断 Speed Test；其他异常（连接断开等）记录后继续抛出。
+
+        Args:
+            send: 发送并等待应答的函数
+            index: 帧序号
+            frame: 帧数据
+            now_ns: 首次发送时间（time.monotonic_ns）
+        """
+        self.send_ns[index] = now_ns
+        attempt = 0
+        while True:
+            try:
+                send(frame)
+            except socket.timeout:
+                if attempt >= self.max_retries:
+                    self.status[index] = STATUS_TIMEOUT
+                    return
+                attempt += 1
+                self.retries[index] = attempt
+                continue
+            except Exception:
+                self.status[index] = STATUS_ERROR
+                raise
+            self.ack_ns[index] = time.monotonic_ns()
+            self.status[index] = STATUS_OK
+            return
+
+    def drop(self, index: int):
+        """记录被节拍器跳过的帧"""
+        self.status[index] = STATUS_DROPPED
+
+    def summary(self) -> Dict:
+        """
+        汇总吞吐量、应答延迟分位数和丢失率
+
+        Returns:
+            Dict: 帧数、各状态帧数、重试次数、丢失率、吞吐量（帧/秒）和延迟（微秒）
+        """
+        frames = int(self.status.size)
+        acked = self.status == STATUS_OK
+        ok = int(acked.sum())
+        result = {
+            "device": self.device_name,
+            "frames": frames,
+            "ok": ok,
+            "timeout": int((self.status == STATUS_TIMEOUT).sum()),
+            "error": int((self.status == STATUS_ERROR).sum()),
+            "dropped": int((self.status == STATUS_DROPPED).sum()),
+            "not_sent": int((self.status == STATUS_NOT_SENT).sum()),
+            "retries": int(self.retries.sum()),
+            "loss": round(1 - ok / frames, 4) if frames else 0.0,
+            "throughput_fps": 0.0,
+            "latency_p50_us": 0.0,
+            "latency_p95_us": 0.0,
+            "latency_p99_us": 0.0,
+            "latency_max_us": 0.0,
+        }
+        if not ok:
+            return result
+        latency = (self.ack_ns[acked] - self.send_ns[acked]) / 1000
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+        result.update({
+            "latency_p50_us": round(float(p50), 1),
+            "latency_p95_us": round(float(p95), 1),
+            "latency_p99_us": round(float(p99), 1),
+            "latency_max_us": round(float(latency.max()), 1),
+        })
+        sent = self.send_ns[self.send_ns >= 0]
+        elapsed = int(self.ack_ns[acked].max() - sent.min())
+        if elapsed > 0:
+            result["throughput_fps"] = round(ok * 1e9 / elapsed, 1)
+        return result
+
+
+class SpeedTestResult:
+    """一次 Speed Test 所有设备的逐帧记录，负责汇总和导出"""
+
+    def __init__(self, recorders: List[FrameRecorder]):
+        self.recorders = recorders
+        self.finished_at = datetime.now()
+
+    def summaries(self) -> List[Dict]:
+        return [recorder.summary() for recorder in self.recorders]
+
+    def __origin_ns(self) -> int:
+        """所有设备最早的发送时间，导出的时间以此为零点"""
+        starts = [
+            int(recorder.send_ns[recorder.send_ns >= 0].min())
+            for recorder in self.recorders if (recorder.send_ns >= 0).any()
+        ]
+        return min(starts) if starts else 0
+
+    def export(self, directory: Optional[str] = None) -> str:
+        """
+        导出为 <目录>/speed_test_<时间>.npz 和同名 .csv
+
+        npz 中每个设备四个数组：<设备名>.send_ns / ack_ns / retries / status；
+        csv 每行一帧，时间为相对最早发送时间的微秒数。
+
+        Args:
+            directory: 导出目录，默认 SPEED_TEST_RESULT_DIR
+
+        Returns:
+            str: 导出文件的路径（不含扩展名）
+        """
+        directory = directory or os.environ.get("SPEED_TEST_RESULT_DIR",
+                                                "logs/speed_test")
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(
+            directory,
+            f"speed_test_{self.finished_at.strftime('%Y%m%d_%H%M%S')}")
+
+        arrays = {}
+        for recorder in self.recorders:
+            name = recorder.device_name
+            arrays[f"{name}.send_ns"] = recorder.send_ns
+            arrays[f"{name}.ack_ns"] = recorder.ack_ns
+            arrays[f"{name}.retries"] = recorder.retries
+            arrays[f"{name}.status"] = recorder.status
+        np.savez_compressed(base + ".npz", **arrays)
+
+        origin = self.__origin_ns()
+        frames = []
+        for recorder in self.recorders:
+            send = np.where(recorder.send_ns >= 0,
+                            (recorder.send_ns - origin) / 1000, np.nan)
+            ack = np.where(recorder.ack_ns >= 0,
+                           (recorder.ack_ns - origin) / 1000, np.nan)
+            frames.append(
+                pd.DataFrame({
+                    "device": recorder.device_name,
+                    "frame": np.arange(len(recorder)),
+                    "send_us": send,
+                    "ack_us": ack,
+                    "latency_us": ack - send,
+                    "retries": recorder.retries,
+                    "status": pd.Categorical.from_codes(
+                        recorder.status, list(STATUS_NAMES.values())),
+                }))
+        if frames:
+            pd.concat(frames).to_csv(base + ".csv",
+                                     index=False,
+                                     float_format="%.1f")
+        logger.info(f"[SpeedTest] Results exported to {base}.npz/.csv")
+        return base
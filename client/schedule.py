@@ -0,0 +1,211 @@
+import os
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from log_config import main_logger as logger
+
+
+class CellError(NamedTuple):
+    """CSV 中的一个错误单元格（行号从 1 开始，不含表头）"""
+    row: int
+    column: str
+    value: str
+    reason: str
+
+
+class ScheduleError(ValueError):
+    """CSV 校验失败，errors 列出出错的单元格（最多 MAX_REPORTED 个）"""
+
+    MAX_REPORTED = 100
+
+    def __init__(self, message: str, errors: List[CellError] = None,
+                 total: int = 0):
+        self.errors = errors or []
+        self.total = total or len(self.errors)
+        details = "; ".join(f"row {e.row} {e.column}={e.value!r}: {e.reason}"
+                            for e in self.errors[:5])
+        if self.total > 5:
+            details += f"; ... {self.total} invalid cells"
+        super().__init__(f"{message}: {details}" if details else message)
+
+
+class Schedule:
+    """
+    Speed Test 电压表：uint16 矩阵，每个设备一列，每行一个电压值
+
+    矩阵可能是 .npy 边车文件的只读内存映射，不要原地修改。
+    """
+
+    def __init__(self, matrix: np.ndarray, devices: List[str],
+                 path: Optional[str] = None):
+        self.matrix = matrix
+        self.devices = [str(name) for name in devices]
+        self.path = path
+
+    @property
+    def rows(self) -> int:
+        return self.matrix.shape[0]
+
+    def column(self, device_name: str) -> np.ndarray:
+        """设备的电压列（视图，不复制）"""
+        return self.matrix[:, self.devices.index(str(device_name))]
+
+    def __len__(self):
+        return self.rows
+
+
+def sidecar_path(path: str) -> str:
+    return path + ".npy"
+
+
+def _check_limits(matrix: np.ndarray, devices: List[str], min_v: int,
+                  max_v: int, raw: Optional[np.ndarray] = None):
+    """
+    向量化校验空值、非整数和电压范围
+
+    Args:
+        matrix: 数值矩阵（float64 或 uint16）
+        devices: 列名
+        raw: 原始文本矩阵，非数字单元格在 matrix 中为 NaN，用于报告原值
+
+    Raises:
+        ScheduleError: 存在非法单元格
+    """
+    checks = []
+    if matrix.dtype.kind == "f":
+        missing = np.isnan(matrix)
+        if raw is not None:
+            empty = pd.isna(raw)
+            checks.append((missing & ~empty, "not a number"))
+            checks.append((missing & empty, "empty"))
+        else:
+            checks.append((missing, "empty"))
+        with np.errstate(invalid="ignore"):
+            checks.append((~missing & (matrix != np.floor(matrix)),
+                           "not an integer"))
+            checks.append((matrix < min_v, f"below {min_v} mV"))
+            checks.append((matrix > max_v, f"above {max_v} mV"))
+    else:
+        checks.append((matrix < min_v, f"below {min_v} mV"))
+        checks.append((matrix > max_v, f"above {max_v} mV"))
+
+    errors: List[CellError] = []
+    total = 0
+    for mask, reason in checks:
+        cells = np.argwhere(mask)
+        total += len(cells)
+        for row, column in cells[:ScheduleError.MAX_REPORTED - len(errors)]:
+            if raw is None:
+                value = str(matrix[row, column])
+            else:
+                value = raw[row, column]
+                value = "" if pd.isna(value) else str(value)
+            errors.append(CellError(int(row) + 1, devices[column], value,
+                                    reason))
+    if total:
+        errors.sort(key=lambda e: (e.row, devices.index(e.column)))
+        raise ScheduleError("Invalid voltages in CSV", errors, total)
+
+
+def _parse_csv(path: str,
+               devices: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    解析 CSV 为 float64 矩阵
+
+    Returns:
+        (数值矩阵, 原始文本矩阵)，只有存在非数字单元格时才返回原始文本，
+        此时这些单元格在数值矩阵中为 NaN
+    """
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    if header != devices:
+        raise ScheduleError(f"CSV文件列名必须为: {devices}")
+    try:
+        return pd.read_csv(path, dtype=np.float64,
+                           engine="c").to_numpy(dtype=np.float64), None
+    except ValueError:
+        # 存在非数字单元格：按文本读取后逐列转换，NaN 即为无法解析的单元格
+        raw = pd.read_csv(path, dtype=str, keep_default_na=False,
+                          na_values=[""])
+        matrix = raw.apply(pd.to_numeric, errors="coerce").to_numpy(
+            dtype=np.float64)
+        return matrix, raw.to_numpy()
+
+
+def load_schedule(path: str, devices: List[str], min_v: int = None,
+                  max_v: int = None, use_sidecar: bool = True) -> Schedule:
+    """
+    加载 CSV 电压表
+
+    同目录下比 CSV 新的 <文件名>.npy 边车文件直接内存映射；否则解析 CSV、
+    校验后写入边车文件。电压范围每次都重新校验（上下限可能已改变）。
+
+    Args:
+        path: CSV 文件路径
+        devices: 期望的列名（设备名）
+        min_v: 最小电压，默认 VOLTAGE_MIN
+        max_v: 最大电压，默认 VOLTAGE_MAX
+        use_sidecar: 是否读写 .npy 边车文件
+
+    Raises:
+        ScheduleError: 列名错误或存在非法单元格
+    """
+    devices = [str(name) for name in devices]
+    min_v = int(os.environ.get('VOLTAGE_MIN', 0)) if min_v is None else min_v
+    max_v = int(os.environ.get('VOLTAGE_MAX',
+                               20000)) if max_v is None else max_v
+
+    sidecar = sidecar_path(path)
+    if use_sidecar and os.path.exists(sidecar) and os.path.getmtime(
+            sidecar) >= os.path.getmtime(path):
+        try:
+            matrix = np.load(sidecar, mmap_mode="r")
+        except (OSError, ValueError) as ex:
+            logger.warning(f"[Schedule] Ignore broken sidecar {sidecar}: {ex}")
+        else:
+            if (matrix.dtype == np.uint16 and matrix.ndim == 2
+                    and matrix.shape[1] == len(devices)):
+                _check_limits(matrix, devices, min_v, max_v)
+                logger.info(f"[Schedule] Mapped {os.path.basename(sidecar)} "
+                            f"({matrix.shape[0]} rows)")
+                return Schedule(matrix, devices, path)
+
+    values, raw = _parse_csv(path, devices)
+    _check_limits(values, devices, min_v, max_v, raw)
+    matrix = np.ascontiguousarray(values, dtype=np.uint16)
+    if use_sidecar:
+        try:
+            tmp = sidecar + ".tmp.npy"
+            np.save(tmp, matrix)
+            os.replace(tmp, sidecar)
+        except OSError as ex:
+            logger.warning(f"[Schedule] Write sidecar {sidecar} failed: {ex}")
+    logger.info(f"[Schedule] Parsed {os.path.basename(path)} "
+                f"({matrix.shape[0]} rows)")
+    return Schedule(matrix, devices, path)
+
+
+class ScheduleLoaderSignals(QObject):
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class ScheduleLoader(QRunnable):
+    """在线程池中加载 CSV 电压表，完成后通过信号回到 GUI 线程"""
+
+    def __init__(self, path: str, devices: List[str]):
+        super().__init__()
+        self.path = path
+        self.devices = devices
+        self.signals = ScheduleLoaderSignals()
+
+    def run(self):
+        try:
+            schedule = load_schedule(self.path, self.devices)
+        except Exception as ex:
+            logger.error(f"[Schedule] Load {self.path} failed: {ex}")
+            self.signals.failed.emit(ex)
+            return
+        self.signals.loaded.emit(schedule)
@@ -0,0 +1,90 @@
+"""测试设备的增量电压帧状态"""
+
+import os
+import unittest
+from unittest import mock
+
+from device import Device
+from protocol import ProtocolHeader
+from transport_strategy import TransportStrategy
+
+ACK_OK = bytes([0xFF, 0x00, 0x00, 0xFE])
+ENV = {
+    "PROTOCOL_TYPE": "udp",
+    "DELTA_ENCODING": "1",
+    "DELTA_KEYFRAME_INTERVAL": "100",
+    "FIXED_NUMBER": "8",
+    "VOLTAGE_MIN": "0",
+    "VOLTAGE_MAX": "20000",
+}
+
+
+class _AckTransport(TransportStrategy):
+    """记录发送的数据包并对每个包应答成功"""
+
+    def __init__(self):
+        self.sent = []
+        self.fail = False
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def send(self, packet):
+        if self.fail:
+            raise OSError("link down")
+        self.sent.append(bytes(packet))
+
+    def recv(self, buffer_size=1024):
+        return ACK_OK
+
+    @property
+    def connected(self):
+        return True
+
+
+def _is_keyframe(packet) -> bool:
+    return packet[:2] == ProtocolHeader.set_fixed_voltage
+
+
+class DeltaStateTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device = Device("127.0.0.1", 0, "Device A")
+        self.transport = _AckTransport()
+        self.device._Device__transport = self.transport
+
+    def test_heartbeat_keeps_delta_state(self):
+        """心跳后 failed_reset 不能清掉上一帧，否则每次心跳后都发全量帧"""
+        self.device.send_multi_voltage([100] * 8)
+        self.device.send_heartbeat()
+        self.device.failed_reset()
+        self.device.send_multi_voltage([100] * 7 + [200])
+        frames = [p for p in self.transport.sent if len(p) > 3]
+        self.assertTrue(_is_keyframe(frames[0]))
+        self.assertFalse(_is_keyframe(frames[1]))
+
+    def test_failed_send_forces_keyframe(self):
+        self.device.send_multi_voltage([100] * 8)
+        self.transport.fail = True
+        with self.assertRaises(OSError):
+            self.device.send_multi_voltage([200] * 8)
+        self.transport.fail = False
+        self.device.send_multi_voltage([200] * 8)
+        self.assertTrue(_is_keyframe(self.transport.sent[-1]))
+
+    def test_reconnect_forces_keyframe(self):
+        self.device.send_multi_voltage([100] * 8)
+        self.device.disconnect()
+        self.device.connect()
+        self.device.send_multi_voltage([100] * 7 + [200])
+        self.assertTrue(_is_keyframe(self.transport.sent[-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
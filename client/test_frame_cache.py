@@ -0,0 +1,114 @@
+"""测试 Speed Test 帧编译与帧缓存"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from frame_cache import CompiledSchedule, FrameCache, compile_frames
+from schedule import Schedule
+
+ENV = {"VOLTAGE_MIN": "0", "VOLTAGE_MAX": "20000", "FIXED_NUMBER": "4"}
+DEVICES = ["Device A", "Device B"]
+
+
+def _schedule(path=None, offset=0) -> Schedule:
+    matrix = (np.arange(16, dtype=np.uint16).reshape(8, 2) * 100 + offset)
+    return Schedule(matrix, DEVICES, path)
+
+
+class CompileFramesTest(unittest.TestCase):
+
+    def test_frames(self):
+        frames, index, frame_size = compile_frames(_schedule(), 0, 20000, 4)
+        self.assertEqual(frame_size, 2 + 2 * 4 + 1)
+        self.assertEqual(index["Device A"], (0, 2))
+        self.assertEqual(index["Device B"], (2 * frame_size, 2))
+        compiled = CompiledSchedule(frames.tobytes(), index, frame_size)
+        first = list(compiled.frames("Device B"))[0]
+        self.assertEqual(bytes(first[:2]), bytes([0xFF, 0x03]))
+        self.assertEqual(bytes(first[-1:]), bytes([0xFE]))
+        self.assertEqual(
+            CompiledSchedule.voltages(first).tolist(), [100, 300, 500, 700])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            compile_frames(_schedule(), 0, 20000, 3)
+        with self.assertRaises(ValueError):
+            compile_frames(_schedule(), 0, 1000, 4)
+
+
+class FrameCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, ENV)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "frames")
+
+    def csv(self, name: str) -> str:
+        """缓存键只取决于文件内容，内容不必是完整的电压表"""
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(name)
+        return path
+
+    def entries(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_compile_then_load(self):
+        path = self.csv("a.csv")
+        compiled = FrameCache(self.directory).load_or_compile(
+            _schedule(path))
+        self.assertEqual(len(self.entries()), 2)
+        expected = [bytes(f) for f in compiled.frames("Device A")]
+        # 新实例从缓存文件加载，不再编译
+        with mock.patch("frame_cache.compile_frames") as compile_mock:
+            loaded = FrameCache(self.directory).load_or_compile(
+                _schedule(path))
+        compile_mock.assert_not_called()
+        self.assertEqual(loaded.key, compiled.key)
+        self.assertEqual([bytes(f) for f in loaded.frames("Device A")],
+                         expected)
+
+    def test_key_depends_on_limits(self):
+        path = self.csv("a.csv")
+        cache = FrameCache(self.directory)
+        key = cache.key(path)
+        with mock.patch.dict(os.environ, {"VOLTAGE_MAX": "10000"}):
+            self.assertNotEqual(cache.key(path), key)
+
+    def test_in_memory_schedule_is_not_cached(self):
+        FrameCache(self.directory).load_or_compile(_schedule())
+        self.assertFalse(os.path.exists(self.directory))
+
+    def test_prune_keeps_recently_used(self):
+        cache = FrameCache(self.directory, max_entries=2)
+        keys = []
+        for i, name in enumerate(("a.csv", "b.csv", "c.csv")):
+            path = self.csv(name)
+            keys.append(cache.key(path))
+            cache.load_or_compile(_schedule(path, i))
+            # 修改时间精度可能较粗，保证先后顺序
+            stamp = time.time() - 100 + i
+            os.utime(os.path.join(self.directory, keys[-1] + ".json"),
+                     (stamp, stamp))
+        self.assertEqual(
+            self.entries(),
+            sorted(f"{k}{ext}" for k in keys[1:] for ext in (".bin", ".json")))
+
+    def test_unlimited(self):
+        cache = FrameCache(self.directory, max_entries=0)
+        for i, name in enumerate(("a.csv", "b.csv", "c.csv")):
+            cache.load_or_compile(_schedule(self.csv(name), i))
+        self.assertEqual(len(self.entries()), 6)
+        self.assertEqual(cache.prune(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""测试链路损伤参数与损伤传输"""
+
+import inspect
+import os
+import re
+import socket
+import unittest
+from unittest import mock
+
+from impairment import ImpairedTransport, ImpairmentProfile, profile_for_device
+from transport_strategy import TransportStrategy
+
+SIMU_IMPAIRMENT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               os.pardir, "simu", "impairment.py")
+
+
+class _RecordingTransport(TransportStrategy):
+
+    def __init__(self):
+        self.sent = []
+        self.replies = []
+        self._connected = False
+
+    def connect(self):
+        self._connected = True
+
+    def disconnect(self):
+        self._connected = False
+
+    def send(self, packet):
+        self.sent.append(bytes(packet))
+
+    def recv(self, buffer_size=1024):
+        return self.replies.pop(0)
+
+    @property
+    def connected(self):
+        return self._connected
+
+
+class ImpairmentProfileTest(unittest.TestCase):
+
+    def test_parse(self):
+        profile = ImpairmentProfile.parse("loss=0.05, delay=20,jitter=5,"
+                                          "reorder=0.01,dup=0.01,rate=512,"
+                                          "seed=42")
+        self.assertEqual(profile.loss, 0.05)
+        self.assertEqual(profile.delay_ms, 20)
+        self.assertEqual(profile.jitter_ms, 5)
+        self.assertEqual(profile.duplicate, 0.01)
+        self.assertEqual(profile.rate_kbps, 512)
+        self.assertEqual(profile.seed, 42)
+        self.assertTrue(profile.enabled)
+
+    def test_parse_empty(self):
+        self.assertFalse(ImpairmentProfile.parse(None).enabled)
+        self.assertFalse(ImpairmentProfile.parse("seed=1").enabled)
+
+    def test_parse_invalid(self):
+        for spec in ("loss", "bogus=1", "loss=abc"):
+            with self.assertRaises(ValueError):
+                ImpairmentProfile.parse(spec)
+
+    def test_same_as_simulator(self):
+        """上位机与模拟器各有一份 ImpairmentProfile，两份必须完全一致"""
+        with open(SIMU_IMPAIRMENT, encoding="utf-8") as f:
+            simu_source = f.read()
+        match = re.search(r"^class ImpairmentProfile:.*?(?=^\S)", simu_source,
+                          re.S | re.M)
+        self.assertIsNotNone(match)
+        self.assertEqual(inspect.getsource(ImpairmentProfile).rstrip(),
+                         match.group(0).rstrip())
+
+    def test_profile_for_device(self):
+        env = {"IMPAIRMENT": "delay=5", "IMPAIRMENT_DEVICE_A": "loss=0.5"}
+        with mock.patch.dict(os.environ, env, clear=True):
+            self.assertEqual(profile_for_device("Device A").loss, 0.5)
+            self.assertEqual(profile_for_device("Device B").delay_ms, 5)
+        with mock.patch.dict(os.environ, {"IMPAIRMENT": "seed=1"},
+                             clear=True):
+            self.assertIsNone(profile_for_device("Device A"))
+
+
+class ImpairedTransportTest(unittest.TestCase):
+
+    def test_full_loss_drops_both_directions(self):
+        inner = _RecordingTransport()
+        transport = ImpairedTransport(inner,
+                                      ImpairmentProfile(loss=1.0, seed=1),
+                                      "A")
+        transport.send(b"\xFF\x01\xFE")
+        self.assertEqual(inner.sent, [])
+        inner.replies.append(b"\xFF\x00\x00\xFE")
+        with self.assertRaises(socket.timeout):
+            transport.recv()
+
+    def test_duplicate(self):
+        inner = _RecordingTransport()
+        transport = ImpairedTransport(
+            inner, ImpairmentProfile(duplicate=1.0, seed=1), "A")
+        transport.send(b"x")
+        self.assertEqual(inner.sent, [b"x", b"x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""测试设备 I/O 调度器的串行化、心跳优先与存活记录"""
+
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from device import Device
+from io_scheduler import IOScheduler
+from transport_strategy import TransportStrategy
+
+ACK_OK = bytes([0xFF, 0x00, 0x00, 0xFE])
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+class IOSchedulerTest(unittest.TestCase):
+
+    def test_one_exchange_at_a_time(self):
+        scheduler = IOScheduler()
+        active = []
+        peak = []
+
+        def exchange(priority):
+            for _ in range(50):
+                with scheduler.lane(priority):
+                    active.append(1)
+                    peak.append(len(active))
+                    time.sleep(0.0005)
+                    active.pop()
+
+        threads = [
+            threading.Thread(target=exchange, args=(i % 2 == 0, ))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 1)
+
+    def test_priority_goes_first(self):
+        scheduler = IOScheduler()
+        order = []
+        release = threading.Event()
+
+        def holder():
+            with scheduler.lane():
+                release.wait()
+
+        def waiter(name, priority):
+            with scheduler.lane(priority):
+                order.append(name)
+
+        threads = [threading.Thread(target=holder)]
+        threads[0].start()
+        _wait_for(lambda: scheduler._IOScheduler__busy)
+        threads.append(
+            threading.Thread(target=waiter, args=("normal", False)))
+        threads[-1].start()
+        time.sleep(0.05)
+        threads.append(
+            threading.Thread(target=waiter, args=("heartbeat", True)))
+        threads[-1].start()
+        _wait_for(lambda: scheduler._IOScheduler__priority_waiting)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["heartbeat", "normal"])
+
+    def test_idle_seconds(self):
+        scheduler = IOScheduler()
+        self.assertEqual(scheduler.idle_seconds(), float("inf"))
+        scheduler.mark_alive()
+        self.assertLess(scheduler.idle_seconds(), 1)
+        scheduler.reset()
+        self.assertEqual(scheduler.idle_seconds(), float("inf"))
+
+
+class _BlockingTransport(TransportStrategy):
+    """第一次发送阻塞到 release 被设置，用于在交互进行中插入心跳"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def send(self, packet):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        if not self.entered.is_set():
+            self.entered.set()
+            self.release.wait()
+
+    def recv(self, buffer_size=1024):
+        with self.lock:
+            self.active -= 1
+        return ACK_OK
+
+    @property
+    def connected(self):
+        return True
+
+
+class DeviceSchedulingTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"PROTOCOL_TYPE": "udp"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.device = Device("127.0.0.1", 0, "Device A")
+        self.transport = _BlockingTransport()
+        self.device._Device__transport = self.transport
+        self.addCleanup(self.transport.release.set)
+
+    def test_failed_reset_keeps_serialization(self):
+        """心跳线程在每次心跳后调用 failed_reset，不能换掉正在使用的调度器"""
+        slow = threading.Thread(target=self.device.send_set_voltage,
+                                args=(1000, ),
+                                daemon=True)
+        slow.start()
+        self.transport.entered.wait(2)
+        self.device.failed_reset()
+        heartbeat = threading.Thread(target=self.device.send_heartbeat,
+                                     daemon=True)
+        heartbeat.start()
+        time.sleep(0.05)
+        # 心跳必须等待进行中的交互结束
+        self.assertTrue(heartbeat.is_alive())
+        self.transport.release.set()
+        slow.join(2)
+        heartbeat.join(2)
+        self.assertEqual(self.transport.peak, 1)
+
+    def test_failed_reset_keeps_idle_seconds(self):
+        self.transport.entered.set()
+        self.device.send_heartbeat()
+        self.device.failed_reset()
+        self.assertLess(self.device.idle_seconds(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
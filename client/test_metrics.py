@@ -0,0 +1,101 @@
+"""测试延迟直方图与指标注册表"""
+
+import threading
+import unittest
+
+from metrics import (LatencyHistogram, MetricsRegistry, bucket_index,
+                     bucket_lower_bound)
+
+
+class BucketTest(unittest.TestCase):
+
+    def test_lower_bound_round_trip(self):
+        """桶下界落回同一个桶，且不超过原值"""
+        for value in (0, 1, 31, 63, 64, 1000, 123_456, 10_000_000_000):
+            index = bucket_index(value)
+            lower = bucket_lower_bound(index)
+            self.assertLessEqual(lower, value)
+            self.assertEqual(bucket_index(lower), index)
+
+    def test_relative_error(self):
+        """对数-线性分桶的相对误差约 3%"""
+        for value in (100, 5_000, 250_000, 7_000_000):
+            lower = bucket_lower_bound(bucket_index(value))
+            self.assertLess((value - lower) / value, 1 / 32)
+
+
+class LatencyHistogramTest(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 1001):
+            histogram.record(value * 1000)
+        self.assertEqual(histogram.total, 1000)
+        self.assertEqual(histogram.min_ns, 1000)
+        self.assertEqual(histogram.max_ns, 1_000_000)
+        for percent, expected in ((50, 500_000), (95, 950_000),
+                                  (99, 990_000)):
+            value = histogram.percentile(percent)
+            self.assertLessEqual(value, expected)
+            self.assertGreater(value, expected * 0.96)
+
+    def test_percentile_clamped_to_min_max(self):
+        histogram = LatencyHistogram()
+        histogram.record(777)
+        self.assertEqual(histogram.percentile(50), 777)
+        self.assertEqual(histogram.percentile(100), 777)
+
+    def test_empty(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.percentile(99), 0)
+        self.assertEqual(histogram.summary()["count"], 0)
+
+    def test_merge(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        for value in range(100):
+            first.record(value)
+            second.record(value + 1000)
+        first.merge(second)
+        self.assertEqual(first.total, 200)
+        self.assertEqual(first.min_ns, 0)
+        self.assertEqual(first.max_ns, 1099)
+        self.assertLess(first.percentile(50), 100)
+        self.assertGreater(first.percentile(51), 1000 * 0.96)
+
+
+class MetricsRegistryTest(unittest.TestCase):
+
+    def test_snapshot_merges_thread_shards(self):
+        registry = MetricsRegistry()
+
+        def work():
+            for _ in range(100):
+                registry.record("send", "A", 1000)
+                registry.incr("sent", "A")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = registry.snapshot()
+        self.assertEqual(len(snapshot["latencies"]), 1)
+        self.assertEqual(snapshot["latencies"][0]["count"], 400)
+        self.assertEqual(snapshot["counters"], [{
+            "name": "sent",
+            "device": "A",
+            "value": 400
+        }])
+
+    def test_disabled(self):
+        registry = MetricsRegistry(enabled=False)
+        registry.record("send", None, 1000)
+        registry.incr("sent")
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot["latencies"], [])
+        self.assertEqual(snapshot["counters"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
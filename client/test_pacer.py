@@ -0,0 +1,67 @@
+"""测试 Speed Test 节拍器"""
+
+import os
+import time
+import unittest
+from unittest import mock
+
+from pacer import OVERRUN_CATCHUP, OVERRUN_DROP, FramePacer
+
+INTERVAL_NS = 2_000_000
+
+
+class FramePacerTest(unittest.TestCase):
+
+    def test_unpaced_sends_every_frame(self):
+        sent = []
+        summary = FramePacer(0).run(range(5), sent.append, 5)
+        self.assertEqual(sent, list(range(5)))
+        self.assertEqual(summary["sent"], 5)
+        self.assertEqual(summary["dropped"], 0)
+
+    def test_frames_never_sent_early(self):
+        pacer = FramePacer(INTERVAL_NS)
+        summary = pacer.run(range(10), lambda frame: None, 10)
+        self.assertEqual(summary["sent"], 10)
+        self.assertTrue((pacer.actual >= pacer.planned).all())
+        # 计划时间按绝对时间计算，总时长不会随帧数累积误差
+        self.assertGreaterEqual(int(pacer.actual[-1]), 9 * INTERVAL_NS)
+
+    def slow_first_frame(self, frame):
+        if frame == 0:
+            time.sleep(5 * INTERVAL_NS / 1e9)
+
+    def test_drop_skips_missed_slots(self):
+        pacer = FramePacer(INTERVAL_NS, policy=OVERRUN_DROP)
+        summary = pacer.run(range(10), self.slow_first_frame, 10)
+        self.assertGreater(summary["dropped"], 0)
+        self.assertEqual(summary["sent"] + summary["dropped"], 10)
+        self.assertEqual(int(pacer.actual[1]), -1)
+
+    def test_catchup_sends_late_frames(self):
+        pacer = FramePacer(INTERVAL_NS, policy=OVERRUN_CATCHUP)
+        summary = pacer.run(range(10), self.slow_first_frame, 10)
+        self.assertEqual(summary["dropped"], 0)
+        self.assertGreater(summary["lateness_max_us"], 0)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            FramePacer(-1)
+        with self.assertRaises(ValueError):
+            FramePacer(0, policy="bogus")
+
+    def test_from_env(self):
+        env = {
+            "FRAME_INTERVAL_US": "1500",
+            "PACER_SPIN_US": "50",
+            "PACER_OVERRUN": "DROP"
+        }
+        with mock.patch.dict(os.environ, env):
+            pacer = FramePacer.from_env()
+        self.assertEqual(pacer.interval_ns, 1_500_000)
+        self.assertEqual(pacer.spin_ns, 50_000)
+        self.assertEqual(pacer.policy, OVERRUN_DROP)
+
+
+if __name__ == "__main__":
+    unittest.main()
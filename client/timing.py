@@ -1,20 +1,43 @@
 import functools
 import time
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 
-from log_config import main_logger as logger
+from metrics import metrics_registry
 
 
-# 额外：一个更简洁的版本，适合生产环境
-def simple_timer(func: Callable) -> Callable:
-    """简洁版计时装饰器，只输出总时间"""
+def timed(operation: Optional[str] = None,
+          device: Optional[Callable[..., Optional[str]]] = None) -> Callable:
+    """计时装饰器，把耗时记录到指标注册表的直方图中
+
+    Args:
+        operation: 操作名称，默认使用函数名
+        device: 从被装饰函数的参数中取出设备名的函数
+    """
+
+    def decorator(func: Callable) -> Callable:
+        name = operation or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            if not metrics_registry.enabled:
+                return func(*args, **kwargs)
+            device_name = device(*args, **kwargs) if device else None
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                metrics_registry.incr(f"{name}.errors", device_name)
+                raise
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                metrics_registry.record(name, device_name, elapsed)
 
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs) -> Any:
-        start = time.perf_counter()
-        result = func(*args, **kwargs)
-        elapsed = time.perf_counter() - start
-        logger.info(f"⏱️  {func.__name__} took {elapsed * 1_000_000:.2f} μs")
-        return result
+        return wrapper
 
-    return wrapper
+    return decorator
+
+
+# 额外：一个更简洁的版本，适合生产环境
+def simple_timer(func: Callable) -> Callable:
+    """简洁版计时装饰器，只记录总时间"""
+    return timed()(func)
@@ -30,3 +30,33 @@ class TransportStrategy(ABC):
     def connected(self) -> bool:
         """连接状态"""
         pass
+
+
+class AsyncTransportStrategy(ABC):
+    """异步传输策略抽象基类，接口与 TransportStrategy 一致，方法均为协程"""
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """建立连接"""
+        pass
+
+    @abstractmethod
+    async def disconnect(self) -> None:
+        """断开连接"""
+        pass
+
+    @abstractmethod
+    async def send(self, packet: bytes) -> None:
+        """发送数据包"""
+        pass
+
+    @abstractmethod
+    async def recv(self, buffer_size: int = 1024) -> bytes:
+        """接收数据包"""
+        pass
+
+    @property
+    @abstractmethod
+    def connected(self) -> bool:
+        """连接状态"""
+        pass
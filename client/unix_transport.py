@@ -0,0 +1,153 @@
+import os
+import socket
+import tempfile
+from typing import Optional
+
+from log_config import main_logger as logger
+from transport_strategy import TransportStrategy
+
+
+def unix_socket_path(port: int, datagram: bool = False) -> str:
+    """
+    按端口号定位仿真服务器的 Unix 套接字，与 simu 的 socket_path 规则一致
+
+    目录取环境变量 UNIX_SOCKET_DIR，默认 /tmp
+    """
+    directory = os.environ.get("UNIX_SOCKET_DIR", "/tmp")
+    suffix = ".dgram.sock" if datagram else ".sock"
+    return os.path.join(directory, f"simu_{port}{suffix}")
+
+
+class UnixStreamTransport(TransportStrategy):
+    """Unix 流套接字传输策略实现，用于同一主机上的客户端与仿真服务器"""
+
+    def __init__(self, ip: str, port: int, name: str, timeout: float = 5.0):
+        self._path = unix_socket_path(port)
+        self._name = name
+        self._timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._connected = False
+
+    def connect(self) -> None:
+        """连接 Unix 流套接字"""
+        if self._connected:
+            return
+
+        try:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(self._timeout)
+            self._sock.connect(self._path)
+            self._connected = True
+            logger.info(f"[UNIX] Device {self._name} connected to {self._path}")
+        except Exception as ex:
+            logger.error(f"[UNIX] Connection failed to {self._path}: {ex}")
+            if self._sock:
+                self._sock.close()
+            raise
+
+    def disconnect(self) -> None:
+        """断开 Unix 流套接字"""
+        try:
+            self._connected = False
+            if self._sock:
+                self._sock.shutdown(socket.SHUT_RDWR)
+                self._sock.close()
+                logger.info(f"[UNIX] Device {self._name} disconnected")
+        except Exception as ex:
+            logger.warning(f"[UNIX] Disconnect error: {ex}")
+
+    def send(self, packet: bytes) -> None:
+        """发送数据包"""
+        if not self._sock:
+            raise RuntimeError("Socket not connected")
+        self._sock.sendall(packet)
+
+    def recv(self, buffer_size: int = 1024) -> bytes:
+        """接收数据包"""
+        if not self._sock:
+            raise RuntimeError("Socket not connected")
+        return self._sock.recv(buffer_size)
+
+    @property
+    def connected(self) -> bool:
+        """连接状态"""
+        return self._connected
+
+
+class UnixDatagramTransport(TransportStrategy):
+    """
+    Unix 数据报套接字传输策略实现
+
+    本地数据报不会丢失也不会乱序；客户端绑定一个临时路径，服务器按该路径回复。
+    """
+
+    def __init__(self, ip: str, port: int, name: str, timeout: float = 2.0):
+        self._path = unix_socket_path(port, datagram=True)
+        self._name = name
+        self._timeout = timeout
+        self._local_path: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self._connected = False
+
+    def connect(self) -> None:
+        """创建并绑定 Unix 数据报套接字"""
+        if self._connected:
+            return
+
+        self._local_path = os.path.join(
+            tempfile.gettempdir(), f"client_{os.getpid()}_{id(self)}.sock")
+        try:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sock.settimeout(self._timeout)
+            self._sock.bind(self._local_path)
+            self._sock.connect(self._path)
+            self._connected = True
+            logger.info(f"[UNIX_DGRAM] Device {self._name} ready to "
+                        f"communicate with {self._path}")
+        except Exception as ex:
+            logger.error(f"[UNIX_DGRAM] Connection failed to {self._path}: {ex}")
+            self._close()
+            raise
+
+    def disconnect(self) -> None:
+        """关闭套接字并删除本地路径"""
+        try:
+            self._connected = False
+            if self._sock:
+                self._close()
+                logger.info(f"[UNIX_DGRAM] Device {self._name} socket closed")
+        except Exception as ex:
+            logger.warning(f"[UNIX_DGRAM] Disconnect error: {ex}")
+
+    def send(self, packet: bytes) -> None:
+        """发送数据包"""
+        if not self._sock:
+            raise RuntimeError("Socket not connected")
+        self._sock.send(packet)
+
+    def recv(self, buffer_size: int = 1024) -> bytes:
+        """接收数据包"""
+        if not self._sock:
+            raise RuntimeError("Socket not connected")
+
+        try:
+            return self._sock.recv(buffer_size)
+        except socket.timeout:
+            logger.warning(f"[UNIX_DGRAM] Receive timeout from {self._name}")
+            raise
+
+    @property
+    def connected(self) -> bool:
+        """连接状态"""
+        return self._connected
+
+    def _close(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        if self._local_path:
+            try:
+                os.unlink(self._local_path)
+            except OSError:
+                pass
+            self._local_path = None
@@ -1,4 +1,5 @@
 from .button_panel import ButtonPanel
+from .metrics_panel import MetricsPanel
 from .section_widget import SectionWidget
 
-__all__ = ['SectionWidget', 'ButtonPanel']
+__all__ = ['SectionWidget', 'ButtonPanel', 'MetricsPanel']
@@ -1,20 +1,23 @@
 import os
 
-import pandas as pd
 from common import ButtonNames, Commands, DeviceEnums
 from log_config import main_logger as logger
-from pandas import DataFrame
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThreadPool, pyqtSignal
 from PyQt5.QtWidgets import (QFileDialog, QHBoxLayout, QLabel, QPushButton,
                              QSizePolicy, QSpinBox, QVBoxLayout, QWidget)
+from schedule import Schedule, ScheduleError, ScheduleLoader
 
 
 class ButtonPanel(QWidget):
     """自定义按钮面板"""
 
+    # 忙状态变化，可在任意线程发出，set_busy 在 GUI 线程执行
+    busy_changed = pyqtSignal(bool)
+
     def __init__(self, button_callback):
         super().__init__()
         self.button_callback = button_callback
+        self.busy_changed.connect(self.set_busy)
         self.__buttons = []
         self.__voltage_input = QSpinBox()
         self.__layout = QVBoxLayout()
@@ -23,7 +26,8 @@ class ButtonPanel(QWidget):
         v_max = os.environ.get('VOLTAGE_MAX')
         self.__voltage_min = int(v_min)
         self.__voltage_max = int(v_max)
-        self.__df: DataFrame = None
+        self.__schedule: Schedule = None
+        self.__loader: ScheduleLoader = None
         self.__file_label = QLabel("File Not Selected")
         self.__file_label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
         self.__file_label.setWordWrap(True)
@@ -42,13 +46,19 @@ class ButtonPanel(QWidget):
         return self.__voltage_input.value()
 
     @property
-    def csv_data(self):
-        if self.__df is None:
+    def schedule(self):
+        """已加载并校验的电压表，未加载时为 None"""
+        return self.__schedule
+
+    @property
+    def csv_path(self):
+        """已加载 CSV 文件的路径（帧缓存以文件内容为键）"""
+        if self.__schedule is None:
             return None
-        return self.__df
+        return self.__schedule.path
 
     def __on_btn_click(self, _, name):
-        self.set_busy(True)
+        # 电压设置按设备排队合并，连续点击只发送最新的电压，不锁定按钮
         cmd = Commands.SetVoltage
         logger.info(f"on btn click: {name} {cmd}")
         self.button_callback(cmd, name=name)
@@ -152,8 +162,26 @@ class ButtonPanel(QWidget):
         )
         if not filename:
             return
-        self.__df = pd.read_csv(filename)
-        columns = list(DeviceEnums)
-        if self.__df.columns.tolist() != columns:
-            raise ValueError(f"CSV文件列名必须为: {columns}")
-        self.__file_label.setText(os.path.basename(filename))
+        # 在线程池中解析和校验，避免大文件卡住界面
+        self.__schedule = None
+        self.__file_label.setText(f"Loading {os.path.basename(filename)}...")
+        self.__loader = ScheduleLoader(filename, list(DeviceEnums))
+        self.__loader.signals.loaded.connect(self.__on_schedule_loaded)
+        self.__loader.signals.failed.connect(self.__on_schedule_failed)
+        QThreadPool.globalInstance().start(self.__loader)
+
+    def __on_schedule_loaded(self, schedule: Schedule):
+        self.__loader = None
+        self.__schedule = schedule
+        self.__file_label.setText(
+            f"{os.path.basename(schedule.path)} ({schedule.rows} rows)")
+
+    def __on_schedule_failed(self, ex: Exception):
+        self.__loader = None
+        if isinstance(ex, ScheduleError) and ex.errors:
+            for error in ex.errors:
+                logger.error(f"CSV row {error.row}, {error.column}: "
+                             f"{error.value!r} {error.reason}")
+            self.__file_label.setText(f"Invalid CSV: {ex.total} invalid cells")
+        else:
+            self.__file_label.setText(f"Load failed: {ex}")
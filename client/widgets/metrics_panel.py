@@ -0,0 +1,48 @@
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import (QAbstractItemView, QHeaderView, QTableWidget,
+                             QTableWidgetItem)
+
+from metrics import MetricsRegistry
+
+
+class MetricsPanel(QTableWidget):
+    """延迟指标面板，定期刷新 p50/p95/p99"""
+
+    HEADERS = ["Operation", "Device", "Count", "p50 (μs)", "p95 (μs)",
+               "p99 (μs)", "Max (μs)"]
+
+    def __init__(self, registry: MetricsRegistry, interval_ms=2000):
+        super().__init__(0, len(self.HEADERS))
+        self.__registry = registry
+        self.setHorizontalHeaderLabels(self.HEADERS)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.verticalHeader().setVisible(False)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setMinimumHeight(120)
+
+        self.__timer = QTimer(self)
+        self.__timer.timeout.connect(self.refresh)
+        self.__timer.start(interval_ms)
+
+    def refresh(self):
+        """从注册表取快照并刷新表格"""
+        if not self.__registry.enabled:
+            return
+        latencies = self.__registry.snapshot()["latencies"]
+        self.setRowCount(len(latencies))
+        for row, item in enumerate(latencies):
+            values = [
+                item["operation"],
+                item["device"],
+                str(item["count"]),
+                f"{item['p50_us']:.1f}",
+                f"{item['p95_us']:.1f}",
+                f"{item['p99_us']:.1f}",
+                f"{item['max_us']:.1f}",
+            ]
+            for column, value in enumerate(values):
+                self.setItem(row, column, QTableWidgetItem(value))
+
+    def stop(self):
+        """停止刷新"""
+        self.__timer.stop()
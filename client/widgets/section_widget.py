@@ -41,10 +41,40 @@ class SectionWidget(QGroupBox):
 
         self.setLayout(layout)
 
-    def update_title(self, connected):
-        """更新标题显示状态"""
-        status = "Connected" if connected else "Not Connected"
+    def update_title(self, connected, error=""):
+        """更新标题显示状态，连接失败时在提示中显示原因"""
+        if error:
+            status = "Connect Failed"
+        else:
+            status = "Connected" if connected else "Not Connected"
         self.setTitle(f"{self.__base_title} [{status}]")
+        self.setToolTip(error)
+        self.__conn_btn.setEnabled(True)
+
+    def set_connecting(self):
+        """连接进行中，结果由 update_title 更新"""
+        self.setTitle(f"{self.__base_title} [Connecting...]")
+        self.__conn_btn.setEnabled(False)
+
+    def address(self):
+        """
+        输入的地址
+
+        Returns:
+            (ip, port)，未填写时返回 None
+
+        Raises:
+            ValueError: 端口不是整数
+        """
+        ip = self.__input1.text().strip()
+        port = self.__input2.text().strip()
+        if not ip or not port:
+            return None
+        try:
+            return ip, int(port)
+        except ValueError as ex:
+            logger.error(f"Invalid port number: {port}")
+            raise ex
 
     # ================= 按钮事件 =================
     def __on_connect(self, _):
@@ -59,8 +89,9 @@ class SectionWidget(QGroupBox):
             raise ex
 
         if self.__conn_cb:
-            ret = self.__conn_cb(ip, port, self.__base_title)
-            self.update_title(ret if ret else None)
+            # 连接在后台进行，完成后由窗口调用 update_title
+            self.set_connecting()
+            self.__conn_cb(ip, port, self.__base_title)
 
     def __on_disconnect(self):
         """断连"""
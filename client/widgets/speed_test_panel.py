@@ -0,0 +1,44 @@
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtWidgets import (QAbstractItemView, QHeaderView, QTableWidget,
+                             QTableWidgetItem)
+
+
+class SpeedTestPanel(QTableWidget):
+    """Speed Test 结果面板，每个设备一行"""
+
+    HEADERS = ["Device", "Frames", "OK", "Timeout", "Error", "Dropped",
+               "Retries", "Loss (%)", "FPS", "p50 (μs)", "p99 (μs)",
+               "Max (μs)"]
+
+    # 可以在任意线程发射，槽函数在 GUI 线程执行
+    results_ready = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__(0, len(self.HEADERS))
+        self.setHorizontalHeaderLabels(self.HEADERS)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.verticalHeader().setVisible(False)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setMinimumHeight(100)
+        self.results_ready.connect(self.show_results)
+
+    def show_results(self, summaries):
+        """显示 FrameRecorder.summary() 列表"""
+        self.setRowCount(len(summaries))
+        for row, item in enumerate(summaries):
+            values = [
+                item["device"],
+                str(item["frames"]),
+                str(item["ok"]),
+                str(item["timeout"]),
+                str(item["error"]),
+                str(item["dropped"]),
+                str(item["retries"]),
+                f"{item['loss'] * 100:.2f}",
+                f"{item['throughput_fps']:.1f}",
+                f"{item['latency_p50_us']:.1f}",
+                f"{item['latency_p99_us']:.1f}",
+                f"{item['latency_max_us']:.1f}",
+            ]
+            for column, value in enumerate(values):
+                self.setItem(row, column, QTableWidgetItem(value))
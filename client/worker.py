@@ -1,6 +1,7 @@
+import time
 from functools import partial
 
-from PyQt5.QtCore import QRunnable, QTimer
+from PyQt5.QtCore import QObject, QRunnable, QTimer, pyqtSignal
 
 from log_config import main_logger as logger
 
@@ -8,7 +9,7 @@ from log_config import main_logger as logger
 class BatchWorker(QRunnable):
     """批量工作器，一次处理多个任务"""
 
-    def __init__(self, task_func, task_list):
+    def __init__(self, task_func, task_list, callback=None):
         """
         Args:
             task_func: 任务函数，接受一个参数（任务数据）
@@ -18,6 +19,7 @@ class BatchWorker(QRunnable):
         super().__init__()
         self.task_func = task_func
         self.task_list = task_list
+        self.callback = callback
 
     def run(self):
         """在线程中执行批量任务"""
@@ -30,3 +32,40 @@ class BatchWorker(QRunnable):
             except Exception as e:
                 results.append((task_data, False, str(e)))
         logger.info("BatchWorker finished all tasks and triggered callback")
+        if self.callback:
+            self.callback(results)
+
+
+class ConnectSignals(QObject):
+    # (设备名, 是否已连接, 错误信息)
+    finished = pyqtSignal(str, bool, str)
+
+
+class ConnectWorker(QRunnable):
+    """在线程池中连接单个设备，结果通过信号回到 GUI 线程"""
+
+    def __init__(self, connect_func, ip, port, name, signals: ConnectSignals):
+        """
+        Args:
+            connect_func: 连接函数，接受 (ip, port, name)，返回是否已连接
+            signals: 共享的信号对象
+        """
+        super().__init__()
+        self.connect_func = connect_func
+        self.ip = ip
+        self.port = port
+        self.name = name
+        self.signals = signals
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            connected = bool(self.connect_func(self.ip, self.port, self.name))
+        except Exception as e:
+            logger.error(f"Connect {self.name} failed after "
+                         f"{time.monotonic() - start:.2f}s: {e}")
+            self.signals.finished.emit(self.name, False, str(e))
+            return
+        logger.info(f"Connect {self.name}: {connected} in "
+                    f"{time.monotonic() - start:.2f}s")
+        self.signals.finished.emit(self.name, connected, "")
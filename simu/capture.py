@@ -0,0 +1,212 @@
+# capture.py
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterator, NamedTuple, Optional, Union
+
+# 文件头：魔数 + 版本
+FILE_MAGIC = b"SIMUCAP"
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct("<7sB")
+
+# 记录头：时间戳(ns) 会话号 方向 载荷长度
+RECORD_HEADER = struct.Struct("<QIBI")
+
+# 记录方向
+DIR_IN = 0  # 对端 -> 服务器
+DIR_OUT = 1  # 服务器 -> 对端
+DIR_OPEN = 2  # 会话开始，载荷为 JSON 元数据
+DIR_CLOSE = 3  # 会话结束
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class CaptureRecord(NamedTuple):
+    """抓包记录"""
+    ts_ns: int
+    session: int
+    direction: int
+    payload: bytes
+
+
+class CaptureWriter:
+    """
+    抓包写入器
+
+    记录追加到内存映射文件中：文件按段预分配，写满后扩容并重新映射，
+    写入只是一次内存拷贝，不产生系统调用。关闭时截断到实际长度；
+    进程异常退出时，未写入的预分配区域全为 0，读取器遇到时间戳为 0 的记录即停止。
+    """
+
+    def __init__(self, path: str, segment_size: int = 16 * 1024 * 1024):
+        """
+        初始化抓包写入器
+
+        Args:
+            path: 抓包文件路径（已存在则覆盖）
+            segment_size: 每次扩容的字节数
+        """
+        self.path = path
+        self.segment_size = max(segment_size, mmap.PAGESIZE)
+        self.lock = threading.Lock()
+        self.file = open(path, "w+b")
+        self.size = self.segment_size
+        self.file.truncate(self.size)
+        self.mm = mmap.mmap(self.file.fileno(), self.size)
+        FILE_HEADER.pack_into(self.mm, 0, FILE_MAGIC, FILE_VERSION)
+        self.offset = FILE_HEADER.size
+        self.next_session = 1
+        self.closed = False
+        self.stats = {"records": 0, "bytes": 0, "sessions": 0}
+
+    def open_session(self, protocol: str, peer: tuple, **meta) -> int:
+        """
+        开始一个会话（TCP 连接或 UDP 对端）
+
+        Args:
+            protocol: 协议（tcp/udp）
+            peer: 对端地址（(ip, port) 或 Unix 套接字路径）
+            **meta: 其他元数据，如服务器端口
+
+        Returns:
+            int: 会话号
+        """
+        with self.lock:
+            session = self.next_session
+            self.next_session += 1
+        peer = list(peer) if isinstance(peer, (tuple, list)) else [peer]
+        info = {"protocol": protocol, "peer": peer, **meta}
+        self._append(session, DIR_OPEN,
+                     json.dumps(info, ensure_ascii=False).encode("utf-8"))
+        self.stats["sessions"] += 1
+        return session
+
+    def close_session(self, session: int):
+        """结束会话"""
+        self._append(session, DIR_CLOSE, b"")
+
+    def record(self, session: int, direction: int, payload: Buffer):
+        """
+        记录一段收发数据
+
+        Args:
+            session: 会话号
+            direction: DIR_IN 或 DIR_OUT
+            payload: 原始字节（含协议长度头）
+        """
+        self._append(session, direction, payload)
+
+    def _append(self, session: int, direction: int, payload: Buffer):
+        size = RECORD_HEADER.size + len(payload)
+        ts_ns = time.time_ns()
+        with self.lock:
+            if self.closed:
+                return
+            if self.offset + size > self.size:
+                self._grow(self.offset + size)
+            RECORD_HEADER.pack_into(self.mm, self.offset, ts_ns, session,
+                                    direction, len(payload))
+            start = self.offset + RECORD_HEADER.size
+            self.mm[start:start + len(payload)] = payload
+            self.offset += size
+            self.stats["records"] += 1
+            self.stats["bytes"] += len(payload)
+
+    def _grow(self, required: int):
+        """扩容并重新映射（持锁调用）"""
+        new_size = self.size
+        while new_size < required:
+            new_size += self.segment_size
+        self.mm.flush()
+        self.mm.close()
+        self.file.truncate(new_size)
+        self.mm = mmap.mmap(self.file.fileno(), new_size)
+        self.size = new_size
+
+    def flush(self):
+        """将已写入的数据刷到磁盘"""
+        with self.lock:
+            if not self.closed:
+                self.mm.flush()
+
+    def close(self):
+        """关闭文件并截断到实际长度"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.mm.flush()
+            self.mm.close()
+            self.file.truncate(self.offset)
+            self.file.close()
+
+
+class CaptureReader:
+    """抓包文件读取器（内存映射，只读）"""
+
+    def __init__(self, path: str):
+        """
+        打开抓包文件
+
+        Raises:
+            ValueError: 文件格式错误
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            self.file.close()
+            raise ValueError(f"抓包文件过短: {path}")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            self.close()
+            raise ValueError(f"不是有效的抓包文件: {path}")
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        offset = FILE_HEADER.size
+        end = len(self.mm)
+        while offset + RECORD_HEADER.size <= end:
+            ts_ns, session, direction, length = RECORD_HEADER.unpack_from(
+                self.mm, offset)
+            if ts_ns == 0:
+                # 预分配但未写入的区域
+                break
+            start = offset + RECORD_HEADER.size
+            if start + length > end:
+                break
+            yield CaptureRecord(ts_ns, session, direction,
+                                self.mm[start:start + length])
+            offset = start + length
+
+    def sessions(self) -> Dict[int, dict]:
+        """读取所有会话的元数据"""
+        result = {}
+        for record in self:
+            if record.direction == DIR_OPEN:
+                result[record.session] = json.loads(
+                    record.payload.decode("utf-8"))
+        return result
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_capture(path: Optional[str]) -> Optional[CaptureWriter]:
+    """按配置路径创建抓包写入器，路径为空时不抓包"""
+    if not path:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return CaptureWriter(path)
@@ -1,11 +1,16 @@
 # client_handler.py
+import functools
 import socket
 import threading
 import time
 from typing import Any, Callable, Optional
 
-from protocol import ByteStreamProtocol
+from capture import DIR_IN, DIR_OUT, CaptureWriter
+from dispatcher import Dispatcher
+from metrics import ServerMetrics
+from protocol import ByteStreamProtocol, FrameChunk, ProtocolError
 from utils.logger import setup_logger
+from write_engine import OutboundQueue, WriteEngine
 
 
 class ClientHandler:
@@ -16,7 +21,19 @@ class ClientHandler:
                  client_address: tuple,
                  protocol: ByteStreamProtocol,
                  on_message: Optional[Callable] = None,
-                 timeout: int = 30):
+                 metrics: Optional[ServerMetrics] = None,
+                 on_close: Optional[Callable[["ClientHandler"], None]] = None,
+                 write_engine: Optional[WriteEngine] = None,
+                 max_queued_frames: int = 1024,
+                 slow_consumer_policy: str = "drop",
+                 max_queued_bytes: int = 4 * 1024 * 1024,
+                 write_high_watermark: int = 256 * 1024,
+                 write_low_watermark: int = 64 * 1024,
+                 on_chunk: Optional[Callable] = None,
+                 recv_buffer_size: int = 4096,
+                 dispatcher: Optional[Dispatcher] = None,
+                 capture: Optional[CaptureWriter] = None,
+                 capture_protocol: str = "tcp"):
         """
         初始化客户端处理器
 
@@ -25,18 +42,59 @@ class ClientHandler:
             client_address: 客户端地址 (ip, port)
             protocol: 协议处理器
             on_message: 消息处理回调函数
-            timeout: 超时时间（秒）
+            metrics: 所属服务器的聚合指标
+            on_close: 连接关闭时的回调（用于从服务器连接表注销）
+            write_engine: 发送引擎，为 None 时在调用线程直接发送
+            max_queued_frames: 发送队列最多缓存的帧数
+            slow_consumer_policy: 发送队列满时的策略，drop 丢弃新帧，
+                disconnect 断开连接
+            max_queued_bytes: 发送队列最多缓存的字节数
+            write_high_watermark: 排队字节数达到该值时暂停读取对端数据
+            write_low_watermark: 排队字节数回落到该值时恢复读取
+            on_chunk: 流式大数据包分片回调，接收(FrameChunk, 客户端地址)，
+                在最后一个分片返回响应数据
+            recv_buffer_size: 单次 recv 读取的最大字节数
+            dispatcher: 消息分发器，为 None 时在接收线程直接处理消息
+            capture: 抓包写入器，记录该连接收发的原始字节
+            capture_protocol: 抓包会话中记录的协议名称
         """
         self.client_socket = client_socket
         self.client_address = client_address
         self.protocol = protocol
+        # 每个连接独立的解码缓冲区，协议对象只用于打包
+        self.decoder = protocol.new_decoder()
         self.on_message = on_message
-        self.timeout = timeout
+        self.on_chunk = on_chunk
+        self.recv_buffer_size = recv_buffer_size
+        self.dispatcher = dispatcher
+        self.capture = capture
+        self.capture_session = 0
+        self.capture_protocol = capture_protocol
+        self.metrics = metrics
+        self.on_close = on_close
+        self.client_id = f"{client_address[0]}:{client_address[1]}:{id(self)}"
         self.running = False
+        self.closed = False
+        self._close_lock = threading.Lock()
         self.thread: Optional[threading.Thread] = None
 
-        # 设置套接字超时
-        self.client_socket.settimeout(timeout)
+        # 发送队列，由服务器的发送引擎统一刷新
+        self.write_engine = write_engine
+        self.slow_consumer_policy = slow_consumer_policy
+        self.outbound = OutboundQueue(client_socket,
+                                      max_frames=max_queued_frames,
+                                      metrics=metrics,
+                                      on_error=self._on_send_error,
+                                      max_bytes=max_queued_bytes,
+                                      high_watermark=write_high_watermark,
+                                      low_watermark=write_low_watermark)
+        self._send_lock = threading.Lock()
+
+        # 空闲超时由服务器的 IdleMonitor 统一管理，套接字保持阻塞模式
+        self.client_socket.settimeout(None)
+        self.opened_at = time.monotonic()
+        self.last_read = self.opened_at
+        self.last_write = self.opened_at
 
         # 创建日志记录器
         self.logger = setup_logger(
@@ -55,6 +113,12 @@ class ClientHandler:
     def start(self):
         """启动客户端处理线程"""
         self.running = True
+        if self.capture:
+            local = self.client_socket.getsockname()
+            self.capture_session = self.capture.open_session(
+                self.capture_protocol,
+                self.client_address,
+                server_address=local if isinstance(local, str) else local[1])
         self.thread = threading.Thread(target=self._handle_client, daemon=True)
         self.thread.start()
         self.logger.info(f"客户端连接处理器已启动")
@@ -62,20 +126,43 @@ class ClientHandler:
     def stop(self):
         """停止客户端处理"""
         self.running = False
+        self._shutdown_socket()
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=2)
         self._close_connection()
         self.logger.info(f"客户端连接处理器已停止")
 
+    def expire(self, reason: str):
+        """
+        因超时关闭连接（由 IdleMonitor 调用）
+
+        Args:
+            reason: 超时原因
+        """
+        self.logger.warning(f"连接超时: {reason}")
+        self.running = False
+        self._shutdown_socket()
+
+    def _shutdown_socket(self):
+        """关闭套接字读写，唤醒阻塞在 recv 上的处理线程"""
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
     def _handle_client(self):
         """处理客户端连接"""
         try:
             self.logger.info(f"客户端已连接: {self.client_address}")
 
             while self.running:
+                # 发送队列超过高水位时暂停读取，让背压传导到对端
+                if not self.outbound.wait_readable(1.0):
+                    continue
+
                 try:
                     # 接收数据
-                    data = self.client_socket.recv(4096)
+                    data = self.client_socket.recv(self.recv_buffer_size)
 
                     if not data:
                         self.logger.info("客户端断开连接")
@@ -84,23 +171,24 @@ class ClientHandler:
                     # 更新统计信息
                     self.stats["bytes_received"] += len(data)
                     self.stats["last_active"] = time.time()
+                    self.last_read = time.monotonic()
+                    if self.metrics:
+                        self.metrics.bytes_received.inc(len(data))
+                    if self.capture:
+                        self.capture.record(self.capture_session, DIR_IN,
+                                            data)
 
                     # 处理数据
-                    self._process_data(data)
-
-                except socket.timeout:
-                    # 超时检查
-                    if time.time() - self.stats["last_active"] > self.timeout:
-                        self.logger.warning("连接超时")
+                    if not self._process_data(data):
                         break
-                    continue
 
                 except ConnectionResetError:
                     self.logger.warning("客户端强制关闭连接")
                     break
 
                 except Exception as e:
-                    self.logger.error(f"处理数据时出错: {e}")
+                    if self.running:
+                        self.logger.error(f"处理数据时出错: {e}")
                     break
 
         except Exception as e:
@@ -109,20 +197,101 @@ class ClientHandler:
         finally:
             self._close_connection()
 
-    def _process_data(self, data: bytes):
-        """处理接收到的数据"""
+    def _process_data(self, data: bytes) -> bool:
+        """
+        处理接收到的数据
+
+        Args:
+            data: 接收到的字节流
+
+        Returns:
+            bool: 字节流是否仍可继续解析，协议错误时返回 False 并关闭连接
+        """
+        try:
+            items = self.decoder.feed(data)
+        except ProtocolError as e:
+            self.logger.error(f"协议错误，关闭连接: {e}")
+            if self.metrics:
+                self.metrics.errors.inc()
+            self.send(self.protocol.create_response(success=False,
+                                                    message=f"协议错误: {e}"))
+            self._wait_drained(1.0)
+            return False
+
+        for item in items:
+            if isinstance(item, FrameChunk):
+                if item.final:
+                    self._count_message()
+                task = functools.partial(self._handle_chunk, item)
+            else:
+                self._count_message()
+                task = functools.partial(self._handle_message, item)
+
+            if not self.dispatcher:
+                task()
+                continue
+            if self.dispatcher.submit(self.client_id, task):
+                continue
+
+            # 分发队列已满：整条消息直接回复繁忙，流式分片缺失则无法继续
+            if isinstance(item, FrameChunk):
+                self.logger.error("分发队列已满，丢弃数据分片并关闭连接")
+                return False
+            self.send(
+                self.protocol.create_response(success=False,
+                                              message="服务器繁忙，消息已丢弃"))
+        return True
+
+    def _count_message(self):
+        self.stats["messages_received"] += 1
+        if self.metrics:
+            self.metrics.messages_received.inc()
+
+    def _handle_message(self, message: Any):
+        """处理一条完整消息并发送响应"""
+        started = time.perf_counter()
         try:
-            self.logger.info(f"接收到数据: {data}")
-            default_response = self.protocol.create_response(
-                success=True,
-                message="消息已接收",
-                data={"received_message": "Message Received"})
-            self.send(default_response)
+            self.logger.debug(f"接收到消息: {message}")
+            if self.on_message:
+                response = self.on_message(message, self.client_address)
+            else:
+                response = self.protocol.create_response(
+                    success=True,
+                    message="消息已接收",
+                    data={"received_message": "Message Received"})
+            if response is not None:
+                self.send(response)
         except Exception as e:
-            self.logger.error(f"解析数据时出错: {e}")
+            self.logger.error(f"处理消息时出错: {e}")
+            if self.metrics:
+                self.metrics.errors.inc()
             error_response = self.protocol.create_response(
                 success=False, message=f"数据处理错误: {e}")
             self.send(error_response)
+        finally:
+            if self.metrics:
+                self.metrics.handle_seconds.observe(time.perf_counter() -
+                                                    started)
+
+    def _handle_chunk(self, chunk: FrameChunk):
+        """处理流式大数据包的一个分片"""
+        if not self.on_chunk:
+            if chunk.final:
+                self.logger.warning(
+                    f"未设置分片处理器，丢弃 {chunk.frame_length} 字节的数据包")
+            return
+        try:
+            response = self.on_chunk(chunk, self.client_address)
+            if chunk.final and response is not None:
+                self.send(response)
+        except Exception as e:
+            self.logger.error(f"处理数据分片时出错: {e}")
+            if self.metrics:
+                self.metrics.errors.inc()
+            if chunk.final:
+                self.send(
+                    self.protocol.create_response(
+                        success=False, message=f"数据处理错误: {e}"))
 
     def send(self, data: Any) -> bool:
         """
@@ -132,26 +301,100 @@ class ClientHandler:
             data: 要发送的数据
 
         Returns:
-            bool: 是否发送成功
+            bool: 是否已进入发送队列
         """
         try:
             packed_data = self.protocol.pack(data)
-            self.client_socket.sendall(packed_data)
-
-            # 更新统计信息
-            self.stats["bytes_sent"] += len(packed_data)
-            self.stats["messages_sent"] += 1
-            self.stats["last_active"] = time.time()
+        except Exception as e:
+            self.logger.error(f"打包数据失败: {e}")
+            if self.metrics:
+                self.metrics.errors.inc()
+            return False
 
+        if self.send_frame(packed_data):
             self.logger.debug(f"发送消息: {data}")
             return True
+        return False
 
-        except Exception as e:
-            self.logger.error(f"发送数据失败: {e}")
-            return False
+    def send_frame(self, frame: bytes) -> bool:
+        """
+        发送已编码的帧（不阻塞）
+
+        Args:
+            frame: 已编码的帧，广播时所有连接共享同一个对象
+
+        Returns:
+            bool: 是否已进入发送队列
+        """
+        if self.write_engine:
+            if not self.write_engine.submit(self.outbound, frame):
+                self._on_slow_consumer()
+                return False
+        else:
+            try:
+                with self._send_lock:
+                    self.client_socket.sendall(frame)
+            except Exception as e:
+                self.logger.error(f"发送数据失败: {e}")
+                if self.metrics:
+                    self.metrics.errors.inc()
+                return False
+            if self.metrics:
+                self.metrics.bytes_sent.inc(len(frame))
+
+        if self.capture:
+            self.capture.record(self.capture_session, DIR_OUT, frame)
+
+        # 更新统计信息
+        self.stats["bytes_sent"] += len(frame)
+        self.stats["messages_sent"] += 1
+        self.stats["last_active"] = time.time()
+        self.last_write = time.monotonic()
+        if self.metrics:
+            self.metrics.messages_sent.inc()
+        return True
+
+    def _wait_drained(self, timeout: float):
+        """关闭连接前等待发送队列清空（尽力而为）"""
+        if not self.write_engine:
+            return
+        deadline = time.monotonic() + timeout
+        while (self.outbound.depth and not self.outbound.closed
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+
+    def _on_slow_consumer(self):
+        """发送队列已满时按策略处理"""
+        if self.closed:
+            return
+        if self.metrics:
+            self.metrics.frames_dropped.inc()
+        if self.slow_consumer_policy == "disconnect":
+            if self.metrics:
+                self.metrics.slow_consumer_disconnects.inc()
+            self.expire("发送队列已满（慢消费者）")
+        else:
+            self.logger.debug("发送队列已满，丢弃新帧")
+
+    def _on_send_error(self, error: Exception):
+        """发送引擎写入失败时关闭连接"""
+        if self.metrics:
+            self.metrics.errors.inc()
+        if self.running:
+            self.logger.error(f"发送数据失败: {error}")
+            self.running = False
+            self._shutdown_socket()
 
     def _close_connection(self):
         """关闭连接"""
+        with self._close_lock:
+            if self.closed:
+                return
+            self.closed = True
+        if self.write_engine:
+            self.write_engine.discard(self.outbound)
+        if self.capture:
+            self.capture.close_session(self.capture_session)
         try:
             self.client_socket.close()
             self.logger.info(f"连接已关闭")
@@ -166,9 +409,20 @@ class ClientHandler:
         except:
             pass
 
+        # 通知服务器注销，保证只通知一次
+        if self.on_close:
+            try:
+                self.on_close(self)
+            except Exception as e:
+                self.logger.error(f"连接关闭回调出错: {e}")
+
     def get_stats(self) -> dict:
         """获取统计信息"""
         stats = self.stats.copy()
         stats["duration"] = time.time() - stats["connected_at"]
         stats["client_address"] = self.client_address
+        stats["queued_frames"] = self.outbound.depth
+        stats["queued_bytes"] = self.outbound.queued_bytes
+        stats["reading_paused"] = not self.outbound.readable.is_set()
+        stats["outbound"] = self.outbound.stats.copy()
         return stats
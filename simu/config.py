@@ -1,46 +1,297 @@
 # config.py
+import copy
+import ipaddress
 import json
 import os
-from typing import Dict, List, Any
+import threading
+import time
+from collections import abc
+from dataclasses import MISSING, dataclass, field, fields
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, get_origin
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class ServerSettings:
+    """server 配置段"""
+    host: str = "0.0.0.0"
+    default_port: int = 8888
+    max_connections: int = 100
+    receive_buffer_size: int = 4096
+    timeout: float = 30
+    write_idle_timeout: float = 0
+    max_lifetime: float = 0
+    idle_check_interval: float = 1.0
+    max_queued_frames: int = 1024
+    max_queued_bytes: int = 4194304
+    write_high_watermark: int = 262144
+    write_low_watermark: int = 65536
+    slow_consumer_policy: str = "drop"
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    """logging 配置段"""
+    level: str = "INFO"
+    format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    file: Optional[str] = "logs/tcp_server.log"
+
+
+@dataclass(frozen=True)
+class ProtocolSettings:
+    """protocol 配置段"""
+    header_size: int = 4
+    max_packet_size: int = 65536
+    stream_threshold: int = 0
+    max_stream_size: int = 67108864
+    encoding: str = "utf-8"
+    framing: str = "length"
+    channels: int = 256
+
+
+@dataclass(frozen=True)
+class DispatchSettings:
+    """dispatch 配置段"""
+    workers: int = 4
+    queue_size: int = 1024
+
+
+@dataclass(frozen=True)
+class ProcessPoolSettings:
+    """process_pool 配置段"""
+    workers: int = 0
+    shm_threshold: int = 65536
+    start_method: str = "spawn"
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    """metrics 配置段"""
+    host: str = "0.0.0.0"
+    port: int = 0
+
+
+@dataclass(frozen=True)
+class CaptureSettings:
+    """capture 配置段"""
+    path: str = ""
+
+
+@dataclass(frozen=True)
+class ImpairmentSettings:
+    """impairment 配置段（仅 UDP 服务器）"""
+    profile: str = ""
+    peers: Mapping[str, str] = field(
+        default_factory=lambda: MappingProxyType({}))
+
+
+@dataclass(frozen=True)
+class UnixSettings:
+    """unix 配置段"""
+    socket_dir: str = "/tmp"
+
+
+@dataclass(frozen=True)
+class MulticastSettings:
+    """multicast 配置段（仅 UDP 服务器），group 为空表示不加入组播"""
+    group: str = ""
+    port: int = 9990
+    interface: str = "0.0.0.0"
+
+
+# 配置段名与配置段类型：默认值只写在配置段类型中，
+# Config.DEFAULT_CONFIG 由此生成
+_SECTIONS = {
+    "server": ServerSettings,
+    "logging": LoggingSettings,
+    "protocol": ProtocolSettings,
+    "dispatch": DispatchSettings,
+    "process_pool": ProcessPoolSettings,
+    "metrics": MetricsSettings,
+    "capture": CaptureSettings,
+    "impairment": ImpairmentSettings,
+    "unix": UnixSettings,
+    "multicast": MulticastSettings,
+}
+
+
+def _default_config() -> Dict:
+    """由各配置段类型的默认值生成默认配置字典"""
+    config = {}
+    for name, cls in _SECTIONS.items():
+        section = {}
+        for f in fields(cls):
+            if f.default_factory is not MISSING:
+                value = f.default_factory()
+            else:
+                value = f.default
+            section[f.name] = dict(value) if isinstance(value,
+                                                        abc.Mapping) else value
+        config[name] = section
+    return config
+
+
+def _coerce(value: Any, annotation: Any) -> Any:
+    """按字段类型转换配置值"""
+    if value is None:
+        return None
+    if annotation in (int, float, str):
+        return annotation(value)
+    if get_origin(annotation) is abc.Mapping:
+        # 快照不可变，映射类型的配置项转换为只读视图
+        if not isinstance(value, abc.Mapping):
+            raise TypeError(value)
+        return MappingProxyType(dict(value))
+    return value
+
+
+def _build_section(cls, section: Any):
+    """由字典构造配置段，缺省字段使用默认值"""
+    if not isinstance(section, dict):
+        section = {}
+    values = {}
+    for f in fields(cls):
+        if f.name in section:
+            try:
+                values[f.name] = _coerce(section[f.name], f.type)
+            except (TypeError, ValueError):
+                raise ValueError(
+                    f"配置项 {f.name} 的值 {section[f.name]!r} 类型错误")
+    return cls(**values)
+
+
+def _flatten(data: Dict, prefix: str, out: Dict[str, Any]):
+    """预先展开所有点分路径，get 时只需一次字典查找"""
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        out[path] = value
+        if isinstance(value, dict):
+            _flatten(value, f"{path}.", out)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    不可变的配置快照
+
+    各配置段已转换为带类型的只读对象，按属性访问无需解析路径；
+    配置变化时整体替换为新快照，持有旧快照的代码看到的始终是一致的配置。
+    """
+    server: ServerSettings
+    logging: LoggingSettings
+    protocol: ProtocolSettings
+    dispatch: DispatchSettings
+    process_pool: ProcessPoolSettings
+    metrics: MetricsSettings
+    capture: CaptureSettings
+    impairment: ImpairmentSettings
+    unix: UnixSettings
+    multicast: MulticastSettings
+    version: int = 0
+    values: Mapping[str, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict, version: int = 0) -> "ConfigSnapshot":
+        """
+        由配置字典构造快照并校验
+
+        Raises:
+            ValueError: 配置值非法
+        """
+        sections = {
+            name: _build_section(section_cls, data.get(name))
+            for name, section_cls in _SECTIONS.items()
+        }
+        snapshot = cls(**sections, version=version)
+        snapshot._validate()
+        flat: Dict[str, Any] = {}
+        _flatten(copy.deepcopy(data), "", flat)
+        object.__setattr__(snapshot, "values", MappingProxyType(flat))
+        return snapshot
+
+    def _validate(self):
+        if self.protocol.header_size not in (2, 4, 8):
+            raise ValueError("protocol.header_size 必须是 2/4/8")
+        if self.protocol.framing not in ("length", "device"):
+            raise ValueError("protocol.framing 必须是 length 或 device")
+        if self.server.slow_consumer_policy not in ("drop", "disconnect"):
+            raise ValueError("server.slow_consumer_policy 必须是 drop 或 disconnect")
+        if self.multicast.group:
+            try:
+                ipaddress.IPv4Address(self.multicast.group)
+            except ValueError:
+                raise ValueError(
+                    f"multicast.group 不是 IPv4 地址: {self.multicast.group}")
+        if self.logging.level.upper() not in ("DEBUG", "INFO", "WARNING",
+                                              "ERROR", "CRITICAL"):
+            raise ValueError(f"未知的日志级别: {self.logging.level}")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """按点分路径读取原始配置值"""
+        value = self.values.get(key, _MISSING)
+        return default if value is _MISSING else value
+
 
 class Config:
     """配置管理器"""
-    DEFAULT_CONFIG = {
-        "server": {
-            "host": "0.0.0.0",
-            "default_port": 8888,
-            "max_connections": 100,
-            "receive_buffer_size": 4096,
-            "timeout": 30
-        },
-        "logging": {
-            "level": "INFO",
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            "file": "tcp_server.log"
-        },
-        "protocol": {
-            "header_size": 4,
-            "max_packet_size": 65536,
-            "encoding": "utf-8"
-        }
-    }
-    
+    DEFAULT_CONFIG = _default_config()
+
     def __init__(self, config_file: str = None):
-        self.config = self.DEFAULT_CONFIG.copy()
-        
+        # 深拷贝，避免多个实例共享并修改嵌套的默认值
+        self.config = copy.deepcopy(self.DEFAULT_CONFIG)
+        self.config_file = config_file
+        # set() 设置的运行时覆盖（如命令行参数），重新加载文件后再叠加一次
+        self.overrides: Dict = {}
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[ConfigSnapshot, ConfigSnapshot],
+                                         None]] = []
+        self._snapshot = ConfigSnapshot.from_dict(self.config)
+
         if config_file and os.path.exists(config_file):
             self.load_config(config_file)
-    
+
     def load_config(self, config_file: str):
         """从文件加载配置"""
         try:
             with open(config_file, 'r', encoding='utf-8') as f:
                 loaded_config = json.load(f)
-                self._deep_update(self.config, loaded_config)
+            with self._lock:
+                new_config = copy.deepcopy(self.config)
+                self._deep_update(new_config, loaded_config)
+                change = self._replace(new_config)
+            self._notify(change)
             print(f"✓ 配置已从 {config_file} 加载")
         except Exception as e:
             print(f"✗ 加载配置文件失败: {e}")
-    
+
+    def reload(self, config_file: str = None) -> bool:
+        """
+        从文件重新加载配置（以默认配置为基础，再叠加 set() 的覆盖），
+        校验通过后原子替换快照
+
+        Args:
+            config_file: 配置文件路径，默认使用初始化时的文件
+
+        Returns:
+            bool: 是否已替换为新配置
+        """
+        config_file = config_file or self.config_file
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                loaded_config = json.load(f)
+            # 叠加覆盖与替换快照在同一把锁内，并发的 set() 不会丢失
+            with self._lock:
+                new_config = copy.deepcopy(self.DEFAULT_CONFIG)
+                self._deep_update(new_config, loaded_config)
+                self._deep_update(new_config, copy.deepcopy(self.overrides))
+                change = self._replace(new_config)
+            return self._notify(change)
+        except Exception as e:
+            print(f"✗ 重新加载配置文件失败，保留当前配置: {e}")
+            return False
+
     def save_config(self, config_file: str):
         """保存配置到文件"""
         try:
@@ -49,7 +300,7 @@ class Config:
             print(f"✓ 配置已保存到 {config_file}")
         except Exception as e:
             print(f"✗ 保存配置文件失败: {e}")
-    
+
     def _deep_update(self, target: Dict, source: Dict) -> None:
         """深度更新字典"""
         for key, value in source.items():
@@ -57,28 +308,147 @@ class Config:
                 self._deep_update(target[key], value)
             else:
                 target[key] = value
-    
+
+    def _replace(self, new_config: Dict):
+        """
+        校验并替换配置（调用方持有 _lock）
+
+        Returns:
+            (旧快照, 新快照, 订阅者)，配置未变化时返回 None
+
+        Raises:
+            ValueError: 配置值非法（当前配置保持不变）
+        """
+        old = self._snapshot
+        new = ConfigSnapshot.from_dict(new_config, old.version + 1)
+        if new.values == old.values:
+            return None
+        self.config = new_config
+        self._snapshot = new
+        return old, new, list(self._subscribers)
+
+    @staticmethod
+    def _notify(change) -> bool:
+        """在锁外通知订阅者，返回配置是否已变化"""
+        if change is None:
+            return False
+        old, new, subscribers = change
+        for callback in subscribers:
+            try:
+                callback(old, new)
+            except Exception as e:
+                print(f"✗ 配置变更回调出错: {e}")
+        return True
+
+    def snapshot(self) -> ConfigSnapshot:
+        """获取当前配置快照"""
+        return self._snapshot
+
+    def subscribe(
+        self, callback: Callable[[ConfigSnapshot, ConfigSnapshot], None]
+    ) -> Callable[[], None]:
+        """
+        订阅配置变更
+
+        Args:
+            callback: 回调函数，接收(旧快照, 新快照)
+
+        Returns:
+            Callable: 取消订阅的函数
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
     def get(self, key: str, default: Any = None) -> Any:
-        """获取配置项"""
-        keys = key.split('.')
-        value = self.config
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-        
-        return value
-    
+        """获取配置项（查预先展开的路径表）"""
+        return self._snapshot.get(key, default)
+
     def set(self, key: str, value: Any) -> None:
-        """设置配置项"""
+        """设置配置项（作为覆盖保留，重新加载配置文件后仍然生效）"""
+        with self._lock:
+            new_config = copy.deepcopy(self.config)
+            self._set_path(new_config, key, value)
+            change = self._replace(new_config)
+            self._set_path(self.overrides, key, copy.deepcopy(value))
+        self._notify(change)
+
+    @staticmethod
+    def _set_path(target: Dict, key: str, value: Any) -> None:
+        """按点分路径写入嵌套字典"""
         keys = key.split('.')
-        config_dict = self.config
-        
-        for i, k in enumerate(keys[:-1]):
-            if k not in config_dict or not isinstance(config_dict[k], dict):
-                config_dict[k] = {}
-            config_dict = config_dict[k]
-        
-        config_dict[keys[-1]] = value
\ No newline at end of file
+        for k in keys[:-1]:
+            if k not in target or not isinstance(target[k], dict):
+                target[k] = {}
+            target = target[k]
+        target[keys[-1]] = value
+
+
+class ConfigWatcher:
+    """
+    配置文件监视器
+
+    定期检查配置文件的修改时间，变化后重新加载并原子替换配置快照；
+    新配置校验失败时保留当前配置。
+    """
+
+    def __init__(self, config: Config, config_file: str = None,
+                 interval: float = 1.0):
+        """
+        初始化配置文件监视器
+
+        Args:
+            config: 要更新的配置对象
+            config_file: 配置文件路径，默认使用配置对象加载的文件
+            interval: 检查间隔（秒）
+        """
+        self.config = config
+        self.config_file = config_file or config.config_file
+        self.interval = interval
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self._stat = self._file_stat()
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.config_file)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def start(self):
+        """启动监视线程"""
+        if self.running or not self.config_file:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止监视线程"""
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.interval * 2)
+
+    def check(self) -> bool:
+        """检查一次文件变化，变化时重新加载"""
+        stat = self._file_stat()
+        if stat is None or stat == self._stat:
+            return False
+        self._stat = stat
+        if self.config.reload(self.config_file):
+            print(f"✓ 配置已从 {self.config_file} 重新加载 "
+                  f"(版本 {self.config.snapshot().version})")
+            return True
+        return False
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.interval)
+            self.check()
@@ -0,0 +1,297 @@
+# device_protocol.py
+import sys
+import threading
+from array import array
+from typing import Any, Dict, List, Optional
+
+from protocol import PacketTooLargeError, ProtocolError
+
+# 帧起始/结束标记，与上位机 client/protocol.py 一致
+FRAME_START = 0xFF
+FRAME_END = 0xFE
+
+# 命令字
+CMD_ACK = 0x00
+CMD_HEARTBEAT = 0x01
+CMD_SET_VOLTAGE = 0x02
+CMD_SET_FIXED_VOLTAGE = 0x03
+CMD_SET_DELTA_VOLTAGE = 0x04
+
+# 增量帧编码方式
+DELTA_RUNS = 0x01
+DELTA_BITMAP = 0x02
+
+
+def _u16(data, offset: int) -> int:
+    return (data[offset] << 8) | data[offset + 1]
+
+
+def _values(data, offset: int, count: int) -> array:
+    """读取 count 个大端 16 位电压值"""
+    values = array("H")
+    values.frombytes(bytes(data[offset:offset + 2 * count]))
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values
+
+
+class ChannelState:
+    """仿真设备的通道电压，所有连接共享（同一端口模拟同一台设备）"""
+
+    def __init__(self, channels: int):
+        self.lock = threading.Lock()
+        self.voltages = array("H", [0] * channels)
+
+    def __len__(self):
+        return len(self.voltages)
+
+
+class DeviceFrameProtocol:
+    """
+    上位机设备帧协议处理器
+
+    帧格式: [0xFF][命令][数据][0xFE]
+        0x01 心跳:       无数据
+        0x02 设置电压:   电压(2)，或 个数(2) + 电压(2)*个数
+        0x03 全量电压:   电压(2)*通道数
+        0x04 增量电压:   编码方式(1) + 增量数据
+            0x01 区段:   区段数(2) + [起始通道(2) 通道数(2)]*区段数 + 电压(2)*通道总数
+            0x02 位图:   位图(通道数/8，高位在前) + 电压(2)*置位数
+    响应: [0xFF][0x00][状态 0 成功/1 失败][0xFE]
+
+    增量帧基于设备当前的通道电压解码，解码后的消息总是包含完整的通道电压。
+    接口与 ByteStreamProtocol 一致，服务器可直接替换。
+    """
+
+    header_size = 0
+    stream_threshold = 0
+
+    def __init__(self,
+                 channels: int = 256,
+                 max_packet_size: int = 65536,
+                 encoding: str = "utf-8",
+                 state: Optional[ChannelState] = None):
+        """
+        初始化设备帧协议处理器
+
+        Args:
+            channels: 通道数（全量帧的电压个数）
+            max_packet_size: 单帧最大长度
+            encoding: 未使用，保持与 ByteStreamProtocol 参数一致
+            state: 共享的通道状态，默认新建
+        """
+        self.channels = channels
+        self.max_packet_size = max_packet_size
+        self.max_stream_size = max_packet_size
+        self.encoding = encoding
+        self.state = state or ChannelState(channels)
+        self.buffer = bytearray()
+        self.stats = {"frames": 0, "delta_frames": 0, "delta_channels": 0}
+
+    def new_decoder(self) -> "DeviceFrameProtocol":
+        """创建共享通道状态、缓冲区独立的处理器（每个连接一个）"""
+        decoder = DeviceFrameProtocol(channels=self.channels,
+                                      max_packet_size=self.max_packet_size,
+                                      encoding=self.encoding,
+                                      state=self.state)
+        decoder.stats = self.stats
+        return decoder
+
+    def pack(self, data: Any) -> bytes:
+        """
+        打包响应：字节原样发送，其他数据转换为应答帧
+
+        Args:
+            data: 响应数据，字典按 success 字段决定应答状态
+        """
+        if isinstance(data, (bytes, bytearray)):
+            return bytes(data)
+        success = data.get("success", True) if isinstance(data,
+                                                           dict) else True
+        return bytes(
+            [FRAME_START, CMD_ACK, 0x00 if success else 0x01, FRAME_END])
+
+    def _frame_length(self, data, offset: int) -> Optional[int]:
+        """
+        计算从 offset 开始的帧长度，数据不足时返回 None
+
+        Raises:
+            ProtocolError: 帧格式错误
+        """
+        available = len(data) - offset
+        if available < 2:
+            return None
+        if data[offset] != FRAME_START:
+            raise ProtocolError(f"帧起始字节错误: 0x{data[offset]:02X}")
+        command = data[offset + 1]
+        if command == CMD_HEARTBEAT:
+            return 3
+        if command == CMD_SET_FIXED_VOLTAGE:
+            return 3 + 2 * self.channels
+        if command == CMD_SET_VOLTAGE:
+            if available < 5:
+                return None
+            # 单值帧第 5 字节为结束标记，多值帧此处为首个电压的高字节：
+            # 多值帧的首个电压必须小于 0xFE00。个数为 0 的多值帧与
+            # 设置电压 0 的单值帧字节相同，上位机不会发送，一律按单值帧解析
+            if data[offset + 4] == FRAME_END:
+                return 5
+            return 5 + 2 * _u16(data, offset + 2)
+        if command == CMD_SET_DELTA_VOLTAGE:
+            if available < 3:
+                return None
+            mode = data[offset + 2]
+            if mode == DELTA_BITMAP:
+                size = (self.channels + 7) // 8
+                if available < 3 + size:
+                    return None
+                changed = sum(
+                    bin(byte).count("1")
+                    for byte in data[offset + 3:offset + 3 + size])
+                return 4 + size + 2 * changed
+            if mode == DELTA_RUNS:
+                if available < 5:
+                    return None
+                runs = _u16(data, offset + 3)
+                if available < 5 + 4 * runs:
+                    return None
+                total = sum(
+                    _u16(data, offset + 7 + 4 * i) for i in range(runs))
+                return 6 + 4 * runs + 2 * total
+            raise ProtocolError(f"未知的增量编码方式: 0x{mode:02X}")
+        raise ProtocolError(f"未知的命令: 0x{command:02X}")
+
+    def _decode_frame(self, frame) -> Dict:
+        """
+        解码一个完整帧并更新通道状态
+
+        Raises:
+            ProtocolError: 帧格式错误
+        """
+        if frame[-1] != FRAME_END:
+            raise ProtocolError(f"帧结束字节错误: 0x{frame[-1]:02X}")
+        command = frame[1]
+        self.stats["frames"] += 1
+        if command == CMD_HEARTBEAT:
+            return {"command": "heartbeat"}
+        if command == CMD_SET_VOLTAGE:
+            if len(frame) == 5:
+                return {"command": "set_voltage", "voltage": _u16(frame, 2)}
+            count = _u16(frame, 2)
+            return {
+                "command": "set_multi_voltage",
+                "voltages": _values(frame, 4, count).tolist()
+            }
+
+        state = self.state
+        if command == CMD_SET_FIXED_VOLTAGE:
+            values = _values(frame, 2, self.channels)
+            with state.lock:
+                state.voltages[:] = values
+            return {"command": "set_fixed_voltage", "voltages": values.tolist()}
+
+        # CMD_SET_DELTA_VOLTAGE：先校验整帧，再更新共享的通道状态，
+        # 错误帧不会修改任何连接看到的电压
+        mode = frame[2]
+        if mode == DELTA_BITMAP:
+            size = (self.channels + 7) // 8
+            channels = []
+            for byte_index, byte in enumerate(frame[3:3 + size]):
+                while byte:
+                    bit = byte.bit_length() - 1
+                    byte &= ~(1 << bit)
+                    channel = byte_index * 8 + (7 - bit)
+                    if channel >= self.channels:
+                        raise ProtocolError(f"通道号 {channel} 超出范围")
+                    channels.append(channel)
+            values = _values(frame, 3 + size, len(channels))
+            changed = len(channels)
+            encoding = "bitmap"
+        else:
+            runs = _u16(frame, 3)
+            spans = []
+            for i in range(runs):
+                start = _u16(frame, 5 + 4 * i)
+                count = _u16(frame, 7 + 4 * i)
+                if start + count > self.channels:
+                    raise ProtocolError(f"通道区段 {start}+{count} 超出范围")
+                spans.append((start, count))
+            values = _values(frame, 5 + 4 * runs,
+                             sum(count for _, count in spans))
+            changed = len(values)
+            encoding = "runs"
+
+        with state.lock:
+            voltages = state.voltages
+            if mode == DELTA_BITMAP:
+                for channel, value in zip(channels, values):
+                    voltages[channel] = value
+            else:
+                offset = 0
+                for start, count in spans:
+                    voltages[start:start + count] = values[offset:offset +
+                                                           count]
+                    offset += count
+            result = voltages.tolist()
+        self.stats["delta_frames"] += 1
+        self.stats["delta_channels"] += changed
+        return {
+            "command": "set_delta_voltage",
+            "encoding": encoding,
+            "changed": changed,
+            "voltages": result
+        }
+
+    def unpack_datagram(self, data: bytes) -> Any:
+        """
+        解包一个独立的数据报（每个数据报恰好一帧）
+
+        Raises:
+            ProtocolError: 帧格式错误
+            PacketTooLargeError: 帧长度超过 max_packet_size
+        """
+        if len(data) > self.max_packet_size:
+            raise PacketTooLargeError(len(data), self.max_packet_size)
+        length = self._frame_length(data, 0)
+        if length is None or length != len(data):
+            raise ProtocolError(f"数据报长度 {len(data)} 与帧长度 {length} 不符")
+        return self._decode_frame(data)
+
+    def feed(self, data: bytes) -> List[Any]:
+        """
+        向流缓冲区追加数据并取出所有已完整的帧
+
+        Raises:
+            ProtocolError: 帧格式错误
+            PacketTooLargeError: 帧长度超过 max_packet_size
+        """
+        self.buffer.extend(data)
+        items = []
+        while True:
+            try:
+                length = self._frame_length(self.buffer, 0)
+            except ProtocolError:
+                self.clear_buffer()
+                raise
+            if length is None:
+                break
+            if length > self.max_packet_size:
+                self.clear_buffer()
+                raise PacketTooLargeError(length, self.max_packet_size)
+            if len(self.buffer) < length:
+                break
+            frame = bytes(self.buffer[:length])
+            del self.buffer[:length]
+            items.append(self._decode_frame(frame))
+        return items
+
+    def clear_buffer(self):
+        """清空缓冲区"""
+        self.buffer.clear()
+
+    def create_response(self,
+                        success: bool,
+                        message: str = "",
+                        data: Any = None) -> Dict:
+        """创建响应（打包时只保留成功/失败状态）"""
+        return {"success": success, "message": message, "data": data}
@@ -0,0 +1,178 @@
+# dispatcher.py
+import queue
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+
+from metrics import ServerMetrics
+from utils.logger import setup_logger
+
+# 停止信号
+_STOP = object()
+
+
+class Dispatcher:
+    """
+    消息分发器
+
+    I/O 线程只负责解码，解码后的消息连同处理逻辑作为任务交给工作线程池。
+    每个 key（连接或对端地址）有自己的任务队列，同一时刻最多由一个工作线程
+    按到达顺序处理；不同 key 之间互不阻塞。排队任务总数有上限，
+    超过上限时拒绝新任务（过载丢弃），由调用方回复繁忙。
+    """
+
+    def __init__(self,
+                 workers: int = 4,
+                 queue_size: int = 1024,
+                 metrics: Optional[ServerMetrics] = None,
+                 name: str = "dispatcher",
+                 batch: int = 16):
+        """
+        初始化分发器
+
+        Args:
+            workers: 工作线程数，0 表示在调用线程直接执行
+            queue_size: 排队任务总数上限
+            metrics: 所属服务器的聚合指标
+            name: 日志记录器名称
+            batch: 工作线程连续处理同一个 key 的最大任务数，之后让出给其他 key
+        """
+        self.workers = max(0, int(workers))
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self.name = name
+        self.batch = batch
+        self.running = False
+        self.lock = threading.Lock()
+        self.pending_tasks: Dict[Hashable, Deque[Callable[[], None]]] = {}
+        self.pending_count = 0
+        # 有待处理任务的 key，每个 key 同时只会出现一次
+        self.ready: queue.Queue = queue.Queue()
+        self.threads: List[threading.Thread] = []
+        self.stats = {"dispatched": 0, "shed": 0, "failed": 0}
+        self.logger = setup_logger(name)
+
+    @property
+    def inline(self) -> bool:
+        """是否在调用线程直接执行任务"""
+        return self.workers == 0
+
+    def start(self):
+        """启动工作线程"""
+        if self.running:
+            return
+        self.running = True
+        self.threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run,
+                                      name=f"{self.name}_{index}",
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout: float = 2.0):
+        """停止工作线程，未处理的任务被丢弃"""
+        if not self.running:
+            return
+        self.running = False
+        with self.lock:
+            dropped = self.pending_count
+            self.pending_tasks.clear()
+            self.pending_count = 0
+        if dropped and self.metrics:
+            self.metrics.dispatch_queue_depth.dec(dropped)
+        for _ in self.threads:
+            self.ready.put(_STOP)
+        for thread in self.threads:
+            thread.join(timeout=timeout)
+        self.threads = []
+        self.ready = queue.Queue()
+
+    def submit(self, key: Hashable, task: Callable[[], None]) -> bool:
+        """
+        提交任务（不阻塞）
+
+        Args:
+            key: 排序键，相同 key 的任务按提交顺序执行
+            task: 无参任务，负责处理消息并发送响应
+
+        Returns:
+            bool: 排队任务已达上限（过载）或分发器已停止时返回 False
+        """
+        if self.inline:
+            self.stats["dispatched"] += 1
+            self._execute(task)
+            return True
+
+        with self.lock:
+            if not self.running:
+                return False
+            if self.pending_count >= self.queue_size:
+                self.stats["shed"] += 1
+                if self.metrics:
+                    self.metrics.messages_shed.inc()
+                return False
+            tasks = self.pending_tasks.get(key)
+            schedule = tasks is None
+            if schedule:
+                tasks = deque()
+                self.pending_tasks[key] = tasks
+            tasks.append(task)
+            self.pending_count += 1
+            self.stats["dispatched"] += 1
+
+        if self.metrics:
+            self.metrics.dispatch_queue_depth.inc()
+        if schedule:
+            self.ready.put(key)
+        return True
+
+    def pending(self) -> int:
+        """等待处理的任务数"""
+        return self.pending_count
+
+    def get_stats(self) -> dict:
+        """获取统计信息"""
+        stats = self.stats.copy()
+        stats["workers"] = self.workers
+        stats["pending"] = self.pending_count
+        stats["pending_keys"] = len(self.pending_tasks)
+        return stats
+
+    def _run(self):
+        """工作线程主循环：取出一个 key，按顺序处理它的任务"""
+        while True:
+            key = self.ready.get()
+            if key is _STOP:
+                break
+            for _ in range(self.batch):
+                with self.lock:
+                    tasks = self.pending_tasks.get(key)
+                    if not tasks:
+                        self.pending_tasks.pop(key, None)
+                        key = None
+                        break
+                    task = tasks.popleft()
+                    self.pending_count -= 1
+                if self.metrics:
+                    self.metrics.dispatch_queue_depth.dec()
+                self._execute(task)
+
+            if key is None:
+                continue
+            # 批次用完仍有任务：该 key 重新排队，让其他 key 有机会执行
+            with self.lock:
+                if self.pending_tasks.get(key):
+                    requeue = True
+                else:
+                    self.pending_tasks.pop(key, None)
+                    requeue = False
+            if requeue:
+                self.ready.put(key)
+
+    def _execute(self, task: Callable[[], None]):
+        try:
+            task()
+        except Exception as e:
+            self.stats["failed"] += 1
+            self.logger.error(f"任务执行出错: {e}")
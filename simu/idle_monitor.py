@@ -0,0 +1,141 @@
+# idle_monitor.py
+import threading
+import time
+from typing import Dict, Optional
+
+from timer_wheel import HierarchicalTimerWheel, TimerHandle
+from utils.logger import setup_logger
+
+
+class IdleMonitor:
+    """
+    连接空闲监控器
+
+    所有连接的空闲期限集中放在一个分层时间轮里，由单个线程按 tick 推进，
+    到期的连接批量关闭。连接收发数据时只更新时间戳，不触碰时间轮；
+    定时器到期时再核对时间戳，未真正超时的按最新期限重新登记。
+    """
+
+    def __init__(self,
+                 read_idle: float = 30,
+                 write_idle: float = 0,
+                 max_lifetime: float = 0,
+                 tick: float = 1.0,
+                 name: str = "idle_monitor"):
+        """
+        初始化空闲监控器
+
+        Args:
+            read_idle: 读空闲超时（秒），0 表示不限制
+            write_idle: 写空闲超时（秒），0 表示不限制
+            max_lifetime: 连接最长存活时间（秒），0 表示不限制
+            tick: 检查粒度（秒）
+            name: 日志记录器名称
+        """
+        self.read_idle = read_idle
+        self.write_idle = write_idle
+        self.max_lifetime = max_lifetime
+        self.tick = tick
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.wheel = HierarchicalTimerWheel(tick=tick, now=time.monotonic())
+        self.timers: Dict[str, TimerHandle] = {}
+        self.logger = setup_logger(name)
+
+    def start(self):
+        """启动监控线程"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止监控线程"""
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.tick * 2)
+        with self.lock:
+            for handle in self.timers.values():
+                self.wheel.cancel(handle)
+            self.timers.clear()
+
+    def update_limits(self, read_idle: float, write_idle: float,
+                      max_lifetime: float):
+        """更新超时限制（已登记的连接在下次到期核对时生效）"""
+        self.read_idle = read_idle
+        self.write_idle = write_idle
+        self.max_lifetime = max_lifetime
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.read_idle or self.write_idle or self.max_lifetime)
+
+    def register(self, handler):
+        """登记连接"""
+        deadline = self._next_deadline(handler)
+        if deadline is None:
+            return
+        with self.lock:
+            self.timers[handler.client_id] = self.wheel.schedule(
+                deadline, handler)
+
+    def unregister(self, handler):
+        """注销连接"""
+        with self.lock:
+            handle = self.timers.pop(handler.client_id, None)
+            if handle is not None:
+                self.wheel.cancel(handle)
+
+    def _next_deadline(self, handler) -> Optional[float]:
+        """计算连接最近的一个到期时间"""
+        deadlines = []
+        if self.read_idle:
+            deadlines.append(handler.last_read + self.read_idle)
+        if self.write_idle:
+            deadlines.append(handler.last_write + self.write_idle)
+        if self.max_lifetime:
+            deadlines.append(handler.opened_at + self.max_lifetime)
+        return min(deadlines) if deadlines else None
+
+    def _expire_reason(self, handler, now: float) -> Optional[str]:
+        """判断连接是否真正超时，返回超时原因"""
+        if self.max_lifetime and now - handler.opened_at >= self.max_lifetime:
+            return "超过最长存活时间"
+        if self.read_idle and now - handler.last_read >= self.read_idle:
+            return "读空闲超时"
+        if self.write_idle and now - handler.last_write >= self.write_idle:
+            return "写空闲超时"
+        return None
+
+    def _run(self):
+        """按 tick 推进时间轮，批量关闭到期连接"""
+        while self.running:
+            time.sleep(self.tick)
+            now = time.monotonic()
+            expired = []
+            with self.lock:
+                for handle in self.wheel.advance(now):
+                    handler = handle.item
+                    if self.timers.get(handler.client_id) is not handle:
+                        continue
+                    reason = self._expire_reason(handler, now)
+                    if reason:
+                        del self.timers[handler.client_id]
+                        expired.append((handler, reason))
+                        continue
+                    deadline = self._next_deadline(handler)
+                    if deadline is None:
+                        del self.timers[handler.client_id]
+                        continue
+                    self.timers[handler.client_id] = self.wheel.schedule(
+                        deadline, handler)
+
+            if expired:
+                self.logger.info(f"关闭 {len(expired)} 个超时连接")
+            for handler, reason in expired:
+                try:
+                    handler.expire(reason)
+                except Exception as e:
+                    self.logger.error(f"关闭超时连接出错: {e}")
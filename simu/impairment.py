@@ -0,0 +1,273 @@
+# impairment.py
+import heapq
+import itertools
+import random
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+
+class ImpairmentProfile:
+    """
+    链路损伤参数（client/impairment.py 与 simu/impairment.py 中的本类保持完全一致）
+
+    字符串格式: "loss=0.05,delay=20,jitter=5,reorder=0.01,dup=0.01,rate=512,seed=42"
+        loss: 丢包率（0~1）
+        delay: 单向时延（毫秒）
+        jitter: 时延抖动（毫秒，均匀分布 ±jitter）
+        reorder: 乱序概率，被选中的包延后，让后续的包先到
+        dup: 重复概率
+        rate: 带宽上限（kbit/s），0 表示不限制
+        seed: 随机种子，相同种子得到相同的损伤序列
+    """
+
+    KEYS = {
+        "loss": "loss",
+        "delay": "delay_ms",
+        "jitter": "jitter_ms",
+        "reorder": "reorder",
+        "dup": "duplicate",
+        "rate": "rate_kbps",
+        "seed": "seed",
+    }
+
+    def __init__(self,
+                 loss: float = 0.0,
+                 delay_ms: float = 0.0,
+                 jitter_ms: float = 0.0,
+                 reorder: float = 0.0,
+                 duplicate: float = 0.0,
+                 rate_kbps: float = 0.0,
+                 seed: Optional[int] = None):
+        self.loss = loss
+        self.delay_ms = delay_ms
+        self.jitter_ms = jitter_ms
+        self.reorder = reorder
+        self.duplicate = duplicate
+        self.rate_kbps = rate_kbps
+        self.seed = seed
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "ImpairmentProfile":
+        """
+        解析 "key=value,..." 格式的损伤参数，spec 为空时返回不生效的参数
+
+        Raises:
+            ValueError: 参数格式错误
+        """
+        values = {}
+        for item in (spec or "").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            key, sep, value = item.partition("=")
+            key = key.strip().lower()
+            if not sep or key not in cls.KEYS:
+                raise ValueError(f"Invalid impairment option: {item}")
+            attr = cls.KEYS[key]
+            values[attr] = int(value) if attr == "seed" else float(value)
+        return cls(**values)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.loss or self.delay_ms or self.jitter_ms
+                    or self.reorder or self.duplicate or self.rate_kbps)
+
+    def __repr__(self):
+        return ("ImpairmentProfile(" + ",".join(
+            f"{key}={getattr(self, attr)}" for key, attr in self.KEYS.items()
+            if getattr(self, attr)) + ")")
+
+
+class DelayLine:
+    """延迟执行队列：单个线程按到期时间执行所有延迟发送/处理"""
+
+    def __init__(self, name: str = "delay_line"):
+        self.heap: List[Tuple[float, int, Callable, tuple]] = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.logger = setup_logger(name)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.heap.clear()
+            self.condition.notify()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+
+    def schedule(self, due: float, func: Callable, *args):
+        """在 perf_counter 时间 due 执行 func(*args)"""
+        with self.condition:
+            heapq.heappush(self.heap, (due, next(self.counter), func, args))
+            if self.heap[0][0] == due:
+                self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running:
+                    if not self.heap:
+                        self.condition.wait()
+                        continue
+                    wait = self.heap[0][0] - time.perf_counter()
+                    if wait <= 0:
+                        break
+                    self.condition.wait(wait)
+                if not self.running:
+                    return
+                _, _, func, args = heapq.heappop(self.heap)
+            try:
+                func(*args)
+            except Exception as e:
+                self.logger.error(f"延迟任务执行出错: {e}")
+
+
+class _Link:
+    """单个对端的链路状态（收发两个方向共用随机源，各自计算带宽排队）"""
+
+    def __init__(self, profile: ImpairmentProfile, key: str):
+        self.profile = profile
+        seed = profile.seed
+        if seed is not None:
+            seed = seed ^ zlib.crc32(key.encode("utf-8"))
+        self.random = random.Random(seed)
+        self.busy_until = {"in": 0.0, "out": 0.0}
+
+
+class Impairment:
+    """
+    仿真服务器的链路损伤层
+
+    对每个对端地址独立施加丢包、时延、抖动、乱序、重复和带宽限制，
+    随机源按种子和对端地址派生，结果可复现。延迟的数据包由 DelayLine 线程统一投递。
+    """
+
+    def __init__(self, profile: str = "", peers: Dict[str, str] = None,
+                 name: str = "impairment"):
+        """
+        初始化损伤层
+
+        Args:
+            profile: 默认损伤参数
+            peers: 按对端指定的损伤参数，键为 "ip:port" 或 "ip"
+            name: 日志记录器名称
+        """
+        self.lock = threading.Lock()
+        self.links: Dict[tuple, Optional[_Link]] = {}
+        self.delay_line = DelayLine(name=f"{name}_delay")
+        self.logger = setup_logger(name)
+        self.stats = {"dropped": 0, "duplicated": 0, "reordered": 0,
+                      "delayed": 0}
+        self.update(profile, peers)
+
+    def update(self, profile: str = "", peers: Dict[str, str] = None):
+        """
+        更新损伤参数（已有对端的链路状态重建）
+
+        Raises:
+            ValueError: 参数格式错误
+        """
+        default = ImpairmentProfile.parse(profile)
+        parsed = {
+            key: ImpairmentProfile.parse(spec)
+            for key, spec in (peers or {}).items()
+        }
+        with self.lock:
+            self.default = default
+            self.peers = parsed
+            self.links.clear()
+        self.logger.info(f"链路损伤参数: 默认 {default}，按对端 {parsed}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.default.enabled or any(p.enabled
+                                           for p in self.peers.values())
+
+    def start(self):
+        self.delay_line.start()
+
+    def stop(self):
+        self.delay_line.stop()
+
+    def _link(self, address) -> Optional[_Link]:
+        with self.lock:
+            if address in self.links:
+                return self.links[address]
+            if isinstance(address, tuple):
+                key = f"{address[0]}:{address[1]}"
+                host = str(address[0])
+            else:
+                # Unix 数据报套接字的对端是路径
+                key = host = str(address)
+            profile = self.peers.get(key) or self.peers.get(
+                host) or self.default
+            link = _Link(profile, key) if profile.enabled else None
+            self.links[address] = link
+            return link
+
+    def inbound(self, address: tuple, data: bytes,
+                deliver: Callable[[bytes, tuple], None]):
+        """接收方向：按损伤参数调用 deliver(data, address)"""
+        self._apply(address, data, deliver, "in")
+
+    def outbound(self, address: tuple, data: bytes,
+                 send: Callable[[bytes, tuple], None]):
+        """发送方向：按损伤参数调用 send(data, address)"""
+        self._apply(address, data, send, "out")
+
+    def _apply(self, address: tuple, data: bytes,
+               func: Callable[[bytes, tuple], None], direction: str):
+        link = self._link(address)
+        if link is None:
+            func(data, address)
+            return
+
+        profile = link.profile
+        rand = link.random
+        with self.lock:
+            if profile.loss and rand.random() < profile.loss:
+                self.stats["dropped"] += 1
+                return
+            now = time.perf_counter()
+            depart = now
+            if profile.rate_kbps:
+                start = max(now, link.busy_until[direction])
+                depart = start + len(data) * 8 / (profile.rate_kbps * 1000)
+                link.busy_until[direction] = depart
+            delay = profile.delay_ms
+            if profile.jitter_ms:
+                delay += rand.uniform(-profile.jitter_ms, profile.jitter_ms)
+            if profile.reorder and rand.random() < profile.reorder:
+                # 额外延后，让后续的包先到达
+                delay += max(profile.delay_ms, 10.0)
+                self.stats["reordered"] += 1
+            copies = 2 if (profile.duplicate
+                           and rand.random() < profile.duplicate) else 1
+            if copies == 2:
+                self.stats["duplicated"] += 1
+
+        due = depart + max(delay, 0) / 1000
+        for _ in range(copies):
+            if due <= now:
+                func(data, address)
+            else:
+                self.stats["delayed"] += 1
+                self.delay_line.schedule(due, func, data, address)
+
+    def get_stats(self) -> dict:
+        stats = self.stats.copy()
+        stats["pending"] = len(self.delay_line.heap)
+        return stats
@@ -5,9 +5,13 @@ import threading
 import time
 from typing import Any, Dict, List
 
-from config import Config
+from config import Config, ConfigWatcher
+from metrics import MetricsRegistry
+from metrics_server import MetricsHTTPServer
+from process_pool import ProcessHandlerPool
 from server import TCPServer
 from udp_server import UDPServer
+from unix_server import UnixDatagramServer, UnixStreamServer, socket_path
 from utils.logger import setup_logger
 
 
@@ -19,15 +23,43 @@ class MultiPortServerManager:
         self.servers: Dict[str, Any] = {}  # key: "protocol:port"
         self.running = False
         self.logger = setup_logger("server_manager")
+        self.metrics = MetricsRegistry()
+        self.metrics_server: MetricsHTTPServer = None
+        # 所有端口、协议的服务器共享一个进程池（首次使用时启动）
+        settings = self.config.snapshot().process_pool
+        self.process_pool = ProcessHandlerPool(
+            workers=settings.workers,
+            shm_threshold=settings.shm_threshold,
+            start_method=settings.start_method)
+
+    def start_metrics_server(self, host: str, port: int):
+        """
+        启动 Prometheus 指标端点
 
-    def start_servers(self, ports: List[int], host: str = "0.0.0.0", protocol: str = "tcp"):
+        Args:
+            host: 监听地址
+            port: 监听端口
+        """
+        try:
+            self.metrics_server = MetricsHTTPServer(self.metrics, host, port)
+            self.metrics_server.start()
+        except Exception as e:
+            self.metrics_server = None
+            self.logger.error(f"启动指标端点 {host}:{port} 失败: {e}")
+
+    def start_servers(self,
+                      ports: List[int],
+                      host: str = "0.0.0.0",
+                      protocol: str = "tcp",
+                      unix_dir: str = None):
         """
         启动多个端口的服务器
 
         Args:
             ports: 端口列表
             host: 监听地址
-            protocol: 协议类型 (tcp/udp/both)
+            protocol: 协议类型 (tcp/udp/both/unix/unix_dgram/all)
+            unix_dir: Unix 套接字目录，默认读取配置 unix.socket_dir
         """
         if self.running:
             self.logger.warning("服务器管理器已在运行中")
@@ -37,18 +69,28 @@ class MultiPortServerManager:
 
         for port in ports:
             # 根据协议类型启动服务器
-            if protocol in ["tcp", "both"]:
+            if protocol in ["tcp", "both", "all"]:
                 self._start_tcp_server(host, port)
 
-            if protocol in ["udp", "both"]:
+            if protocol in ["udp", "both", "all"]:
                 self._start_udp_server(host, port)
 
+            if protocol in ["unix", "all"]:
+                self._start_unix_server(unix_dir, port)
+
+            if protocol in ["unix_dgram", "all"]:
+                self._start_unix_server(unix_dir, port, datagram=True)
+
         self.logger.info(f"已启动 {len(self.servers)} 个服务器实例")
 
     def _start_tcp_server(self, host: str, port: int):
         """启动 TCP 服务器"""
         try:
-            server = TCPServer(host=host, port=port, config=self.config)
+            server = TCPServer(host=host,
+                               port=port,
+                               config=self.config,
+                               metrics=self.metrics,
+                               process_pool=self.process_pool)
             server.start()
             self.servers[f"tcp:{port}"] = server
             self.logger.info(f"已启动 TCP 服务器: {host}:{port}")
@@ -58,13 +100,35 @@ class MultiPortServerManager:
     def _start_udp_server(self, host: str, port: int):
         """启动 UDP 服务器"""
         try:
-            server = UDPServer(host=host, port=port, config=self.config)
+            server = UDPServer(host=host,
+                               port=port,
+                               config=self.config,
+                               metrics=self.metrics,
+                               process_pool=self.process_pool)
             server.start()
             self.servers[f"udp:{port}"] = server
             self.logger.info(f"已启动 UDP 服务器: {host}:{port}")
         except Exception as e:
             self.logger.error(f"启动 UDP 服务器 {host}:{port} 失败: {e}")
 
+    def _start_unix_server(self, directory: str, port: int,
+                           datagram: bool = False):
+        """启动 Unix 流/数据报套接字服务器"""
+        directory = directory or self.config.snapshot().unix.socket_dir
+        path = socket_path(directory, port, datagram)
+        server_class = UnixDatagramServer if datagram else UnixStreamServer
+        try:
+            server = server_class(path=path,
+                                  port=port,
+                                  config=self.config,
+                                  metrics=self.metrics,
+                                  process_pool=self.process_pool)
+            server.start()
+            self.servers[f"{server.PROTOCOL}:{port}"] = server
+            self.logger.info(f"已启动 {server.PROTOCOL.upper()} 服务器: {path}")
+        except Exception as e:
+            self.logger.error(f"启动 Unix 套接字服务器 {path} 失败: {e}")
+
     def stop_servers(self):
         """停止所有服务器"""
         for server_key, server in self.servers.items():
@@ -75,10 +139,14 @@ class MultiPortServerManager:
                 self.logger.error(f"停止服务器 {server_key} 失败: {e}")
 
         self.servers.clear()
+        self.process_pool.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
         self.running = False
         self.logger.info("所有服务器已停止")
 
-    def get_stats(self) -> Dict:
+    def get_stats(self, include_clients: bool = True) -> Dict:
         """获取所有服务器的统计信息"""
         stats = {
             "total_servers": len(self.servers),
@@ -87,7 +155,8 @@ class MultiPortServerManager:
         }
 
         for server_key, server in self.servers.items():
-            stats["servers"][server_key] = server.get_server_stats()
+            stats["servers"][server_key] = server.get_server_stats(
+                include_clients)
 
         return stats
 
@@ -118,11 +187,35 @@ def custom_message_handler(message: Any, client_address: tuple) -> Dict:
     return response
 
 
+def default_process_handler(message: Any, client_address: tuple) -> Dict:
+    """
+    进程池模式下的默认处理器（服务器的默认处理器是绑定方法，无法在子进程执行）
+
+    Args:
+        message: 接收到的消息
+        client_address: 客户端地址
+
+    Returns:
+        Dict: 响应数据
+    """
+    import time
+
+    return {
+        "success": True,
+        "message": "消息处理成功",
+        "data": {
+            "original_message": message,
+            "server_timestamp": time.time()
+        }
+    }
+
+
 def print_stats(manager: MultiPortServerManager, interval: int = 10):
     """定期打印统计信息"""
     while manager.running:
         try:
-            stats = manager.get_stats()
+            # 只读聚合计数器，不遍历连接表
+            stats = manager.get_stats(include_clients=False)
 
             print("\n" + "=" * 60)
             print(f"服务器统计信息 ({time.strftime('%Y-%m-%d %H:%M:%S')})")
@@ -135,11 +228,11 @@ def print_stats(manager: MultiPortServerManager, interval: int = 10):
                 print(f"\n{protocol.upper()} 端口 {port}:")
                 print(f"  运行时间: {server_stats['uptime']:.1f} 秒")
 
-                if protocol == "tcp":
+                if protocol in ("tcp", "unix"):
                     print(f"  总连接数: {server_stats['total_connections']}")
                     print(f"  当前连接: {server_stats['current_connections']}")
                     print(f"  最大并发: {server_stats['max_concurrent_connections']}")
-                elif protocol == "udp":
+                elif protocol in ("udp", "unix_dgram"):
                     print(f"  总数据包: {server_stats['total_packets']}")
                     print(f"  接收字节: {server_stats['bytes_received']}")
                     print(f"  发送字节: {server_stats['bytes_sent']}")
@@ -161,7 +254,7 @@ def signal_handler(signum, frame):
 
 def main():
     """主函数"""
-    parser = argparse.ArgumentParser(description="TCP/UDP 服务器仿真工具")
+    parser = argparse.ArgumentParser(description="TCP/UDP/Unix 套接字服务器仿真工具")
     parser.add_argument("-p",
                         "--ports",
                         nargs="+",
@@ -170,17 +263,52 @@ def main():
                         help="监听的端口列表 (默认: 9999)")
     parser.add_argument("--host", default="0.0.0.0", help="监听地址 (默认: 0.0.0.0)")
     parser.add_argument("--protocol",
-                        choices=["tcp", "udp", "both"],
+                        choices=["tcp", "udp", "both", "unix", "unix_dgram",
+                                 "all"],
                         default="tcp",
-                        help="协议类型 (默认: tcp)")
+                        help="协议类型，unix/unix_dgram 为本机 Unix 套接字，"
+                        "all 启动全部四种 (默认: tcp)")
+    parser.add_argument("--unix-dir",
+                        default=None,
+                        help="Unix 套接字目录，套接字文件为 simu_<端口>.sock / "
+                        "simu_<端口>.dgram.sock (默认读取配置 unix.socket_dir)")
     parser.add_argument("--config", help="配置文件路径")
+    parser.add_argument("--capture",
+                        default=None,
+                        help="抓包文件路径，可用 {protocol} 和 {port} 占位符"
+                        " (默认读取配置 capture.path，为空不抓包)")
+    parser.add_argument("--impairment",
+                        default=None,
+                        help="UDP 链路损伤参数，如 loss=0.05,delay=20,jitter=5"
+                        " (默认读取配置 impairment.profile)")
+    parser.add_argument("--multicast",
+                        default=None,
+                        metavar="GROUP[:PORT]",
+                        help="UDP 服务器加入的组播组（或广播地址），如 239.255.0.1:9990"
+                        " (默认读取配置 multicast.group，为空不加入)")
+    parser.add_argument("--framing",
+                        choices=["device", "length"],
+                        default=None,
+                        help="帧格式：device 为上位机设备帧协议（0xFF 命令 数据 0xFE，"
+                        "支持增量电压帧，上位机使用），length 为长度头协议（client.py 使用）"
+                        " (默认读取配置 protocol.framing，默认 length)")
+    parser.add_argument("--no-watch-config",
+                        action="store_true",
+                        help="不监视配置文件变化（默认修改配置文件后自动热更新）")
     parser.add_argument("--stats-interval",
                         type=int,
                         default=10,
                         help="统计信息打印间隔 (秒，默认: 10)")
+    parser.add_argument("--metrics-port",
+                        type=int,
+                        default=None,
+                        help="Prometheus 指标端口 (默认读取配置 metrics.port，0 表示不启用)")
     parser.add_argument("--custom-handler",
                         action="store_true",
                         help="使用自定义消息处理器")
+    parser.add_argument("--process-pool",
+                        action="store_true",
+                        help="在子进程池中执行消息处理器（适用于 CPU 密集的处理）")
 
     args = parser.parse_args()
 
@@ -191,28 +319,65 @@ def main():
     # 加载配置
     config = Config(args.config)
 
+    if args.capture:
+        config.set("capture.path", args.capture)
+    if args.impairment:
+        config.set("impairment.profile", args.impairment)
+    if args.framing:
+        config.set("protocol.framing", args.framing)
+    if args.multicast:
+        group, _, port = args.multicast.partition(":")
+        config.set("multicast.group", group)
+        if port:
+            config.set("multicast.port", int(port))
+
     # 创建服务器管理器
     manager = MultiPortServerManager(config)
 
+    # 配置文件热更新
+    watcher = None
+    if args.config and not args.no_watch_config:
+        watcher = ConfigWatcher(config, args.config)
+
     # 启动服务器
     print(f"启动服务器...")
     print(f"监听地址: {args.host}")
     print(f"监听端口: {args.ports}")
     print(f"协议类型: {args.protocol}")
+    print(f"帧格式: {config.snapshot().protocol.framing}")
     print(f"配置文件: {args.config or '使用默认配置'}")
     print(f"统计间隔: {args.stats_interval}秒")
     print(f"自定义处理器: {'是' if args.custom_handler else '否'}")
+    print(f"进程池处理: {'是' if args.process_pool else '否'}")
     print("-" * 50)
 
     try:
         # 启动服务器（传递协议参数）
-        manager.start_servers(args.ports, args.host, args.protocol)
+        manager.start_servers(args.ports, args.host, args.protocol,
+                              args.unix_dir)
+
+        # 启动指标端点
+        metrics_port = args.metrics_port
+        if metrics_port is None:
+            metrics_port = config.get("metrics.port", 0)
+        if metrics_port:
+            manager.start_metrics_server(
+                config.get("metrics.host", "0.0.0.0"), metrics_port)
 
         # 设置自定义消息处理器
-        if args.custom_handler:
+        if args.custom_handler or args.process_pool:
+            handler = (custom_message_handler
+                       if args.custom_handler else default_process_handler)
             for server in manager.servers.values():
-                server.set_message_callback(custom_message_handler)
-            print("✓ 已启用自定义消息处理器")
+                server.set_message_callback(
+                    handler, use_process_pool=args.process_pool)
+            print(f"✓ 已启用{'自定义' if args.custom_handler else '默认'}消息处理器"
+                  f"{'（进程池）' if args.process_pool else ''}")
+
+        # 启动配置文件监视
+        if watcher:
+            watcher.start()
+            print(f"✓ 已启用配置热更新: {args.config}")
 
         # 启动统计信息线程
         if args.stats_interval > 0:
@@ -233,6 +398,8 @@ def main():
     except Exception as e:
         print(f"运行错误: {e}")
     finally:
+        if watcher:
+            watcher.stop()
         manager.stop_servers()
 
 
@@ -0,0 +1,243 @@
+# metrics.py
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 默认延迟分桶（秒），与 Prometheus 客户端库默认值一致
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: LabelKey, extra: str = "") -> str:
+    """格式化标签为 {k="v",...}"""
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace(
+            "\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """可增可减的瞬时值"""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> float:
+        """增加并返回增加后的值"""
+        with self._lock:
+            self._value += amount
+            return self._value
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def set_max(self, value: float):
+        """仅当 value 更大时更新（原子操作）"""
+        with self._lock:
+            if value > self._value:
+                self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Histogram:
+    """固定分桶直方图"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """返回 (累计分桶计数, 总和, 总数)"""
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            total_count = self._count
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total_sum, total_count
+
+
+class _Family:
+    """同名指标族（同一名称、不同标签）"""
+
+    def __init__(self, name: str, kind: str, help_text: str, factory):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.factory = factory
+        self.children: Dict[LabelKey, object] = {}
+
+
+class MetricsRegistry:
+    """指标注册表
+
+    指标对象在注册时创建，之后更新只操作对象本身；
+    导出时只遍历注册表，不接触任何连接表。
+    """
+
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, kind: str, help_text: str,
+             labels: Optional[Dict[str, str]], factory):
+        key: LabelKey = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = _Family(name, kind, help_text, factory)
+                self._families[name] = family
+            elif family.kind != kind:
+                raise ValueError(f"指标 {name} 已注册为 {family.kind}")
+            metric = family.children.get(key)
+            if metric is None:
+                metric = family.factory()
+                family.children[key] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str = "",
+                labels: Optional[Dict[str, str]] = None) -> Counter:
+        """获取或创建计数器"""
+        return self._get(name, "counter", help_text, labels, Counter)
+
+    def gauge(self, name: str, help_text: str = "",
+              labels: Optional[Dict[str, str]] = None) -> Gauge:
+        """获取或创建仪表"""
+        return self._get(name, "gauge", help_text, labels, Gauge)
+
+    def histogram(self, name: str, help_text: str = "",
+                  labels: Optional[Dict[str, str]] = None,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """获取或创建直方图"""
+        return self._get(name, "histogram", help_text, labels,
+                         lambda: Histogram(buckets))
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式导出所有指标"""
+        with self._lock:
+            families = [(family, list(family.children.items()))
+                        for family in self._families.values()]
+
+        lines = []
+        for family, children in families:
+            if family.help_text:
+                lines.append(f"# HELP {family.name} {family.help_text}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for labels, metric in children:
+                if family.kind == "histogram":
+                    cumulative, total_sum, total_count = metric.snapshot()
+                    bounds = list(metric.buckets) + [float("inf")]
+                    for bound, count in zip(bounds, cumulative):
+                        le = f'le="{_format_value(bound)}"'
+                        lines.append(f"{family.name}_bucket"
+                                     f"{_format_labels(labels, le)} {count}")
+                    lines.append(f"{family.name}_sum{_format_labels(labels)} "
+                                 f"{_format_value(total_sum)}")
+                    lines.append(f"{family.name}_count"
+                                 f"{_format_labels(labels)} {total_count}")
+                else:
+                    lines.append(f"{family.name}{_format_labels(labels)} "
+                                 f"{_format_value(metric.value)}")
+        return "\n".join(lines) + "\n"
+
+
+class ServerMetrics:
+    """单个服务器实例的聚合指标（预先绑定标签，热路径无需查表）"""
+
+    def __init__(self, registry: MetricsRegistry, protocol: str, port: int):
+        labels = {"protocol": protocol, "port": str(port)}
+        self.connections_total = registry.counter(
+            "simu_connections_total", "累计接受的连接数", labels)
+        self.connections_current = registry.gauge(
+            "simu_connections_current", "当前连接数", labels)
+        self.connections_max = registry.gauge(
+            "simu_connections_max", "最大并发连接数", labels)
+        self.bytes_received = registry.counter(
+            "simu_bytes_received_total", "累计接收字节数", labels)
+        self.bytes_sent = registry.counter(
+            "simu_bytes_sent_total", "累计发送字节数", labels)
+        self.messages_received = registry.counter(
+            "simu_messages_received_total", "累计接收消息数", labels)
+        self.messages_sent = registry.counter(
+            "simu_messages_sent_total", "累计发送消息数", labels)
+        self.frames_dropped = registry.counter(
+            "simu_frames_dropped_total", "发送队列已满而丢弃的帧数", labels)
+        self.slow_consumer_disconnects = registry.counter(
+            "simu_slow_consumer_disconnects_total", "因慢消费者断开的连接数", labels)
+        self.queued_bytes = registry.gauge(
+            "simu_outbound_queued_bytes", "发送队列中等待发送的字节数", labels)
+        self.read_pauses = registry.counter(
+            "simu_read_pauses_total", "因发送队列超过高水位而暂停读取的次数", labels)
+        self.messages_shed = registry.counter(
+            "simu_messages_shed_total", "分发队列已满而拒绝的消息数", labels)
+        self.dispatch_queue_depth = registry.gauge(
+            "simu_dispatch_queue_depth", "分发队列中等待处理的消息数", labels)
+        self.errors = registry.counter(
+            "simu_errors_total", "处理或发送失败次数", labels)
+        self.handle_seconds = registry.histogram(
+            "simu_message_handle_seconds", "单条消息处理耗时（秒）", labels)
+
+    def connection_opened(self):
+        """记录新连接，并维护最大并发数"""
+        self.connections_total.inc()
+        self.connections_max.set_max(self.connections_current.inc())
+
+    def connection_closed(self):
+        """记录连接关闭"""
+        self.connections_current.dec()
+
+
+# 全局默认注册表
+default_registry = MetricsRegistry()
@@ -0,0 +1,73 @@
+# metrics_server.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from metrics import MetricsRegistry
+from utils.logger import setup_logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsHTTPServer:
+    """Prometheus 指标 HTTP 端点（独立端口）"""
+
+    def __init__(self,
+                 registry: MetricsRegistry,
+                 host: str = "0.0.0.0",
+                 port: int = 9100):
+        """
+        初始化指标端点
+
+        Args:
+            registry: 指标注册表
+            host: 监听地址
+            port: 监听端口
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+        self.logger = setup_logger("metrics_server")
+
+    def _make_handler(self):
+        registry = self.registry
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 抓取请求频繁，不写访问日志
+                pass
+
+        return MetricsRequestHandler
+
+    def start(self):
+        """启动指标端点"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port),
+                                         self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        self.logger.info(
+            f"指标端点已启动: http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        """停止指标端点"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+            self.logger.info("指标端点已停止")
@@ -0,0 +1,159 @@
+# process_pool.py
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Optional, Tuple
+
+from utils.logger import setup_logger
+
+# 载荷描述: ("inline", 序列化数据) 或 ("shm", 共享内存名, 长度)
+Payload = Tuple
+
+
+def _encode(obj: Any, threshold: int) -> Tuple[Payload, Optional[
+        shared_memory.SharedMemory]]:
+    """
+    序列化对象，超过阈值时写入共享内存
+
+    Returns:
+        (载荷描述, 共享内存对象)，共享内存由调用方负责关闭/释放
+    """
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    if not threshold or len(data) < threshold:
+        return ("inline", data), None
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    shm.buf[:len(data)] = data
+    return ("shm", shm.name, len(data)), shm
+
+
+def _decode(payload: Payload, unlink: bool = False) -> Any:
+    """
+    反序列化载荷
+
+    Args:
+        payload: 载荷描述
+        unlink: 读取后是否释放共享内存（结果由主进程读取后释放）
+    """
+    if payload[0] == "inline":
+        return pickle.loads(payload[1])
+    _, name, size = payload
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return pickle.loads(shm.buf[:size])
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+
+
+def _run_in_worker(callback: Callable[[Any, tuple], Any], payload: Payload,
+                   client_address: tuple, shm_threshold: int) -> Payload:
+    """子进程入口：取出消息、调用处理回调、按大小返回结果"""
+    message = _decode(payload)
+    response = callback(message, client_address)
+    result, shm = _encode(response, shm_threshold)
+    if shm is not None:
+        # 只关闭本进程的映射，由主进程读取后释放
+        shm.close()
+    return result
+
+
+class ProcessHandlerPool:
+    """
+    进程池消息处理器
+
+    CPU 密集的处理回调在子进程中执行，不受主进程 GIL 限制；I/O 仍留在主进程。
+    消息和响应序列化后超过 shm_threshold 字节时通过共享内存传递，
+    避免大载荷经过进程间管道复制。回调必须是可按模块路径导入的顶层函数。
+    """
+
+    def __init__(self,
+                 workers: int = 0,
+                 shm_threshold: int = 65536,
+                 start_method: str = "spawn",
+                 name: str = "process_pool"):
+        """
+        初始化进程池
+
+        Args:
+            workers: 子进程数，0 表示使用 CPU 核数
+            shm_threshold: 使用共享内存传递的最小载荷字节数，0 表示总是经管道传递
+            start_method: 子进程启动方式（spawn/forkserver/fork）
+            name: 日志记录器名称
+        """
+        self.workers = workers or multiprocessing.cpu_count()
+        self.shm_threshold = shm_threshold
+        self.start_method = start_method
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # 多个服务器共享同一个进程池，启动/关闭可能来自不同线程
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "shm_requests": 0, "shm_responses": 0}
+        self.logger = setup_logger(name)
+
+    def start(self):
+        """启动进程池"""
+        with self.lock:
+            if self.executor:
+                return
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method))
+        self.logger.info(f"进程池已启动: {self.workers} 个子进程")
+
+    def stop(self):
+        """关闭进程池，取消尚未开始的任务"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if not executor:
+            return
+        executor.shutdown(wait=True, cancel_futures=True)
+        self.logger.info("进程池已关闭")
+
+    def call(self, callback: Callable[[Any, tuple], Any], message: Any,
+             client_address: tuple) -> Any:
+        """
+        在子进程中执行处理回调并等待结果（在分发器工作线程中调用）
+
+        Args:
+            callback: 处理回调，接收(消息数据, 客户端地址)返回响应数据
+            message: 消息数据
+            client_address: 客户端地址
+
+        Returns:
+            Any: 回调的返回值
+        """
+        self.start()
+        self.stats["calls"] += 1
+        payload, shm = _encode(message, self.shm_threshold)
+        if shm is not None:
+            self.stats["shm_requests"] += 1
+        try:
+            future = self.executor.submit(_run_in_worker, callback, payload,
+                                          tuple(client_address),
+                                          self.shm_threshold)
+            result = future.result()
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        if result[0] == "shm":
+            self.stats["shm_responses"] += 1
+        return _decode(result, unlink=True)
+
+    def bind(self, callback: Callable[[Any, tuple],
+                                      Any]) -> Callable[[Any, tuple], Any]:
+        """包装回调，使其在子进程中执行，可直接作为消息处理回调使用"""
+
+        def run(message: Any, client_address: tuple) -> Any:
+            return self.call(callback, message, client_address)
+
+        return run
+
+    def get_stats(self) -> dict:
+        """获取统计信息"""
+        stats = self.stats.copy()
+        stats["workers"] = self.workers
+        stats["running"] = self.executor is not None
+        return stats
@@ -2,27 +2,96 @@
 import json
 import struct
 from datetime import datetime
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# 支持的长度头格式（网络字节序）
+HEADER_FORMATS = {2: '!H', 4: '!I', 8: '!Q'}
+
+
+class ProtocolError(Exception):
+    """协议错误，出现后连接上的字节流已无法继续解析"""
+
+
+class PacketTooLargeError(ProtocolError):
+    """数据包长度超过上限"""
+
+    def __init__(self, length: int, max_size: int):
+        super().__init__(f"数据包长度 {length} 超过上限 {max_size}")
+        self.length = length
+        self.max_size = max_size
+
+
+class FrameChunk:
+    """流式模式下大数据包的一个分片"""
+
+    __slots__ = ("frame_id", "frame_length", "offset", "data")
+
+    def __init__(self, frame_id: int, frame_length: int, offset: int,
+                 data: bytes):
+        self.frame_id = frame_id
+        self.frame_length = frame_length
+        self.offset = offset
+        self.data = data
+
+    @property
+    def final(self) -> bool:
+        """是否为该数据包的最后一个分片"""
+        return self.offset + len(self.data) >= self.frame_length
+
+    def __repr__(self):
+        return (f"FrameChunk(frame_id={self.frame_id}, "
+                f"offset={self.offset}/{self.frame_length}, "
+                f"size={len(self.data)})")
 
 
 class ByteStreamProtocol:
     """
     字节流协议处理器
-    协议格式: [4字节长度][数据]
+    协议格式: [2/4/8字节长度][数据]
     """
 
-    def __init__(self, header_size: int = 4, encoding: str = 'utf-8'):
+    def __init__(self,
+                 header_size: int = 4,
+                 encoding: str = 'utf-8',
+                 max_packet_size: int = 65536,
+                 stream_threshold: int = 0,
+                 max_stream_size: int = 64 * 1024 * 1024):
         """
         初始化协议处理器
 
         Args:
-            header_size: 头部长度（字节）
+            header_size: 头部长度（字节），支持 2/4/8
             encoding: 字符串编码
+            max_packet_size: 完整缓冲后交给处理器的数据包最大长度
+            stream_threshold: 长度达到该值的数据包以分片形式交付，0 表示不启用
+            max_stream_size: 流式数据包的最大长度
         """
+        if header_size not in HEADER_FORMATS:
+            raise ValueError(
+                f"不支持的头部长度: {header_size}，可选 {list(HEADER_FORMATS)}")
         self.header_size = header_size
+        self.header = struct.Struct(HEADER_FORMATS[header_size])
+        self.max_header_value = (1 << (8 * header_size)) - 1
         self.encoding = encoding
+        self.max_packet_size = max_packet_size
+        self.stream_threshold = stream_threshold
+        self.max_stream_size = max_stream_size
         self.buffer = bytearray()
 
+        # 流式模式状态
+        self._frame_counter = 0
+        self._stream_id = 0
+        self._stream_length = 0
+        self._stream_offset = 0
+
+    def new_decoder(self) -> "ByteStreamProtocol":
+        """创建配置相同、缓冲区独立的协议处理器（每个连接一个）"""
+        return ByteStreamProtocol(header_size=self.header_size,
+                                  encoding=self.encoding,
+                                  max_packet_size=self.max_packet_size,
+                                  stream_threshold=self.stream_threshold,
+                                  max_stream_size=self.max_stream_size)
+
     def pack(self, data: Any) -> bytes:
         """
         打包数据为字节流
@@ -43,10 +112,43 @@ class ByteStreamProtocol:
         else:
             data_bytes = str(data).encode(self.encoding)
 
+        if len(data_bytes) > self.max_header_value:
+            raise PacketTooLargeError(len(data_bytes), self.max_header_value)
+
         # 添加长度头
-        header = struct.pack('!I', len(data_bytes))
+        header = self.header.pack(len(data_bytes))
         return header + data_bytes
 
+    def decode(self, data_bytes: Union[bytes, bytearray]) -> Any:
+        """
+        解码数据部分：依次尝试 JSON、字符串，都失败时保持为字节
+
+        Args:
+            data_bytes: 数据部分
+
+        Returns:
+            Any: 解码后的数据
+        """
+        try:
+            # 尝试作为JSON解码
+            return json.loads(data_bytes.decode(self.encoding))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            try:
+                # 尝试作为字符串解码
+                return data_bytes.decode(self.encoding)
+            except UnicodeDecodeError:
+                # 保持为字节
+                return bytes(data_bytes)
+
+    def _check_length(self, data_length: int):
+        """校验长度头，超限时清空缓冲区并抛出异常"""
+        limit = self.max_packet_size
+        if self.stream_threshold and data_length >= self.stream_threshold:
+            limit = self.max_stream_size
+        if data_length > limit:
+            self.clear_buffer()
+            raise PacketTooLargeError(data_length, limit)
+
     def unpack(self, data: bytes) -> Optional[Tuple[Any, bytes]]:
         """
         从字节流解包数据
@@ -56,17 +158,21 @@ class ByteStreamProtocol:
 
         Returns:
             Optional[Tuple[Any, bytes]]: (解包的数据, 剩余的字节流) 或 None
+
+        Raises:
+            PacketTooLargeError: 长度头超过 max_packet_size
         """
         self.buffer.extend(data)
-        import pdb
-        pdb.set_trace()
 
         # 检查是否有足够的数据读取头部
         if len(self.buffer) < self.header_size:
             return None
 
-        # 读取数据长度
-        data_length = struct.unpack('!I', self.buffer[:self.header_size])[0]
+        # 读取数据长度，不等数据到齐就拒绝超限的数据包
+        data_length = self.header.unpack_from(self.buffer)[0]
+        if data_length > self.max_packet_size:
+            self.clear_buffer()
+            raise PacketTooLargeError(data_length, self.max_packet_size)
 
         # 检查是否有完整的数据包
         if len(self.buffer) < self.header_size + data_length:
@@ -78,23 +184,98 @@ class ByteStreamProtocol:
 
         # 从缓冲区移除已处理的数据
         del self.buffer[:self.header_size + data_length]
-        # 尝试解码数据
-        try:
-            # 尝试作为JSON解码
-            decoded_data = json.loads(data_bytes.decode(self.encoding))
-        except json.JSONDecodeError:
-            try:
-                # 尝试作为字符串解码
-                decoded_data = data_bytes.decode(self.encoding)
-            except UnicodeDecodeError:
-                # 保持为字节
-                decoded_data = data_bytes
 
-        return decoded_data, bytes(self.buffer)
+        return self.decode(data_bytes), bytes(self.buffer)
+
+    def unpack_datagram(self, data: bytes) -> Any:
+        """
+        解包一个独立的数据报（UDP），不使用也不影响流缓冲区
+
+        Args:
+            data: 完整的数据报
+
+        Returns:
+            Any: 解包的数据
+
+        Raises:
+            ProtocolError: 数据报格式错误
+            PacketTooLargeError: 长度头超过 max_packet_size
+        """
+        if len(data) < self.header_size:
+            raise ProtocolError(f"数据报长度 {len(data)} 不足头部长度")
+        data_length = self.header.unpack_from(data)[0]
+        if data_length > self.max_packet_size:
+            raise PacketTooLargeError(data_length, self.max_packet_size)
+        if len(data) != self.header_size + data_length:
+            raise ProtocolError(
+                f"数据报长度 {len(data)} 与长度头 {data_length} 不符")
+        return self.decode(data[self.header_size:])
+
+    def feed(self, data: bytes) -> List[Union[Any, FrameChunk]]:
+        """
+        向流缓冲区追加数据并取出所有已完整的数据包
+
+        长度达到 stream_threshold 的数据包不会整体缓冲，
+        而是随数据到达以 FrameChunk 分片交付。
+
+        Args:
+            data: 接收到的字节流
+
+        Returns:
+            List: 解码后的消息或 FrameChunk
+
+        Raises:
+            PacketTooLargeError: 长度头超过上限
+        """
+        self.buffer.extend(data)
+        items: List[Union[Any, FrameChunk]] = []
+
+        while True:
+            # 正在流式接收的大数据包：有多少交付多少
+            if self._stream_length:
+                if not self.buffer:
+                    break
+                take = min(len(self.buffer),
+                           self._stream_length - self._stream_offset)
+                chunk = FrameChunk(self._stream_id, self._stream_length,
+                                   self._stream_offset,
+                                   bytes(self.buffer[:take]))
+                del self.buffer[:take]
+                self._stream_offset += take
+                if self._stream_offset >= self._stream_length:
+                    self._stream_length = 0
+                    self._stream_offset = 0
+                items.append(chunk)
+                continue
+
+            if len(self.buffer) < self.header_size:
+                break
+
+            data_length = self.header.unpack_from(self.buffer)[0]
+            self._check_length(data_length)
+
+            if self.stream_threshold and data_length >= self.stream_threshold:
+                del self.buffer[:self.header_size]
+                self._frame_counter += 1
+                self._stream_id = self._frame_counter
+                self._stream_length = data_length
+                self._stream_offset = 0
+                continue
+
+            end = self.header_size + data_length
+            if len(self.buffer) < end:
+                break
+            data_bytes = self.buffer[self.header_size:end]
+            del self.buffer[:end]
+            items.append(self.decode(data_bytes))
+
+        return items
 
     def clear_buffer(self):
         """清空缓冲区"""
         self.buffer.clear()
+        self._stream_length = 0
+        self._stream_offset = 0
 
     def create_response(self,
                         success: bool,
@@ -117,3 +298,27 @@ class ByteStreamProtocol:
             "data": data,
             "timestamp": datetime.now().isoformat()
         }
+
+
+def create_protocol(settings) -> Union[ByteStreamProtocol, Any]:
+    """
+    按 protocol 配置段创建协议处理器
+
+    Args:
+        settings: ProtocolSettings，framing 为 length 时使用长度头协议，
+            为 device 时使用上位机设备帧协议
+
+    Returns:
+        ByteStreamProtocol 或 DeviceFrameProtocol
+    """
+    if settings.framing == "device":
+        # 延迟导入：device_protocol 依赖本模块的异常类型
+        from device_protocol import DeviceFrameProtocol
+        return DeviceFrameProtocol(channels=settings.channels,
+                                   max_packet_size=settings.max_packet_size,
+                                   encoding=settings.encoding)
+    return ByteStreamProtocol(header_size=settings.header_size,
+                              encoding=settings.encoding,
+                              max_packet_size=settings.max_packet_size,
+                              stream_threshold=settings.stream_threshold,
+                              max_stream_size=settings.max_stream_size)
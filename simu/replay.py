@@ -0,0 +1,276 @@
+# replay.py
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from capture import DIR_IN, DIR_OPEN, CaptureReader
+from unix_server import socket_path
+from utils.logger import setup_logger
+
+logger = setup_logger("replay")
+
+
+class SessionReplay:
+    """单个会话的回放：按原始时间间隔重新发送对端发出的数据"""
+
+    def __init__(self, session: int, info: dict,
+                 records: List[Tuple[int, bytes]]):
+        """
+        初始化会话回放
+
+        Args:
+            session: 会话号
+            info: 会话元数据
+            records: [(时间戳 ns, 原始字节)]，只包含对端发出的数据
+        """
+        self.session = session
+        self.protocol = info.get("protocol", "tcp")
+        self.peer = tuple(info.get("peer", ()))
+        self.records = records
+        self.datagram = self.protocol in ("udp", "unix_dgram")
+        self.local_path: Optional[str] = None
+        self.stats = {
+            "session": session,
+            "protocol": self.protocol,
+            "peer": self.peer,
+            "sent_records": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+            "max_lag_ms": 0.0,
+            "error": None
+        }
+
+    def _open_socket(self, host: str, port: int,
+                     unix_dir: str) -> socket.socket:
+        """按会话协议连接目标服务器"""
+        if self.protocol == "udp":
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect((host, port))
+            return sock
+        if self.protocol in ("unix", "unix_dgram"):
+            path = socket_path(unix_dir, port, self.datagram)
+            if self.datagram:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                # 数据报客户端需要绑定路径才能收到响应
+                self.local_path = os.path.join(
+                    tempfile.gettempdir(),
+                    f"simu_replay_{os.getpid()}_{self.session}.sock")
+                self._unlink_local()
+                sock.bind(self.local_path)
+            else:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(5)
+            sock.connect(path)
+            return sock
+        return socket.create_connection((host, port), timeout=5)
+
+    def _unlink_local(self):
+        if self.local_path:
+            try:
+                os.unlink(self.local_path)
+            except OSError:
+                pass
+
+    def run(self, host: str, port: int, t0_ns: int, start: float,
+            speed: float, unix_dir: str = "/tmp"):
+        """
+        执行回放
+
+        Args:
+            host: 目标地址
+            port: 目标端口
+            t0_ns: 抓包中第一条记录的时间戳，作为时间零点
+            start: 回放开始的 perf_counter 时间
+            speed: 回放倍速，0 表示不等待、尽快发送
+            unix_dir: Unix 套接字会话的目标套接字目录
+        """
+        try:
+            sock = self._open_socket(host, port, unix_dir)
+        except OSError as e:
+            self.stats["error"] = f"连接失败: {e}"
+            self._unlink_local()
+            return
+
+        sock.settimeout(None)
+        reader = threading.Thread(target=self._drain, args=(sock, ),
+                                  daemon=True)
+        reader.start()
+        try:
+            for ts_ns, payload in self.records:
+                if speed > 0:
+                    due = start + (ts_ns - t0_ns) / 1e9 / speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        self.stats["max_lag_ms"] = max(
+                            self.stats["max_lag_ms"], -delay * 1000)
+                if self.datagram:
+                    sock.send(payload)
+                else:
+                    sock.sendall(payload)
+                self.stats["sent_records"] += 1
+                self.stats["bytes_sent"] += len(payload)
+            # 留出时间接收最后的响应
+            time.sleep(0.2)
+        except OSError as e:
+            self.stats["error"] = f"发送失败: {e}"
+        finally:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+            reader.join(timeout=1)
+            self._unlink_local()
+
+    def _drain(self, sock: socket.socket):
+        """读取并丢弃服务器响应，只统计字节数"""
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            self.stats["bytes_received"] += len(data)
+
+
+def load_sessions(path: str,
+                  sessions: Optional[List[int]] = None,
+                  protocol: Optional[str] = None
+                  ) -> Tuple[List[SessionReplay], int]:
+    """
+    从抓包文件加载需要回放的会话
+
+    Args:
+        path: 抓包文件路径
+        sessions: 只回放这些会话号，None 表示全部
+        protocol: 只回放该协议的会话
+
+    Returns:
+        (会话列表, 时间零点 ns)
+    """
+    infos: Dict[int, dict] = {}
+    records: Dict[int, List[Tuple[int, bytes]]] = {}
+    t0_ns = 0
+    with CaptureReader(path) as reader:
+        for record in reader:
+            if sessions and record.session not in sessions:
+                continue
+            if record.direction == DIR_OPEN:
+                info = json.loads(bytes(record.payload))
+                if protocol and info.get("protocol") != protocol:
+                    continue
+                infos[record.session] = info
+                records[record.session] = []
+            elif record.direction == DIR_IN and record.session in records:
+                if not t0_ns:
+                    t0_ns = record.ts_ns
+                records[record.session].append(
+                    (record.ts_ns, bytes(record.payload)))
+
+    replays = [
+        SessionReplay(session, infos[session], items)
+        for session, items in records.items() if items
+    ]
+    return replays, t0_ns
+
+
+def replay(path: str,
+           host: str,
+           port: int,
+           speed: float = 1.0,
+           sessions: Optional[List[int]] = None,
+           protocol: Optional[str] = None,
+           unix_dir: str = "/tmp") -> List[dict]:
+    """
+    回放抓包文件中的会话，每个会话一个线程并保持原始的相对时间
+
+    Args:
+        path: 抓包文件路径
+        host: 目标地址
+        port: 目标端口
+        speed: 回放倍速，0 表示尽快发送
+        sessions: 只回放这些会话号
+        protocol: 只回放该协议的会话
+        unix_dir: Unix 套接字会话的目标套接字目录
+
+    Returns:
+        List[dict]: 每个会话的回放统计
+    """
+    replays, t0_ns = load_sessions(path, sessions, protocol)
+    if not replays:
+        logger.warning("抓包文件中没有可回放的会话")
+        return []
+
+    logger.info(f"回放 {len(replays)} 个会话到 {host}:{port}，倍速 {speed or '最快'}")
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(target=item.run,
+                         args=(host, port, t0_ns, start, speed, unix_dir),
+                         daemon=True) for item in replays
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    results = [item.stats for item in replays]
+    total_sent = sum(item["bytes_sent"] for item in results)
+    total_received = sum(item["bytes_received"] for item in results)
+    errors = sum(1 for item in results if item["error"])
+    logger.info(f"回放完成: 耗时 {elapsed:.2f} 秒，发送 {total_sent} 字节，"
+                f"接收 {total_received} 字节，失败会话 {errors}")
+    return results
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="抓包回放工具")
+    parser.add_argument("capture", help="抓包文件路径")
+    parser.add_argument("--host", default="127.0.0.1", help="目标地址 (默认: 127.0.0.1)")
+    parser.add_argument("-p", "--port", type=int, required=True, help="目标端口")
+    parser.add_argument("--speed",
+                        type=float,
+                        default=1.0,
+                        help="回放倍速，0 表示尽快发送 (默认: 1.0)")
+    parser.add_argument("--session",
+                        type=int,
+                        nargs="+",
+                        help="只回放指定的会话号")
+    parser.add_argument("--protocol",
+                        choices=["tcp", "udp", "unix", "unix_dgram"],
+                        help="只回放指定协议的会话")
+    parser.add_argument("--unix-dir",
+                        default="/tmp",
+                        help="Unix 套接字会话的目标套接字目录 (默认: /tmp)")
+    parser.add_argument("--list",
+                        action="store_true",
+                        help="只列出抓包中的会话")
+
+    args = parser.parse_args()
+
+    if args.list:
+        with CaptureReader(args.capture) as reader:
+            for session, info in reader.sessions().items():
+                print(f"会话 {session}: {info}")
+        return
+
+    for result in replay(args.capture, args.host, args.port, args.speed,
+                         args.session, args.protocol, args.unix_dir):
+        print(f"会话 {result['session']} ({result['protocol']} {result['peer']}): "
+              f"发送 {result['sent_records']} 条/{result['bytes_sent']} 字节, "
+              f"接收 {result['bytes_received']} 字节, "
+              f"最大延迟 {result['max_lag_ms']:.1f} ms"
+              f"{', 错误: ' + result['error'] if result['error'] else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,19 +4,30 @@ import threading
 import time
 from typing import Any, Callable, Dict, List, Optional
 
+from capture import CaptureWriter, open_capture
 from client_handler import ClientHandler
-from config import Config
-from protocol import ByteStreamProtocol
+from config import Config, ConfigSnapshot
+from dispatcher import Dispatcher
+from idle_monitor import IdleMonitor
+from metrics import MetricsRegistry, ServerMetrics, default_registry
+from process_pool import ProcessHandlerPool
+from protocol import FrameChunk, create_protocol
 from utils.logger import setup_logger
+from write_engine import WriteEngine
 
 
 class TCPServer:
     """TCP服务器"""
 
+    # 协议名称，用于指标标签、抓包和日志
+    PROTOCOL = "tcp"
+
     def __init__(self,
                  host: str = "0.0.0.0",
                  port: int = 8888,
-                 config: Config = None):
+                 config: Config = None,
+                 metrics: MetricsRegistry = None,
+                 process_pool: ProcessHandlerPool = None):
         """
         初始化TCP服务器
 
@@ -24,6 +35,8 @@ class TCPServer:
             host: 监听地址
             port: 监听端口
             config: 配置对象
+            metrics: 指标注册表，默认使用全局注册表
+            process_pool: 共享的进程池，默认为本服务器单独创建（由本服务器关闭）
         """
         self.host = host
         self.port = port
@@ -39,12 +52,12 @@ class TCPServer:
         self.client_lock = threading.Lock()
 
         # 协议处理器
-        self.protocol = ByteStreamProtocol(
-            header_size=self.config.get("protocol.header_size", 4),
-            encoding=self.config.get("protocol.encoding", "utf-8"))
+        settings = self.config.snapshot()
+        self.protocol = create_protocol(settings.protocol)
 
         # 消息处理回调
         self.message_callback: Optional[Callable] = None
+        self.chunk_callback: Optional[Callable] = None
 
         # 统计信息
         self.stats = {
@@ -53,22 +66,94 @@ class TCPServer:
             "current_connections": 0,
             "max_concurrent_connections": 0
         }
+        self.metrics = ServerMetrics(metrics or default_registry, self.PROTOCOL,
+                                     port)
+
+        # 空闲连接监控（server.timeout 为读空闲超时）
+        self.idle_monitor = IdleMonitor(
+            read_idle=settings.server.timeout,
+            write_idle=settings.server.write_idle_timeout,
+            max_lifetime=settings.server.max_lifetime,
+            tick=settings.server.idle_check_interval,
+            name=f"idle_monitor_{port}")
+
+        # 发送引擎：所有连接的发送队列共享一个发送线程
+        self.write_engine = WriteEngine(name=f"write_engine_{port}")
+
+        # 消息分发：处理回调在工作线程执行，不阻塞连接的接收
+        self.dispatcher = Dispatcher(workers=settings.dispatch.workers,
+                                     queue_size=settings.dispatch.queue_size,
+                                     metrics=self.metrics,
+                                     name=f"dispatcher_{port}")
+
+        # 可选的进程池处理模式（首次使用时启动），多端口时由管理器共享一个进程池
+        self.owns_process_pool = process_pool is None
+        self.process_pool = process_pool or ProcessHandlerPool(
+            workers=settings.process_pool.workers,
+            shm_threshold=settings.process_pool.shm_threshold,
+            start_method=settings.process_pool.start_method,
+            name=f"process_pool_{port}")
+
+        # 抓包（capture.path 非空时随服务器启动）
+        self.capture: Optional[CaptureWriter] = None
+
+        # 配置热更新订阅
+        self._unsubscribe_config: Optional[Callable[[], None]] = None
 
         # 日志记录器
         self.logger = setup_logger(name=f"server_{port}",
-                                   level=self.config.get(
-                                       "logging.level", "INFO"),
-                                   log_file=self.config.get("logging.file"))
+                                   level=settings.logging.level,
+                                   log_file=settings.logging.file)
 
-    def set_message_callback(self, callback: Callable[[Any, tuple], Any]):
+    def set_message_callback(self,
+                             callback: Callable[[Any, tuple], Any],
+                             use_process_pool: bool = False):
         """
         设置消息处理回调函数
 
         Args:
             callback: 回调函数，接收(消息数据, 客户端地址)返回响应数据
+            use_process_pool: 是否在子进程中执行回调（适用于 CPU 密集的处理，
+                回调必须是可导入的顶层函数，消息和响应必须可序列化）
         """
+        if use_process_pool:
+            self.process_pool.start()
+            callback = self.process_pool.bind(callback)
         self.message_callback = callback
 
+    def set_chunk_callback(self, callback: Callable[[FrameChunk, tuple],
+                                                    Any]):
+        """
+        设置流式大数据包的分片处理回调
+
+        长度达到 protocol.stream_threshold 的数据包不整体缓冲，
+        每收到一段就以 FrameChunk 交给回调，最后一个分片的返回值作为响应。
+
+        Args:
+            callback: 回调函数，接收(FrameChunk, 客户端地址)
+        """
+        self.chunk_callback = callback
+
+    def start_capture(self, path: str):
+        """
+        开始抓包，之后建立的连接的收发数据都记录到文件
+
+        Args:
+            path: 抓包文件路径，可包含 {protocol} 和 {port} 占位符
+        """
+        self.stop_capture()
+        path = path.format(protocol=self.PROTOCOL, port=self.port)
+        self.capture = open_capture(path)
+        self.logger.info(f"开始抓包: {path}")
+
+    def stop_capture(self):
+        """停止抓包并关闭文件"""
+        capture, self.capture = self.capture, None
+        if capture:
+            capture.close()
+            self.logger.info(f"抓包已保存: {capture.path} "
+                             f"({capture.stats['records']} 条记录)")
+
     def default_message_handler(self, message: Any,
                                 client_address: tuple) -> Dict:
         """
@@ -92,7 +177,7 @@ class TCPServer:
                                                  time.time(),
                                                  "server_port": self.port,
                                                  "client_count":
-                                                 len(self.clients)
+                                                 self.stats["current_connections"]
                                              })
 
     def start(self):
@@ -102,33 +187,51 @@ class TCPServer:
             return
 
         try:
-            # 创建服务器套接字
-            self.server_socket = socket.socket(socket.AF_INET,
-                                               socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET,
-                                          socket.SO_REUSEADDR, 1)
-
-            # 绑定地址和端口
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(
-                self.config.get("server.max_connections", 100))
+            # 创建服务器套接字并开始监听
+            self.server_socket = self._create_server_socket()
 
             # 设置服务器为运行状态
             self.running = True
             self.stats["start_time"] = time.time()
+            self.idle_monitor.start()
+            self.write_engine.start()
+            self.dispatcher.start()
+            self._unsubscribe_config = self.config.subscribe(
+                self._on_config_change)
+            capture_path = self.config.snapshot().capture.path
+            if capture_path:
+                self.start_capture(capture_path)
 
             # 启动服务器线程
             self.server_thread = threading.Thread(target=self._run_server,
                                                   daemon=True)
             self.server_thread.start()
 
-            self.logger.info(f"TCP服务器已启动，监听 {self.host}:{self.port}")
+            self.logger.info(
+                f"{self.PROTOCOL.upper()}服务器已启动，监听 {self.listen_address}")
 
         except Exception as e:
             self.logger.error(f"启动服务器失败: {e}")
             self.running = False
             raise
 
+    def _create_server_socket(self) -> socket.socket:
+        """创建、绑定并监听服务器套接字（子类可替换地址族）"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((self.host, self.port))
+        server_socket.listen(self.config.snapshot().server.max_connections)
+        return server_socket
+
+    @property
+    def listen_address(self) -> str:
+        """监听地址描述"""
+        return f"{self.host}:{self.port}"
+
+    def _client_address(self, address: Any) -> tuple:
+        """将 accept 返回的对端地址规范为 (host, port) 形式"""
+        return address
+
     def stop(self):
         """停止服务器"""
         if not self.running:
@@ -136,16 +239,31 @@ class TCPServer:
 
         self.logger.info("正在停止服务器...")
         self.running = False
+        if self._unsubscribe_config:
+            self._unsubscribe_config()
+            self._unsubscribe_config = None
+        self.idle_monitor.stop()
 
-        # 关闭所有客户端连接
+        # 关闭所有客户端连接（在锁外停止，关闭回调会重新获取锁注销）
+        with self.client_lock:
+            handlers = list(self.clients.values())
+        for handler in handlers:
+            handler.stop()
         with self.client_lock:
-            client_ids = list(self.clients.keys())
-            for client_id in client_ids:
-                self.clients[client_id].stop()
             self.clients.clear()
+        self.dispatcher.stop()
+        if self.owns_process_pool:
+            self.process_pool.stop()
+        self.write_engine.stop()
+        self.stop_capture()
 
         # 关闭服务器套接字
         if self.server_socket:
+            try:
+                # shutdown 可唤醒阻塞在 accept 上的服务器线程
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             try:
                 self.server_socket.close()
             except:
@@ -163,36 +281,36 @@ class TCPServer:
             try:
                 # 接受客户端连接
                 client_socket, client_address = self.server_socket.accept()
-
-                # 统计连接数
-                self.stats["total_connections"] += 1
-                current_conn = len(self.clients) + 1
-                self.stats["current_connections"] = current_conn
-                self.stats["max_concurrent_connections"] = max(
-                    self.stats["max_concurrent_connections"], current_conn)
-
-                # 创建客户端处理器
-                client_handler = ClientHandler(client_socket=client_socket,
-                                               client_address=client_address,
-                                               protocol=self.protocol,
-                                               on_message=self.message_callback
-                                               or self.default_message_handler,
-                                               timeout=self.config.get(
-                                                   "server.timeout", 30))
-
-                # 生成客户端ID
-                client_id = f"{client_address[0]}:{client_address[1]}:{id(client_handler)}"
+                client_address = self._client_address(client_address)
+
+                # 创建客户端处理器（每个连接只读取一次当前配置快照）
+                settings = self.config.snapshot().server
+                client_handler = ClientHandler(
+                    client_socket=client_socket,
+                    client_address=client_address,
+                    protocol=self.protocol,
+                    on_message=self.message_callback
+                    or self.default_message_handler,
+                    metrics=self.metrics,
+                    on_close=self._unregister_client,
+                    write_engine=self.write_engine,
+                    max_queued_frames=settings.max_queued_frames,
+                    slow_consumer_policy=settings.slow_consumer_policy,
+                    max_queued_bytes=settings.max_queued_bytes,
+                    write_high_watermark=settings.write_high_watermark,
+                    write_low_watermark=settings.write_low_watermark,
+                    on_chunk=self.chunk_callback,
+                    recv_buffer_size=settings.receive_buffer_size,
+                    dispatcher=self.dispatcher,
+                    capture=self.capture,
+                    capture_protocol=self.PROTOCOL)
 
                 # 添加到客户端列表
-                with self.client_lock:
-                    self.clients[client_id] = client_handler
+                self._register_client(client_handler)
 
                 # 启动客户端处理
                 client_handler.start()
 
-                # 清理已断开连接
-                self._cleanup_clients()
-
             except socket.timeout:
                 continue
             except OSError as e:
@@ -204,21 +322,51 @@ class TCPServer:
                 if self.running:
                     time.sleep(1)
 
-    def _cleanup_clients(self):
-        """清理已断开连接的客户端"""
+    def _on_config_change(self, old: ConfigSnapshot, new: ConfigSnapshot):
+        """
+        配置热更新：超时、日志级别和各项限制立即生效，
+        发送队列限制对新连接生效，监听地址、线程数等需重启服务器
+        """
+        self.idle_monitor.update_limits(new.server.timeout,
+                                        new.server.write_idle_timeout,
+                                        new.server.max_lifetime)
+        self.logger.setLevel(new.logging.level.upper())
+        self.protocol.max_packet_size = new.protocol.max_packet_size
+        if new.protocol.framing == "length":
+            self.protocol.stream_threshold = new.protocol.stream_threshold
+            self.protocol.max_stream_size = new.protocol.max_stream_size
+        self.dispatcher.queue_size = new.dispatch.queue_size
+
+        if (old.protocol.header_size != new.protocol.header_size
+                or old.protocol.encoding != new.protocol.encoding
+                or old.protocol.framing != new.protocol.framing
+                or old.protocol.channels != new.protocol.channels
+                or old.dispatch.workers != new.dispatch.workers
+                or old.server.max_connections != new.server.max_connections):
+            self.logger.warning("协议头部、编码、帧格式、通道数、工作线程数和最大连接数的修改需重启服务器生效")
+        self.logger.info(f"已应用配置版本 {new.version}")
+
+    def _register_client(self, handler: ClientHandler):
+        """登记新连接并增量维护连接计数"""
         with self.client_lock:
-            disconnected = []
-            for client_id, handler in self.clients.items():
-                if not handler.thread.is_alive():
-                    disconnected.append(client_id)
-
-            for client_id in disconnected:
-                del self.clients[client_id]
-
-            self.stats["current_connections"] = len(self.clients)
-
-            if disconnected:
-                self.logger.debug(f"清理了 {len(disconnected)} 个断开连接的客户端")
+            self.clients[handler.client_id] = handler
+            self.stats["total_connections"] += 1
+            self.stats["current_connections"] += 1
+            self.stats["max_concurrent_connections"] = max(
+                self.stats["max_concurrent_connections"],
+                self.stats["current_connections"])
+        self.metrics.connection_opened()
+        self.idle_monitor.register(handler)
+
+    def _unregister_client(self, handler: ClientHandler):
+        """连接关闭回调：从连接表注销并增量维护连接计数"""
+        with self.client_lock:
+            if self.clients.pop(handler.client_id, None) is None:
+                return
+            self.stats["current_connections"] -= 1
+        self.metrics.connection_closed()
+        self.idle_monitor.unregister(handler)
+        self.logger.debug(f"客户端已注销: {handler.client_id}")
 
     def broadcast(self, message: Any) -> int:
         """
@@ -230,21 +378,50 @@ class TCPServer:
         Returns:
             int: 成功发送的客户端数量
         """
-        success_count = 0
+        # 只编码一次，所有连接共享同一个不可变帧
+        frame = self.protocol.pack(message)
 
+        # 锁内只复制连接列表，入队在锁外进行，不阻塞 accept
         with self.client_lock:
-            for handler in self.clients.values():
-                if handler.send(message):
-                    success_count += 1
+            handlers = list(self.clients.values())
 
-        self.logger.info(f"广播消息给 {success_count}/{len(self.clients)} 个客户端")
+        success_count = 0
+        slow_consumers = 0
+        for handler in handlers:
+            if handler.send_frame(frame):
+                success_count += 1
+            else:
+                slow_consumers += 1
+
+        if slow_consumers:
+            self.logger.warning(
+                f"广播时 {slow_consumers} 个客户端发送队列已满"
+                f"（策略: {self.config.snapshot().server.slow_consumer_policy}）")
+        self.logger.info(f"广播消息给 {success_count}/{len(handlers)} 个客户端")
         return success_count
 
-    def get_server_stats(self) -> Dict:
-        """获取服务器统计信息"""
+    def get_server_stats(self, include_clients: bool = True) -> Dict:
+        """
+        获取服务器统计信息
+
+        Args:
+            include_clients: 是否附带每个客户端的详细统计（需遍历连接表）
+
+        Returns:
+            Dict: 统计信息
+        """
         stats = self.stats.copy()
         stats["uptime"] = time.time() - stats["start_time"]
-        stats["client_count"] = len(self.clients)
+        stats["client_count"] = stats["current_connections"]
+        stats["bytes_received"] = self.metrics.bytes_received.value
+        stats["bytes_sent"] = self.metrics.bytes_sent.value
+        stats["messages_received"] = self.metrics.messages_received.value
+        stats["messages_sent"] = self.metrics.messages_sent.value
+        stats["dispatch"] = self.dispatcher.get_stats()
+        stats["process_pool"] = self.process_pool.get_stats()
+
+        if not include_clients:
+            return stats
 
         # 客户端详细统计
         client_stats = []
@@ -257,4 +434,4 @@ class TCPServer:
 
     def get_client_count(self) -> int:
         """获取当前客户端连接数"""
-        return len(self.clients)
+        return self.stats["current_connections"]
@@ -0,0 +1,160 @@
+"""测试配置快照、热更新与运行时覆盖"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+from config import Config, ConfigWatcher, ProtocolSettings
+
+
+class ConfigSnapshotTest(unittest.TestCase):
+
+    def test_default_config_matches_sections(self):
+        """默认配置由配置段类型生成，快照与各配置段的默认值一致"""
+        snapshot = Config().snapshot()
+        self.assertEqual(snapshot.protocol, ProtocolSettings())
+        self.assertEqual(Config.DEFAULT_CONFIG["protocol"]["framing"],
+                         ProtocolSettings.framing)
+        self.assertEqual(Config.DEFAULT_CONFIG["impairment"]["peers"], {})
+
+    def test_peers_are_read_only(self):
+        config = Config()
+        config.set("impairment.peers", {"127.0.0.1": "loss=0.1"})
+        peers = config.snapshot().impairment.peers
+        self.assertEqual(dict(peers), {"127.0.0.1": "loss=0.1"})
+        with self.assertRaises(TypeError):
+            peers["127.0.0.2"] = "loss=0.2"
+        with self.assertRaises(ValueError):
+            config.set("impairment.peers", "loss=0.1")
+
+
+class ConfigReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.write({"server": {"timeout": 30}})
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def write(self, data):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def test_reload_applies_file(self):
+        config = Config(self.path)
+        self.assertEqual(config.snapshot().server.timeout, 30)
+        version = config.snapshot().version
+        self.write({"server": {"timeout": 60}})
+        self.assertTrue(config.reload())
+        self.assertEqual(config.snapshot().server.timeout, 60)
+        self.assertEqual(config.snapshot().version, version + 1)
+        # 内容未变化时不替换快照
+        self.assertFalse(config.reload())
+
+    def test_reload_keeps_overrides(self):
+        """命令行参数通过 set() 设置，重新加载文件后不能被默认值覆盖"""
+        config = Config(self.path)
+        config.set("protocol.framing", "device")
+        config.set("capture.path", "/tmp/{protocol}_{port}.cap")
+        config.set("impairment.profile", "loss=0.1")
+        config.set("multicast.group", "239.255.0.1")
+        self.write({"server": {"timeout": 60}, "capture": {"path": ""}})
+        self.assertTrue(config.reload())
+        snapshot = config.snapshot()
+        self.assertEqual(snapshot.server.timeout, 60)
+        self.assertEqual(snapshot.protocol.framing, "device")
+        self.assertEqual(snapshot.capture.path, "/tmp/{protocol}_{port}.cap")
+        self.assertEqual(snapshot.impairment.profile, "loss=0.1")
+        self.assertEqual(snapshot.multicast.group, "239.255.0.1")
+
+    def test_invalid_reload_keeps_current(self):
+        config = Config(self.path)
+        self.write({"protocol": {"framing": "bogus"}})
+        self.assertFalse(config.reload())
+        self.assertEqual(config.snapshot().protocol.framing, "length")
+
+    def test_invalid_set_is_not_kept(self):
+        config = Config(self.path)
+        with self.assertRaises(ValueError):
+            config.set("protocol.framing", "bogus")
+        self.assertEqual(config.overrides, {})
+        self.assertFalse(config.reload())
+
+    def test_concurrent_set_and_reload(self):
+        """并发的 set() 与重新加载互不丢失对方的修改"""
+        config = Config(self.path)
+        fd, other = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.unlink, other)
+        with open(other, "w", encoding="utf-8") as f:
+            json.dump({"server": {"timeout": 31}}, f)
+        stop = threading.Event()
+        # 频繁切换线程，让重新加载落在 set() 的各个步骤之间
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+        seen = []
+        config.subscribe(lambda old, new: seen.append(
+            (new.version, [new.get(f"extra{n}.value", -1) for n in range(4)])))
+
+        def reloader():
+            while not stop.is_set():
+                config.reload(other)
+                config.reload(self.path)
+
+        def setter(section):
+            for i in range(200):
+                config.set(f"{section}.value", i)
+
+        thread = threading.Thread(target=reloader)
+        thread.start()
+        setters = [
+            threading.Thread(target=setter, args=(f"extra{n}", ))
+            for n in range(4)
+        ]
+        for setter_thread in setters:
+            setter_thread.start()
+        for setter_thread in setters:
+            setter_thread.join()
+        stop.set()
+        thread.join()
+        for n in range(4):
+            self.assertEqual(config.get(f"extra{n}.value"), 199)
+        # 按版本排序后每个覆盖值只增不减：重新加载没有退回 set() 之前的值
+        values = [v for _, v in sorted(seen)]
+        for previous, current in zip(values, values[1:]):
+            for n in range(4):
+                self.assertGreaterEqual(current[n], previous[n])
+
+    def test_subscribers_see_old_and_new(self):
+        config = Config(self.path)
+        changes = []
+        unsubscribe = config.subscribe(
+            lambda old, new: changes.append(
+                (old.server.timeout, new.server.timeout)))
+        self.write({"server": {"timeout": 45}})
+        config.reload()
+        unsubscribe()
+        self.write({"server": {"timeout": 50}})
+        config.reload()
+        self.assertEqual(changes, [(30, 45)])
+
+    def test_watcher_detects_change(self):
+        config = Config(self.path)
+        config.set("protocol.framing", "device")
+        watcher = ConfigWatcher(config, self.path)
+        self.assertFalse(watcher.check())
+        self.write({"server": {"timeout": 90}, "logging": {"level": "DEBUG"}})
+        self.assertTrue(watcher.check())
+        self.assertEqual(config.snapshot().server.timeout, 90)
+        self.assertEqual(config.snapshot().protocol.framing, "device")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""测试消息分发器"""
+
+import threading
+import time
+import unittest
+
+from dispatcher import Dispatcher
+
+
+class DispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = None
+
+    def tearDown(self):
+        if self.dispatcher:
+            self.dispatcher.stop()
+
+    def start(self, **kwargs) -> Dispatcher:
+        self.dispatcher = Dispatcher(name="test_dispatcher", **kwargs)
+        self.dispatcher.start()
+        return self.dispatcher
+
+    def wait_idle(self, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while self.dispatcher.pending() or self.dispatcher.pending_tasks:
+            self.assertLess(time.monotonic(), deadline, "分发器未处理完任务")
+            time.sleep(0.005)
+
+    def test_per_key_order(self):
+        """同一 key 的任务按提交顺序执行，即使跨越多个批次和工作线程"""
+        dispatcher = self.start(workers=4, queue_size=10_000, batch=3)
+        results = {key: [] for key in range(8)}
+        for index in range(200):
+            for key, values in results.items():
+                self.assertTrue(
+                    dispatcher.submit(key, lambda v=values, i=index: v.append(i)))
+        self.wait_idle()
+        for values in results.values():
+            self.assertEqual(values, list(range(200)))
+
+    def test_slow_key_does_not_block_others(self):
+        dispatcher = self.start(workers=2, queue_size=100)
+        release = threading.Event()
+        done = threading.Event()
+        dispatcher.submit("slow", release.wait)
+        dispatcher.submit("fast", done.set)
+        self.assertTrue(done.wait(2))
+        release.set()
+
+    def test_shed_when_full(self):
+        dispatcher = self.start(workers=1, queue_size=3)
+        release = threading.Event()
+        started = threading.Event()
+        dispatcher.submit("a", lambda: (started.set(), release.wait()))
+        self.assertTrue(started.wait(2))
+        accepted = [dispatcher.submit("a", lambda: None) for _ in range(5)]
+        self.assertEqual(accepted, [True, True, True, False, False])
+        self.assertEqual(dispatcher.get_stats()["shed"], 2)
+        release.set()
+        self.wait_idle()
+        self.assertTrue(dispatcher.submit("a", lambda: None))
+
+    def test_failed_task_does_not_stop_key(self):
+        dispatcher = self.start(workers=1)
+        results = []
+        dispatcher.submit("a", lambda: 1 / 0)
+        dispatcher.submit("a", lambda: results.append(1))
+        self.wait_idle()
+        self.assertEqual(results, [1])
+        self.assertEqual(dispatcher.get_stats()["failed"], 1)
+
+    def test_inline(self):
+        dispatcher = self.start(workers=0)
+        results = []
+        self.assertTrue(dispatcher.submit("a", lambda: results.append(1)))
+        self.assertEqual(results, [1])
+
+    def test_submit_after_stop(self):
+        dispatcher = self.start(workers=1)
+        dispatcher.stop()
+        self.assertFalse(dispatcher.submit("a", lambda: None))
+
+
+if __name__ == "__main__":
+    unittest.main()
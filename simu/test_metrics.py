@@ -0,0 +1,42 @@
+"""测试服务器指标的并发更新"""
+
+import threading
+import unittest
+
+from metrics import Gauge, MetricsRegistry, ServerMetrics
+
+
+class GaugeTest(unittest.TestCase):
+
+    def test_set_max_only_raises(self):
+        gauge = Gauge()
+        gauge.set_max(5)
+        gauge.set_max(3)
+        self.assertEqual(gauge.value, 5)
+        self.assertEqual(gauge.inc(), 6)
+
+
+class ServerMetricsTest(unittest.TestCase):
+
+    def test_connections_max_under_concurrent_accepts(self):
+        metrics = ServerMetrics(MetricsRegistry(), "tcp", 0)
+        start = threading.Barrier(8)
+
+        def accept():
+            start.wait()
+            for _ in range(1000):
+                metrics.connection_opened()
+
+        threads = [threading.Thread(target=accept) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(metrics.connections_current.value, 8000)
+        self.assertEqual(metrics.connections_max.value, 8000)
+        metrics.connection_closed()
+        self.assertEqual(metrics.connections_max.value, 8000)
+
+
+if __name__ == "__main__":
+    unittest.main()
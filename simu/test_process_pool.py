@@ -0,0 +1,60 @@
+"""测试进程池消息处理"""
+
+import socket
+import unittest
+
+from config import Config
+from main import MultiPortServerManager, default_process_handler
+from process_pool import ProcessHandlerPool
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ProcessHandlerPoolTest(unittest.TestCase):
+
+    def test_call_inline_and_shared_memory(self):
+        pool = ProcessHandlerPool(workers=1, shm_threshold=1024)
+        try:
+            small = pool.call(default_process_handler, "hi", ("a", 1))
+            large = pool.call(default_process_handler, "x" * 4096, ("a", 1))
+        finally:
+            pool.stop()
+        self.assertEqual(small["data"]["original_message"], "hi")
+        self.assertEqual(large["data"]["original_message"], "x" * 4096)
+        stats = pool.get_stats()
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["shm_requests"], 1)
+        self.assertEqual(stats["shm_responses"], 1)
+        self.assertFalse(stats["running"])
+
+
+class SharedProcessPoolTest(unittest.TestCase):
+
+    def test_manager_shares_one_pool(self):
+        """多端口、多协议的服务器共用管理器的进程池，停止单个服务器不关闭它"""
+        config = Config()
+        config.set("logging.file", "")
+        config.set("process_pool.workers", 1)
+        manager = MultiPortServerManager(config)
+        manager.start_servers([_free_port(), _free_port()], "127.0.0.1",
+                              "both")
+        try:
+            servers = list(manager.servers.values())
+            self.assertEqual(len(servers), 4)
+            for server in servers:
+                self.assertIs(server.process_pool, manager.process_pool)
+                server.set_message_callback(default_process_handler,
+                                            use_process_pool=True)
+            servers[0].stop()
+            self.assertTrue(manager.process_pool.get_stats()["running"])
+        finally:
+            manager.stop_servers()
+        self.assertFalse(manager.process_pool.get_stats()["running"])
+
+
+if __name__ == "__main__":
+    unittest.main()
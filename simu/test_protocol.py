@@ -0,0 +1,186 @@
+"""测试长度头协议、上位机设备帧协议，以及设备帧配置下与上位机的交互"""
+
+import socket
+import struct
+import unittest
+
+from config import Config
+from device_protocol import ChannelState, DeviceFrameProtocol
+from protocol import (ByteStreamProtocol, FrameChunk, PacketTooLargeError,
+                      ProtocolError, create_protocol)
+from server import TCPServer
+
+# 上位机 client/protocol.py 实际发送的帧
+HEARTBEAT = bytes([0xFF, 0x01, 0xFE])
+SET_VOLTAGE_1234 = bytes([0xFF, 0x02, 0x04, 0xD2, 0xFE])
+ACK_OK = bytes([0xFF, 0x00, 0x00, 0xFE])
+
+
+def fixed_frame(voltages) -> bytes:
+    return bytes([0xFF, 0x03]) + struct.pack(f">{len(voltages)}H",
+                                             *voltages) + b"\xFE"
+
+
+class ByteStreamProtocolTest(unittest.TestCase):
+
+    def test_split_and_coalesced_packets(self):
+        protocol = ByteStreamProtocol()
+        data = protocol.pack({"a": 1}) + protocol.pack("text")
+        items = []
+        for offset in range(0, len(data), 3):
+            items.extend(protocol.feed(data[offset:offset + 3]))
+        self.assertEqual(items, [{"a": 1}, "text"])
+
+    def test_too_large_rejected_before_payload(self):
+        protocol = ByteStreamProtocol(max_packet_size=16)
+        with self.assertRaises(PacketTooLargeError):
+            protocol.feed(struct.pack("!I", 17))
+        # 缓冲区已清空，后续数据包可以继续解析
+        self.assertEqual(protocol.feed(protocol.pack("ok")), ["ok"])
+
+    def test_device_frame_is_not_length_framed(self):
+        """长度头协议把设备帧的前 4 字节当作长度，必须拒绝而不是等待 4GB 数据"""
+        with self.assertRaises(PacketTooLargeError):
+            ByteStreamProtocol().feed(SET_VOLTAGE_1234)
+
+    def test_streaming(self):
+        protocol = ByteStreamProtocol(max_packet_size=8,
+                                      stream_threshold=8,
+                                      max_stream_size=100)
+        payload = bytes(range(40))
+        data = struct.pack("!I", len(payload)) + payload
+        chunks = protocol.feed(data[:10]) + protocol.feed(data[10:])
+        self.assertTrue(all(isinstance(c, FrameChunk) for c in chunks))
+        self.assertEqual(b"".join(c.data for c in chunks), payload)
+        self.assertTrue(chunks[-1].final)
+
+    def test_datagram_length_mismatch(self):
+        protocol = ByteStreamProtocol()
+        with self.assertRaises(ProtocolError):
+            protocol.unpack_datagram(protocol.pack("abc") + b"x")
+
+
+class DeviceFrameProtocolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = DeviceFrameProtocol(channels=8)
+
+    def test_heartbeat_and_set_voltage(self):
+        items = self.protocol.feed(HEARTBEAT + SET_VOLTAGE_1234)
+        self.assertEqual(items, [{
+            "command": "heartbeat"
+        }, {
+            "command": "set_voltage",
+            "voltage": 1234
+        }])
+
+    def test_multi_voltage(self):
+        frame = bytes([0xFF, 0x02, 0x00, 0x03]) + struct.pack(
+            ">3H", 10, 20, 19999) + b"\xFE"
+        self.assertEqual(self.protocol.unpack_datagram(frame), {
+            "command": "set_multi_voltage",
+            "voltages": [10, 20, 19999]
+        })
+
+    def test_fixed_frame_split_across_reads(self):
+        frame = fixed_frame(range(100, 108))
+        self.assertEqual(self.protocol.feed(frame[:5]), [])
+        items = self.protocol.feed(frame[5:] + HEARTBEAT)
+        self.assertEqual(items[0]["voltages"], list(range(100, 108)))
+        self.assertEqual(items[1], {"command": "heartbeat"})
+        self.assertEqual(self.protocol.state.voltages.tolist(),
+                         list(range(100, 108)))
+
+    def test_delta_bitmap(self):
+        self.protocol.feed(fixed_frame([0] * 8))
+        # 通道 1 和 6 变化
+        frame = bytes([0xFF, 0x04, 0x02, 0b01000010]) + struct.pack(
+            ">2H", 500, 600) + b"\xFE"
+        item = self.protocol.unpack_datagram(frame)
+        self.assertEqual(item["encoding"], "bitmap")
+        self.assertEqual(item["voltages"], [0, 500, 0, 0, 0, 0, 600, 0])
+
+    def test_delta_runs(self):
+        self.protocol.feed(fixed_frame([1] * 8))
+        # 一个区段：从通道 2 开始的 3 个通道
+        frame = (bytes([0xFF, 0x04, 0x01]) + struct.pack(">H", 1) +
+                 struct.pack(">2H", 2, 3) + struct.pack(">3H", 7, 8, 9) +
+                 b"\xFE")
+        item = self.protocol.unpack_datagram(frame)
+        self.assertEqual(item["encoding"], "runs")
+        self.assertEqual(item["voltages"], [1, 1, 7, 8, 9, 1, 1, 1])
+
+    def test_delta_shares_state_between_decoders(self):
+        decoder = self.protocol.new_decoder()
+        decoder.feed(fixed_frame([5] * 8))
+        frame = bytes([0xFF, 0x04, 0x02, 0x80]) + struct.pack(">H",
+                                                              9) + b"\xFE"
+        item = self.protocol.new_decoder().feed(frame)[0]
+        self.assertEqual(item["voltages"], [9] + [5] * 7)
+
+    def test_invalid_bitmap_leaves_state_unchanged(self):
+        protocol = DeviceFrameProtocol(channels=4)
+        protocol.feed(fixed_frame([7] * 4))
+        # 通道 0 有效，通道 4 超出范围：整帧拒绝，通道 0 不能被改写
+        frame = bytes([0xFF, 0x04, 0x02, 0b10001000]) + struct.pack(
+            ">2H", 1, 2) + b"\xFE"
+        with self.assertRaises(ProtocolError):
+            protocol.unpack_datagram(frame)
+        self.assertEqual(protocol.state.voltages.tolist(), [7] * 4)
+
+    def test_invalid_runs_leave_state_unchanged(self):
+        self.protocol.feed(fixed_frame([7] * 8))
+        frame = (bytes([0xFF, 0x04, 0x01]) + struct.pack(">H", 2) +
+                 struct.pack(">4H", 0, 1, 7, 2) + struct.pack(">3H", 1, 2, 3)
+                 + b"\xFE")
+        with self.assertRaises(ProtocolError):
+            self.protocol.unpack_datagram(frame)
+        self.assertEqual(self.protocol.state.voltages.tolist(), [7] * 8)
+
+    def test_five_byte_frame_is_single_voltage(self):
+        """个数为 0 的多值帧与设置电压 0 字节相同，按单值帧解析"""
+        self.assertEqual(
+            self.protocol.unpack_datagram(bytes([0xFF, 0x02, 0, 0, 0xFE])),
+            {"command": "set_voltage", "voltage": 0})
+
+    def test_invalid_start_byte(self):
+        with self.assertRaises(ProtocolError):
+            self.protocol.feed(b"\x00\x01\xFE")
+        self.assertEqual(self.protocol.feed(HEARTBEAT),
+                         [{"command": "heartbeat"}])
+
+    def test_ack(self):
+        self.assertEqual(self.protocol.pack({"success": True}), ACK_OK)
+        self.assertEqual(self.protocol.pack({"success": False}),
+                         bytes([0xFF, 0x00, 0x01, 0xFE]))
+
+    def test_channel_state_len(self):
+        self.assertEqual(len(ChannelState(4)), 4)
+
+
+class FramingConfigTest(unittest.TestCase):
+    """默认长度头协议（client.py 使用），--framing device 时应答上位机的帧"""
+
+    def test_default_is_length_framing(self):
+        settings = Config().snapshot().protocol
+        self.assertEqual(settings.framing, "length")
+        self.assertIsInstance(create_protocol(settings), ByteStreamProtocol)
+
+    def test_tcp_server_acks_client_frames(self):
+        config = Config()
+        config.set("logging.file", "")
+        config.set("protocol.framing", "device")
+        server = TCPServer("127.0.0.1", 0, config)
+        server.start()
+        try:
+            port = server.server_socket.getsockname()[1]
+            with socket.create_connection(("127.0.0.1", port), 2) as sock:
+                for frame in (HEARTBEAT, SET_VOLTAGE_1234):
+                    sock.sendall(frame)
+                    self.assertEqual(sock.recv(16), ACK_OK)
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""测试分层时间轮"""
+
+import random
+import unittest
+
+from timer_wheel import HierarchicalTimerWheel
+
+
+class HierarchicalTimerWheelTest(unittest.TestCase):
+
+    def test_expires_at_deadline(self):
+        wheel = HierarchicalTimerWheel(tick=1.0)
+        wheel.schedule(5.0, "a")
+        self.assertEqual(wheel.advance(5.0), [])
+        self.assertEqual([h.item for h in wheel.advance(6.0)], ["a"])
+        self.assertEqual(wheel.count, 0)
+
+    def test_cancel(self):
+        wheel = HierarchicalTimerWheel(tick=1.0)
+        handle = wheel.schedule(3.0, "a")
+        wheel.schedule(3.0, "b")
+        wheel.cancel(handle)
+        wheel.cancel(handle)
+        self.assertEqual(wheel.count, 1)
+        self.assertEqual([h.item for h in wheel.advance(10.0)], ["b"])
+
+    def test_past_deadline_expires_on_next_tick(self):
+        wheel = HierarchicalTimerWheel(tick=1.0, now=100.0)
+        wheel.schedule(50.0, "late")
+        self.assertEqual([h.item for h in wheel.advance(101.0)], ["late"])
+
+    def test_cascade_from_higher_levels(self):
+        """跨越多层的定时器在正确的 tick 到期，不早也不晚"""
+        wheel = HierarchicalTimerWheel(tick=1.0, wheel_bits=2, levels=3)
+        deadlines = [1, 3, 4, 5, 15, 16, 17, 40, 63]
+        for deadline in deadlines:
+            wheel.schedule(deadline - 0.5, deadline)
+        for now in range(1, 70):
+            for handle in wheel.advance(float(now)):
+                self.assertEqual(handle.item, now)
+                deadlines.remove(handle.item)
+        self.assertEqual(deadlines, [])
+        self.assertEqual(wheel.count, 0)
+
+    def test_beyond_span(self):
+        """超出时间轮范围的定时器在下沉后仍按时到期"""
+        wheel = HierarchicalTimerWheel(tick=1.0, wheel_bits=2, levels=2)
+        wheel.schedule(39.5, "far")
+        self.assertEqual(wheel.advance(39.0), [])
+        self.assertEqual([h.item for h in wheel.advance(40.0)], ["far"])
+
+    def test_random_against_sorted(self):
+        rng = random.Random(7)
+        wheel = HierarchicalTimerWheel(tick=0.1, wheel_bits=3, levels=3)
+        expected = {}
+        for item in range(500):
+            deadline = rng.uniform(0, 100)
+            wheel.schedule(deadline, item)
+            expected[item] = int(deadline / 0.1) + 1
+        now = 0.0
+        while wheel.count:
+            now += rng.uniform(0.05, 3.0)
+            tick = int(now / 0.1)
+            for handle in wheel.advance(now):
+                self.assertLessEqual(expected.pop(handle.item), tick)
+            # 未到期的定时器必须还在
+            for deadline_tick in expected.values():
+                self.assertGreater(deadline_tick, tick)
+        self.assertEqual(expected, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+"""测试发送队列与发送引擎"""
+
+import socket
+import time
+import unittest
+
+from client_handler import ClientHandler
+from metrics import MetricsRegistry, ServerMetrics
+from protocol import ByteStreamProtocol
+from write_engine import OutboundQueue, WriteEngine
+
+# Linux 会把 SO_SNDBUF 翻倍并设有下限，帧必须明显大于实际缓冲区
+SMALL_SNDBUF = 4096
+LARGE_FRAME = 256 * 1024
+
+
+def small_socketpair():
+    """发送端缓冲区很小的 Unix 流套接字对"""
+    sender, receiver = socket.socketpair()
+    sender.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SMALL_SNDBUF)
+    receiver.setblocking(False)
+    return sender, receiver
+
+
+def drain(sock: socket.socket) -> bytes:
+    """读出接收端当前缓冲的全部数据"""
+    chunks = []
+    while True:
+        try:
+            chunk = sock.recv(65536)
+        except BlockingIOError:
+            break
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class _SocketPairTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sender, self.receiver = small_socketpair()
+        self.addCleanup(self.sender.close)
+        self.addCleanup(self.receiver.close)
+
+
+class OutboundQueuePushTest(_SocketPairTest):
+
+    def test_frame_limit(self):
+        queue = OutboundQueue(self.sender, max_frames=2)
+        self.assertTrue(queue.push(b"a"))
+        self.assertTrue(queue.push(b"b"))
+        self.assertFalse(queue.push(b"c"))
+        self.assertEqual(queue.depth, 2)
+        self.assertEqual(queue.stats["frames_dropped"], 1)
+
+    def test_byte_limit(self):
+        queue = OutboundQueue(self.sender, max_bytes=10)
+        self.assertTrue(queue.push(b"x" * 6))
+        self.assertFalse(queue.push(b"x" * 5))
+        self.assertTrue(queue.push(b"x" * 4))
+        self.assertEqual(queue.queued_bytes, 10)
+
+    def test_closed_queue_rejects(self):
+        metrics = ServerMetrics(MetricsRegistry(), "tcp", 0)
+        queue = OutboundQueue(self.sender, metrics=metrics)
+        queue.push(b"x" * 100)
+        queue.close()
+        self.assertFalse(queue.push(b"y"))
+        self.assertEqual(queue.queued_bytes, 0)
+        self.assertEqual(metrics.queued_bytes.value, 0)
+
+
+class OutboundQueueFlushTest(_SocketPairTest):
+
+    def test_partial_sendmsg_keeps_remainder(self):
+        """缓冲区写满时队首帧只发出一部分，剩余部分留在队首"""
+        frames = [bytes([i]) * LARGE_FRAME for i in range(3)]
+        queue = OutboundQueue(self.sender, high_watermark=10 * LARGE_FRAME)
+        for frame in frames:
+            queue.push(frame)
+
+        self.assertFalse(queue.flush())
+        self.assertLess(len(queue.frames[0]), LARGE_FRAME)
+        self.assertEqual(queue.queued_bytes,
+                         3 * LARGE_FRAME - queue.stats["bytes_sent"])
+
+        received = b""
+        for _ in range(10000):
+            received += drain(self.receiver)
+            if queue.flush():
+                break
+        received += drain(self.receiver)
+        self.assertEqual(received, b"".join(frames))
+        self.assertEqual(queue.depth, 0)
+        self.assertEqual(queue.stats["frames_sent"], 3)
+
+    def test_send_error_closes_queue(self):
+        errors = []
+        queue = OutboundQueue(self.sender, on_error=errors.append)
+        queue.push(b"x")
+        self.receiver.close()
+        self.assertTrue(queue.flush())
+        self.assertTrue(queue.closed)
+        self.assertEqual(len(errors), 1)
+
+
+class BackpressureTest(_SocketPairTest):
+    """高/低水位暂停与恢复读取"""
+
+    def setUp(self):
+        super().setUp()
+        self.metrics = ServerMetrics(MetricsRegistry(), "tcp", 0)
+        self.queue = OutboundQueue(self.sender,
+                                   metrics=self.metrics,
+                                   high_watermark=3 * LARGE_FRAME,
+                                   low_watermark=LARGE_FRAME)
+
+    def test_pause_at_high_and_resume_at_low(self):
+        self.queue.push(b"a" * LARGE_FRAME)
+        self.queue.push(b"b" * LARGE_FRAME)
+        self.assertTrue(self.queue.wait_readable(0))
+        self.queue.push(b"c" * LARGE_FRAME)
+        self.assertFalse(self.queue.wait_readable(0.01))
+        self.assertEqual(self.queue.stats["read_pauses"], 1)
+        self.assertEqual(self.metrics.read_pauses.value, 1)
+
+        # 对端读取前只能发出一部分，仍高于低水位
+        self.assertFalse(self.queue.flush())
+        self.assertGreater(self.queue.queued_bytes, LARGE_FRAME)
+        self.assertFalse(self.queue.wait_readable(0))
+
+        while self.queue.queued_bytes > LARGE_FRAME:
+            drain(self.receiver)
+            self.queue.flush()
+        self.assertTrue(self.queue.wait_readable(0))
+        # 恢复后再次超过高水位会重新暂停
+        for _ in range(3):
+            self.queue.push(b"d" * LARGE_FRAME)
+        self.assertFalse(self.queue.wait_readable(0))
+        self.assertEqual(self.queue.stats["read_pauses"], 2)
+
+    def test_depth_stats(self):
+        for _ in range(3):
+            self.queue.push(b"x" * LARGE_FRAME)
+        self.assertEqual(self.queue.depth, 3)
+        self.assertEqual(self.metrics.queued_bytes.value, 3 * LARGE_FRAME)
+        self.queue.flush()
+        sent = self.queue.stats["bytes_sent"]
+        # 队首帧只发出一部分，仍计入排队帧数
+        self.assertEqual(self.queue.depth, 3 - sent // LARGE_FRAME)
+        self.assertEqual(self.queue.queued_bytes, 3 * LARGE_FRAME - sent)
+        self.assertEqual(self.metrics.queued_bytes.value,
+                         self.queue.queued_bytes)
+        self.assertEqual(self.queue.stats["peak_queued_frames"], 3)
+        self.assertEqual(self.queue.stats["peak_queued_bytes"],
+                         3 * LARGE_FRAME)
+
+    def test_handler_stats_report_pause(self):
+        handler = ClientHandler(self.sender, ("127.0.0.1", 1),
+                                ByteStreamProtocol(),
+                                write_engine=WriteEngine(),
+                                write_high_watermark=LARGE_FRAME,
+                                write_low_watermark=LARGE_FRAME // 2)
+        self.assertTrue(handler.send_frame(b"x" * LARGE_FRAME))
+        stats = handler.get_stats()
+        self.assertTrue(stats["reading_paused"])
+        self.assertEqual(stats["queued_frames"], 1)
+        self.assertEqual(stats["queued_bytes"], LARGE_FRAME)
+        self.assertFalse(handler.outbound.wait_readable(0))
+
+
+class WriteEngineTest(_SocketPairTest):
+
+    def test_sockets_only_while_running(self):
+        engine = WriteEngine()
+        self.assertIsNone(engine.selector)
+        engine.start()
+        wakeup = engine._wakeup_r
+        engine.stop()
+        self.assertEqual(wakeup.fileno(), -1)
+        self.assertEqual(engine._wakeup_w.fileno(), -1)
+
+    def test_engine_flushes_across_writable_events(self):
+        engine = WriteEngine()
+        engine.start()
+        self.addCleanup(engine.stop)
+        queue = OutboundQueue(self.sender, high_watermark=10 * LARGE_FRAME)
+        payload = bytes(range(256)) * (LARGE_FRAME // 256)
+        self.assertTrue(engine.submit(queue, payload))
+        self.assertTrue(engine.submit(queue, b"tail"))
+
+        received = b""
+        deadline = time.monotonic() + 5
+        while len(received) < len(payload) + 4:
+            self.assertLess(time.monotonic(), deadline)
+            received += drain(self.receiver)
+            time.sleep(0.001)
+        self.assertEqual(received, payload + b"tail")
+        engine.discard(queue)
+
+
+class SlowConsumerPolicyTest(_SocketPairTest):
+
+    def handler(self, policy):
+        metrics = ServerMetrics(MetricsRegistry(), "tcp", 0)
+        # 发送引擎未启动，队列不会被刷新
+        handler = ClientHandler(self.sender, ("127.0.0.1", 1),
+                                ByteStreamProtocol(),
+                                metrics=metrics,
+                                write_engine=WriteEngine(),
+                                max_queued_frames=1,
+                                slow_consumer_policy=policy)
+        handler.running = True
+        return handler, metrics
+
+    def test_drop(self):
+        handler, metrics = self.handler("drop")
+        self.assertTrue(handler.send_frame(b"a"))
+        self.assertFalse(handler.send_frame(b"b"))
+        self.assertTrue(handler.running)
+        self.assertEqual(metrics.frames_dropped.value, 1)
+        self.assertEqual(metrics.slow_consumer_disconnects.value, 0)
+
+    def test_disconnect(self):
+        handler, metrics = self.handler("disconnect")
+        handler.send_frame(b"a")
+        self.assertFalse(handler.send_frame(b"b"))
+        self.assertFalse(handler.running)
+        self.assertEqual(metrics.slow_consumer_disconnects.value, 1)
+        # 写端已关闭，对端读到 EOF
+        self.receiver.setblocking(True)
+        self.assertEqual(self.receiver.recv(1), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
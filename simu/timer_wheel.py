@@ -0,0 +1,133 @@
+# timer_wheel.py
+from typing import Any, List, Optional, Set
+
+
+class TimerHandle:
+    """定时器句柄，用于取消定时器"""
+
+    __slots__ = ("deadline_tick", "item", "bucket")
+
+    def __init__(self, deadline_tick: int, item: Any):
+        self.deadline_tick = deadline_tick
+        self.item = item
+        self.bucket: Optional[Set["TimerHandle"]] = None
+
+
+class HierarchicalTimerWheel:
+    """
+    分层时间轮
+
+    第 0 层每个槽位代表一个 tick，第 n 层每个槽位代表 size^n 个 tick。
+    添加、取消都是 O(1)；推进时只处理到期槽位，高层槽位到点后逐级下沉。
+    本类不加锁，由调用方保证线程安全。
+    """
+
+    def __init__(self,
+                 tick: float = 1.0,
+                 wheel_bits: int = 6,
+                 levels: int = 4,
+                 now: float = 0.0):
+        """
+        初始化时间轮
+
+        Args:
+            tick: 每个 tick 的时长（秒）
+            wheel_bits: 每层槽位数的位数（槽位数 = 2^wheel_bits）
+            levels: 层数
+            now: 当前时间（秒）
+        """
+        self.tick = tick
+        self.bits = wheel_bits
+        self.size = 1 << wheel_bits
+        self.mask = self.size - 1
+        self.levels = levels
+        self.wheels: List[List[Set[TimerHandle]]] = [
+            [set() for _ in range(self.size)] for _ in range(levels)
+        ]
+        self.current_tick = int(now / tick)
+        self.max_span = (1 << (wheel_bits * levels)) - 1
+        self.count = 0
+
+    def schedule(self, deadline: float, item: Any) -> TimerHandle:
+        """
+        添加定时器
+
+        Args:
+            deadline: 到期时间（秒，与 now 同一时钟）
+            item: 到期时返回的对象
+
+        Returns:
+            TimerHandle: 定时器句柄
+        """
+        deadline_tick = max(int(deadline / self.tick) + 1,
+                            self.current_tick + 1)
+        handle = TimerHandle(deadline_tick, item)
+        self._place(handle)
+        self.count += 1
+        return handle
+
+    def cancel(self, handle: TimerHandle):
+        """取消定时器"""
+        if handle.bucket is not None:
+            handle.bucket.discard(handle)
+            handle.bucket = None
+            self.count -= 1
+
+    def advance(self, now: float) -> List[TimerHandle]:
+        """
+        推进时间轮到 now
+
+        Args:
+            now: 当前时间（秒）
+
+        Returns:
+            List[TimerHandle]: 已到期的定时器
+        """
+        target_tick = int(now / self.tick)
+        expired: List[TimerHandle] = []
+        while self.current_tick < target_tick:
+            if self.count == 0:
+                self.current_tick = target_tick
+                break
+            self.current_tick += 1
+            self._cascade()
+            slot = self.current_tick & self.mask
+            bucket = self.wheels[0][slot]
+            if not bucket:
+                continue
+            self.wheels[0][slot] = set()
+            for handle in bucket:
+                if handle.deadline_tick <= self.current_tick:
+                    handle.bucket = None
+                    self.count -= 1
+                    expired.append(handle)
+                else:
+                    self._place(handle)
+        return expired
+
+    def _cascade(self):
+        """当低层转完一圈时，把高层对应槽位的定时器下沉"""
+        for level in range(1, self.levels):
+            if self.current_tick & ((1 << (self.bits * level)) - 1):
+                break
+            slot = (self.current_tick >> (self.bits * level)) & self.mask
+            bucket = self.wheels[level][slot]
+            if not bucket:
+                continue
+            self.wheels[level][slot] = set()
+            for handle in bucket:
+                self._place(handle)
+
+    def _place(self, handle: TimerHandle):
+        """按剩余 tick 数把定时器放入对应层的槽位"""
+        delta = handle.deadline_tick - self.current_tick
+        # 超出时间轮范围的先放在最远处，下沉时再重新定位
+        target = self.current_tick + min(max(delta, 0), self.max_span)
+        level = 0
+        while level < self.levels - 1 and (target - self.current_tick) >= (
+                1 << (self.bits * (level + 1))):
+            level += 1
+        slot = (target >> (self.bits * level)) & self.mask
+        bucket = self.wheels[level][slot]
+        bucket.add(handle)
+        handle.bucket = bucket
@@ -1,21 +1,35 @@
 # udp_server.py
+import functools
+import ipaddress
 import socket
 import threading
 import time
-from typing import Any, Callable, Dict, Optional
-
-from config import Config
-from protocol import ByteStreamProtocol
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from capture import DIR_IN, DIR_OUT, CaptureWriter, open_capture
+from config import Config, ConfigSnapshot
+from dispatcher import Dispatcher
+from impairment import Impairment
+from metrics import MetricsRegistry, ServerMetrics, default_registry
+from process_pool import ProcessHandlerPool
+from protocol import ProtocolError, create_protocol
 from utils.logger import setup_logger
 
 
 class UDPServer:
     """UDP 服务器"""
 
+    # 协议名称，用于指标标签、抓包和日志
+    PROTOCOL = "udp"
+    # 是否按 multicast 配置段加入组播组（Unix 数据报服务器不支持）
+    MULTICAST = True
+
     def __init__(self,
                  host: str = "0.0.0.0",
                  port: int = 8888,
-                 config: Config = None):
+                 config: Config = None,
+                 metrics: MetricsRegistry = None,
+                 process_pool: ProcessHandlerPool = None):
         """
         初始化 UDP 服务器
 
@@ -23,6 +37,8 @@ class UDPServer:
             host: 监听地址
             port: 监听端口
             config: 配置对象
+            metrics: 指标注册表，默认使用全局注册表
+            process_pool: 共享的进程池，默认为本服务器单独创建（由本服务器关闭）
         """
         self.host = host
         self.port = port
@@ -32,11 +48,14 @@ class UDPServer:
         self.running = False
         self.server_socket: Optional[socket.socket] = None
         self.server_thread: Optional[threading.Thread] = None
+        # 组播/广播接收套接字，应答仍从 server_socket 发出，上位机按来源端口区分设备
+        self.multicast_socket: Optional[socket.socket] = None
+        self.multicast_thread: Optional[threading.Thread] = None
 
         # 协议处理器
-        self.protocol = ByteStreamProtocol(
-            header_size=self.config.get("protocol.header_size", 4),
-            encoding=self.config.get("protocol.encoding", "utf-8"))
+        settings = self.config.snapshot()
+        self.protocol = create_protocol(settings.protocol)
+        self.recv_size = self._recv_size()
 
         # 消息处理回调
         self.message_callback: Optional[Callable] = None
@@ -48,17 +67,136 @@ class UDPServer:
             "bytes_received": 0,
             "bytes_sent": 0
         }
+        self.metrics = ServerMetrics(metrics or default_registry, self.PROTOCOL,
+                                     port)
+
+        # 消息分发：处理回调在工作线程执行，不阻塞接收线程
+        self.dispatcher = Dispatcher(workers=settings.dispatch.workers,
+                                     queue_size=settings.dispatch.queue_size,
+                                     metrics=self.metrics,
+                                     name=f"udp_dispatcher_{port}")
+
+        # 可选的进程池处理模式（首次使用时启动），多端口时由管理器共享一个进程池
+        self.owns_process_pool = process_pool is None
+        self.process_pool = process_pool or ProcessHandlerPool(
+            workers=settings.process_pool.workers,
+            shm_threshold=settings.process_pool.shm_threshold,
+            start_method=settings.process_pool.start_method,
+            name=f"udp_process_pool_{port}")
+
+        # 抓包（capture.path 非空时随服务器启动），每个对端地址一个会话
+        self.capture: Optional[CaptureWriter] = None
+        self.capture_sessions: Dict[tuple, int] = {}
+        self.capture_lock = threading.Lock()
+
+        # 链路损伤模拟（impairment.profile / impairment.peers）
+        self.impairment: Optional[Impairment] = None
+        self._apply_impairment(settings.impairment.profile,
+                               settings.impairment.peers)
+
+        # 配置热更新订阅
+        self._unsubscribe_config: Optional[Callable[[], None]] = None
 
         # 日志记录器
         self.logger = setup_logger(name=f"udp_server_{port}",
-                                   level=self.config.get(
-                                       "logging.level", "INFO"),
-                                   log_file=self.config.get("logging.file"))
+                                   level=settings.logging.level,
+                                   log_file=settings.logging.file)
+
+    def _recv_size(self) -> int:
+        """单个数据报最大 65535 字节，多读 1 字节用于识别超长数据报"""
+        return min(
+            self.protocol.header_size + self.protocol.max_packet_size + 1,
+            65536)
+
+    def _apply_impairment(self, profile: str, peers: Mapping[str, str]):
+        """按配置创建或更新链路损伤层，参数全为空时关闭"""
+        if not profile and not peers:
+            if self.impairment:
+                self.impairment.stop()
+                self.impairment = None
+            return
+        if self.impairment:
+            self.impairment.update(profile, peers)
+            return
+        impairment = Impairment(profile, peers,
+                                name=f"udp_impairment_{self.port}")
+        if self.running:
+            impairment.start()
+        self.impairment = impairment
 
-    def set_message_callback(self, callback: Callable[[Any, tuple], Any]):
-        """设置消息处理回调函数"""
+    def _on_config_change(self, old: ConfigSnapshot, new: ConfigSnapshot):
+        """配置热更新：日志级别、链路损伤和各项限制立即生效"""
+        self.logger.setLevel(new.logging.level.upper())
+        if old.impairment != new.impairment:
+            try:
+                self._apply_impairment(new.impairment.profile,
+                                       new.impairment.peers)
+            except ValueError as e:
+                self.logger.error(f"链路损伤参数无效，保持原设置: {e}")
+        self.protocol.max_packet_size = new.protocol.max_packet_size
+        self.recv_size = self._recv_size()
+        self.dispatcher.queue_size = new.dispatch.queue_size
+        if (old.protocol.header_size != new.protocol.header_size
+                or old.protocol.encoding != new.protocol.encoding
+                or old.protocol.framing != new.protocol.framing
+                or old.protocol.channels != new.protocol.channels
+                or old.dispatch.workers != new.dispatch.workers):
+            self.logger.warning("协议头部、编码、帧格式、通道数和工作线程数的修改需重启服务器生效")
+        if self.MULTICAST and old.multicast != new.multicast:
+            self.logger.warning("组播配置的修改需重启服务器生效")
+        self.logger.info(f"已应用配置版本 {new.version}")
+
+    def set_message_callback(self,
+                             callback: Callable[[Any, tuple], Any],
+                             use_process_pool: bool = False):
+        """
+        设置消息处理回调函数
+
+        Args:
+            callback: 回调函数，接收(消息数据, 客户端地址)返回响应数据
+            use_process_pool: 是否在子进程中执行回调
+        """
+        if use_process_pool:
+            self.process_pool.start()
+            callback = self.process_pool.bind(callback)
         self.message_callback = callback
 
+    def start_capture(self, path: str):
+        """
+        开始抓包，之后收发的数据报都记录到文件
+
+        Args:
+            path: 抓包文件路径，可包含 {protocol} 和 {port} 占位符
+        """
+        self.stop_capture()
+        path = path.format(protocol=self.PROTOCOL, port=self.port)
+        self.capture = open_capture(path)
+        self.logger.info(f"开始抓包: {path}")
+
+    def stop_capture(self):
+        """停止抓包并关闭文件"""
+        capture, self.capture = self.capture, None
+        with self.capture_lock:
+            self.capture_sessions.clear()
+        if capture:
+            capture.close()
+            self.logger.info(f"抓包已保存: {capture.path} "
+                             f"({capture.stats['records']} 条记录)")
+
+    def _capture(self, client_address: tuple, direction: int, data: bytes):
+        """记录一个数据报，对端首次出现时开始新会话"""
+        capture = self.capture
+        if not capture:
+            return
+        with self.capture_lock:
+            session = self.capture_sessions.get(client_address)
+            if session is None:
+                session = capture.open_session(self.PROTOCOL,
+                                               client_address,
+                                               server_address=self.port)
+                self.capture_sessions[client_address] = session
+        capture.record(session, direction, data)
+
     def start(self):
         """启动服务器"""
         if self.running:
@@ -66,14 +204,8 @@ class UDPServer:
             return
 
         try:
-            # 创建 UDP socket
-            self.server_socket = socket.socket(socket.AF_INET,
-                                               socket.SOCK_DGRAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET,
-                                          socket.SO_REUSEADDR, 1)
-
-            # 绑定地址和端口
-            self.server_socket.bind((self.host, self.port))
+            # 创建并绑定服务器套接字
+            self.server_socket = self._create_server_socket()
 
             # 设置超时避免阻塞
             self.server_socket.settimeout(1.0)
@@ -81,34 +213,113 @@ class UDPServer:
             # 设置服务器为运行状态
             self.running = True
             self.stats["start_time"] = time.time()
+            self.dispatcher.start()
+            if self.impairment:
+                self.impairment.start()
+            self._unsubscribe_config = self.config.subscribe(
+                self._on_config_change)
+            capture_path = self.config.snapshot().capture.path
+            if capture_path:
+                self.start_capture(capture_path)
 
             # 启动服务器线程
             self.server_thread = threading.Thread(target=self._run_server,
                                                   daemon=True)
             self.server_thread.start()
 
-            self.logger.info(f"UDP 服务器已启动，监听 {self.host}:{self.port}")
+            multicast = self.config.snapshot().multicast
+            if self.MULTICAST and multicast.group:
+                self._start_multicast(multicast.group, multicast.port,
+                                      multicast.interface)
+
+            self.logger.info(
+                f"{self.PROTOCOL.upper()} 服务器已启动，监听 {self.listen_address}")
 
         except Exception as e:
             self.logger.error(f"启动服务器失败: {e}")
             self.running = False
             raise
 
-    def _run_server(self):
-        """运行服务器主循环"""
-        self.logger.info("UDP 服务器主循环已启动")
+    def _create_server_socket(self) -> socket.socket:
+        """创建并绑定服务器套接字（子类可替换地址族）"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((self.host, self.port))
+        return server_socket
+
+    def _start_multicast(self, group: str, port: int, interface: str):
+        """加入组播组并启动接收线程，失败时只记录错误，单播照常工作"""
+        try:
+            self.multicast_socket = self._create_multicast_socket(
+                group, port, interface)
+        except OSError as e:
+            self.logger.error(f"加入组播组 {group}:{port} 失败: {e}")
+            return
+        self.multicast_socket.settimeout(1.0)
+        self.multicast_thread = threading.Thread(
+            target=self._run_server,
+            args=(self.multicast_socket, ),
+            daemon=True)
+        self.multicast_thread.start()
+        self.logger.info(f"已加入组播组 {group}:{port}")
+
+    def _create_multicast_socket(self, group: str, port: int,
+                                 interface: str) -> socket.socket:
+        """
+        创建组播接收套接字
+
+        多个仿真设备共用组播端口，需要 SO_REUSEPORT；group 为广播地址时只绑定端口，
+        不加入组播组。
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        try:
+            sock.bind(("", port))
+            if ipaddress.IPv4Address(group).is_multicast:
+                membership = socket.inet_aton(group) + socket.inet_aton(
+                    interface)
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                membership)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @property
+    def listen_address(self) -> str:
+        """监听地址描述"""
+        return f"{self.host}:{self.port}"
+
+    def _run_server(self, sock: Optional[socket.socket] = None):
+        """
+        运行服务器主循环
+
+        Args:
+            sock: 接收套接字，默认 server_socket（组播套接字共用同一处理流程）
+        """
+        sock = sock or self.server_socket
+        self.logger.info(f"{self.PROTOCOL.upper()} 服务器主循环已启动")
 
         while self.running:
             try:
                 # 接收数据包
-                data, client_address = self.server_socket.recvfrom(4096)
+                data, client_address = sock.recvfrom(self.recv_size)
 
                 # 更新统计信息
                 self.stats["total_packets"] += 1
                 self.stats["bytes_received"] += len(data)
+                self.metrics.bytes_received.inc(len(data))
+                self.metrics.messages_received.inc()
+                self._capture(client_address, DIR_IN, data)
 
-                # 处理数据包
-                self._process_packet(data, client_address)
+                # 处理数据包（启用链路损伤时可能被丢弃、延迟或重复）
+                if self.impairment:
+                    self.impairment.inbound(client_address, data,
+                                            self._process_packet)
+                else:
+                    self._process_packet(data, client_address)
 
             except socket.timeout:
                 # 超时继续循环
@@ -122,26 +333,47 @@ class UDPServer:
                 if self.running:
                     time.sleep(0.1)
 
-        self.logger.info("UDP 服务器主循环已退出")
+        self.logger.info(f"{self.PROTOCOL.upper()} 服务器主循环已退出")
 
     def _process_packet(self, data: bytes, client_address: tuple):
         """
-        处理接收到的数据包
+        解析接收到的数据包并交给分发器处理
 
         Args:
             data: 数据包内容
             client_address: 客户端地址 (ip, port)
         """
+        # 解析数据包（每个数据报独立解析，不共用流缓冲区）
         try:
-            # 解析数据包
-            result = self.protocol.unpack(data)
+            message = self.protocol.unpack_datagram(data)
+        except ProtocolError as e:
+            self.logger.warning(f"数据包格式错误，来自 {client_address}: {e}")
+            self.metrics.errors.inc()
+            self._send_response(
+                self.protocol.create_response(success=False,
+                                              message=f"协议错误: {e}"),
+                client_address)
+            return
 
-            if result is None:
-                self.logger.warning(f"数据包格式错误，来自 {client_address}")
-                return
+        # 同一对端的消息落到同一工作线程，保证处理顺序
+        task = functools.partial(self._handle_message, message,
+                                 client_address)
+        if not self.dispatcher.submit(client_address, task):
+            self._send_response(
+                self.protocol.create_response(success=False,
+                                              message="服务器繁忙，消息已丢弃"),
+                client_address)
 
-            message, _ = result
+    def _handle_message(self, message: Any, client_address: tuple):
+        """
+        调用消息处理回调并发送响应（在分发器工作线程中执行）
 
+        Args:
+            message: 解析后的消息
+            client_address: 客户端地址 (ip, port)
+        """
+        started = time.perf_counter()
+        try:
             # 调用消息处理回调
             if self.message_callback:
                 response = self.message_callback(message, client_address)
@@ -150,10 +382,12 @@ class UDPServer:
                     message, client_address)
 
             # 发送响应
-            self._send_response(response, client_address)
+            if response is not None:
+                self._send_response(response, client_address)
 
         except Exception as e:
             self.logger.error(f"处理数据包时出错: {e}")
+            self.metrics.errors.inc()
             # 尝试发送错误响应
             try:
                 error_response = self.protocol.create_response(
@@ -161,6 +395,8 @@ class UDPServer:
                 self._send_response(error_response, client_address)
             except:
                 pass
+        finally:
+            self.metrics.handle_seconds.observe(time.perf_counter() - started)
 
     def _default_message_handler(self, message: Any,
                                  client_address: tuple) -> Dict:
@@ -183,7 +419,8 @@ class UDPServer:
                                                  "server_timestamp":
                                                  time.time(),
                                                  "server_port": self.port,
-                                                 "protocol": "UDP"
+                                                 "protocol":
+                                                 self.PROTOCOL.upper()
                                              })
 
     def _send_response(self, response: Any, client_address: tuple):
@@ -196,23 +433,49 @@ class UDPServer:
         """
         try:
             packed_data = self.protocol.pack(response)
+        except Exception as e:
+            self.logger.error(f"打包响应失败: {e}")
+            self.metrics.errors.inc()
+            return
+        if self.impairment:
+            self.impairment.outbound(client_address, packed_data,
+                                     self._sendto)
+        else:
+            self._sendto(packed_data, client_address)
+
+    def _sendto(self, packed_data: bytes, client_address: tuple):
+        """
+        发送已编码的数据报
+
+        Args:
+            packed_data: 已编码的数据报
+            client_address: 客户端地址
+        """
+        try:
             self.server_socket.sendto(packed_data, client_address)
+            self._capture(client_address, DIR_OUT, packed_data)
 
             # 更新统计信息
             self.stats["bytes_sent"] += len(packed_data)
+            self.metrics.bytes_sent.inc(len(packed_data))
+            self.metrics.messages_sent.inc()
 
             self.logger.debug(f"发送响应到 {client_address}")
 
         except Exception as e:
             self.logger.error(f"发送响应失败: {e}")
+            self.metrics.errors.inc()
 
     def stop(self):
         """停止服务器"""
         if not self.running:
             return
 
-        self.logger.info("正在停止 UDP 服务器...")
+        self.logger.info(f"正在停止 {self.PROTOCOL.upper()} 服务器...")
         self.running = False
+        if self._unsubscribe_config:
+            self._unsubscribe_config()
+            self._unsubscribe_config = None
 
         # 关闭服务器套接字
         if self.server_socket:
@@ -220,20 +483,38 @@ class UDPServer:
                 self.server_socket.close()
             except:
                 pass
+        if self.multicast_socket:
+            try:
+                self.multicast_socket.close()
+            except OSError:
+                pass
+            self.multicast_socket = None
 
         # 等待服务器线程结束
         if self.server_thread and self.server_thread.is_alive():
             self.server_thread.join(timeout=5)
-
-        self.logger.info("UDP 服务器已停止")
-
-    def get_server_stats(self) -> Dict:
-        """获取服务器统计信息"""
+        if self.multicast_thread and self.multicast_thread.is_alive():
+            self.multicast_thread.join(timeout=5)
+        self.dispatcher.stop()
+        if self.owns_process_pool:
+            self.process_pool.stop()
+        if self.impairment:
+            self.impairment.stop()
+        self.stop_capture()
+
+        self.logger.info(f"{self.PROTOCOL.upper()} 服务器已停止")
+
+    def get_server_stats(self, include_clients: bool = True) -> Dict:
+        """获取服务器统计信息（UDP 无连接表，include_clients 仅为接口一致）"""
         stats = self.stats.copy()
         stats["uptime"] = time.time(
         ) - stats["start_time"] if self.running else 0
         stats["running"] = self.running
-        stats["protocol"] = "UDP"
+        stats["protocol"] = self.PROTOCOL.upper()
         stats["host"] = self.host
         stats["port"] = self.port
+        stats["dispatch"] = self.dispatcher.get_stats()
+        if self.impairment:
+            stats["impairment"] = self.impairment.get_stats()
+        stats["process_pool"] = self.process_pool.get_stats()
         return stats
@@ -0,0 +1,168 @@
+# unix_server.py
+import itertools
+import os
+import socket
+from typing import Any
+
+from config import Config
+from metrics import MetricsRegistry
+from process_pool import ProcessHandlerPool
+from server import TCPServer
+from udp_server import UDPServer
+
+
+def socket_path(directory: str, port: int, datagram: bool = False) -> str:
+    """
+    按端口号生成 Unix 套接字路径，客户端使用相同的规则定位服务器
+
+    Args:
+        directory: 套接字所在目录
+        port: 端口号（仅用于区分多个服务器）
+        datagram: 是否为数据报套接字
+
+    Returns:
+        str: 套接字路径，如 /tmp/simu_9999.sock、/tmp/simu_9999.dgram.sock
+    """
+    suffix = ".dgram.sock" if datagram else ".sock"
+    return os.path.join(directory, f"simu_{port}{suffix}")
+
+
+def _bind_unix(sock: socket.socket, path: str):
+    """绑定 Unix 套接字路径，清理上次异常退出遗留的套接字文件"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    sock.bind(path)
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class UnixStreamServer(TCPServer):
+    """
+    Unix 流套接字服务器
+
+    同一主机上的客户端绕过 TCP/IP 协议栈，帧格式、分发、抓包等与 TCP 服务器完全相同。
+    """
+
+    PROTOCOL = "unix"
+
+    def __init__(self,
+                 path: str,
+                 port: int = 8888,
+                 config: Config = None,
+                 metrics: MetricsRegistry = None,
+                 process_pool: ProcessHandlerPool = None):
+        """
+        初始化 Unix 流套接字服务器
+
+        Args:
+            path: 套接字路径
+            port: 端口号（用于日志、指标和抓包文件名）
+            config: 配置对象
+            metrics: 指标注册表，默认使用全局注册表
+            process_pool: 共享的进程池，默认单独创建
+        """
+        super().__init__(host=path,
+                         port=port,
+                         config=config,
+                         metrics=metrics,
+                         process_pool=process_pool)
+        self.path = path
+        # Unix 套接字的对端通常没有地址，用连接序号区分客户端
+        self._connection_ids = itertools.count(1)
+
+    def _create_server_socket(self) -> socket.socket:
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            _bind_unix(server_socket, self.path)
+            server_socket.listen(self.config.snapshot().server.max_connections)
+        except OSError:
+            server_socket.close()
+            raise
+        return server_socket
+
+    @property
+    def listen_address(self) -> str:
+        return self.path
+
+    def _client_address(self, address: Any) -> tuple:
+        return (address or self.path, next(self._connection_ids))
+
+    def stop(self):
+        running = self.running
+        super().stop()
+        if running:
+            _unlink(self.path)
+
+
+class UnixDatagramServer(UDPServer):
+    """
+    Unix 数据报套接字服务器
+
+    客户端必须绑定自己的套接字路径，服务器按该路径回复响应。
+    """
+
+    PROTOCOL = "unix_dgram"
+    MULTICAST = False
+
+    def __init__(self,
+                 path: str,
+                 port: int = 8888,
+                 config: Config = None,
+                 metrics: MetricsRegistry = None,
+                 process_pool: ProcessHandlerPool = None):
+        """
+        初始化 Unix 数据报套接字服务器
+
+        Args:
+            path: 套接字路径
+            port: 端口号（用于日志、指标和抓包文件名）
+            config: 配置对象
+            metrics: 指标注册表，默认使用全局注册表
+            process_pool: 共享的进程池，默认单独创建
+        """
+        super().__init__(host=path,
+                         port=port,
+                         config=config,
+                         metrics=metrics,
+                         process_pool=process_pool)
+        self.path = path
+
+    def _recv_size(self) -> int:
+        # Unix 数据报不受 IP 报文 64KB 的限制
+        return self.protocol.header_size + self.protocol.max_packet_size + 1
+
+    def _create_server_socket(self) -> socket.socket:
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            _bind_unix(server_socket, self.path)
+        except OSError:
+            server_socket.close()
+            raise
+        return server_socket
+
+    @property
+    def listen_address(self) -> str:
+        return self.path
+
+    def _sendto(self, packed_data: bytes, client_address: Any):
+        if not client_address:
+            # 未绑定路径的客户端无法接收响应
+            self.logger.debug("客户端未绑定套接字路径，丢弃响应")
+            return
+        super()._sendto(packed_data, client_address)
+
+    def stop(self):
+        running = self.running
+        super().stop()
+        if running:
+            _unlink(self.path)
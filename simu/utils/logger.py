@@ -1,5 +1,6 @@
 # utils/logger.py
 import logging
+import os
 import sys
 from datetime import datetime
 from typing import Optional
@@ -51,6 +52,9 @@ def setup_logger(name: str = "tcp_server",
     
     # 文件处理器（如果指定了文件）
     if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
         file_formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
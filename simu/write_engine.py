@@ -0,0 +1,329 @@
+# write_engine.py
+import itertools
+import selectors
+import socket
+import threading
+from collections import deque
+from typing import Callable, Deque, Optional, Set
+
+from metrics import ServerMetrics
+from utils.logger import setup_logger
+
+# 非阻塞发送标志：接收线程仍以阻塞模式 recv，发送侧按次使用 MSG_DONTWAIT
+_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+
+
+class OutboundQueue:
+    """
+    单个连接的有界发送队列
+
+    排队字节数超过高水位时暂停读取该连接（对端因此感受到 TCP 背压），
+    回落到低水位以下时恢复读取。
+    """
+
+    def __init__(self,
+                 sock: socket.socket,
+                 max_frames: int = 1024,
+                 metrics: Optional[ServerMetrics] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 max_bytes: int = 4 * 1024 * 1024,
+                 high_watermark: int = 256 * 1024,
+                 low_watermark: int = 64 * 1024):
+        """
+        初始化发送队列
+
+        Args:
+            sock: 连接套接字
+            max_frames: 队列最多缓存的帧数
+            metrics: 所属服务器的聚合指标
+            on_error: 发送失败时的回调
+            max_bytes: 队列最多缓存的字节数
+            high_watermark: 暂停读取的排队字节数
+            low_watermark: 恢复读取的排队字节数
+        """
+        self.sock = sock
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.high_watermark = high_watermark
+        self.low_watermark = min(low_watermark, high_watermark)
+        self.metrics = metrics
+        self.on_error = on_error
+        self.frames: Deque[memoryview] = deque()
+        self.queued_bytes = 0
+        self.lock = threading.Lock()
+        self.closed = False
+        # 置位表示可以继续读取对端数据
+        self.readable = threading.Event()
+        self.readable.set()
+        self.stats = {
+            "frames_sent": 0,
+            "bytes_sent": 0,
+            "frames_dropped": 0,
+            "sendmsg_calls": 0,
+            "peak_queued_frames": 0,
+            "peak_queued_bytes": 0,
+            "read_pauses": 0,
+        }
+
+    def push(self, frame: bytes) -> bool:
+        """
+        追加一帧（不阻塞）
+
+        Args:
+            frame: 已编码的帧，广播时多个队列共享同一个对象
+
+        Returns:
+            bool: 队列已满或已关闭时返回 False
+        """
+        size = len(frame)
+        with self.lock:
+            if (self.closed or len(self.frames) >= self.max_frames
+                    or self.queued_bytes + size > self.max_bytes):
+                self.stats["frames_dropped"] += 1
+                return False
+            self.frames.append(memoryview(frame))
+            self.queued_bytes += size
+            if len(self.frames) > self.stats["peak_queued_frames"]:
+                self.stats["peak_queued_frames"] = len(self.frames)
+            if self.queued_bytes > self.stats["peak_queued_bytes"]:
+                self.stats["peak_queued_bytes"] = self.queued_bytes
+            if (self.readable.is_set()
+                    and self.queued_bytes >= self.high_watermark):
+                self.readable.clear()
+                self.stats["read_pauses"] += 1
+                if self.metrics:
+                    self.metrics.read_pauses.inc()
+        if self.metrics:
+            self.metrics.queued_bytes.inc(size)
+        return True
+
+    @property
+    def depth(self) -> int:
+        """当前排队帧数"""
+        return len(self.frames)
+
+    def wait_readable(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待排队数据回落到低水位以下
+
+        Returns:
+            bool: 是否可以继续读取
+        """
+        return self.readable.wait(timeout)
+
+    def close(self):
+        """关闭队列，丢弃未发送的数据"""
+        with self.lock:
+            self.closed = True
+            self.frames.clear()
+            dropped = self.queued_bytes
+            self.queued_bytes = 0
+        if self.metrics and dropped:
+            self.metrics.queued_bytes.dec(dropped)
+        self.readable.set()
+
+    def flush(self, max_iov: int = 64) -> bool:
+        """
+        尽可能多地发送排队数据（只由发送引擎线程调用）
+
+        每次用 sendmsg 把队首的多帧一次性交给内核（分散/聚集写）。
+
+        Args:
+            max_iov: 单次 sendmsg 最多携带的帧数
+
+        Returns:
+            bool: 队列已清空返回 True，套接字缓冲区已满返回 False
+        """
+        while True:
+            with self.lock:
+                if self.closed or not self.frames:
+                    return True
+                views = list(itertools.islice(self.frames, max_iov))
+            try:
+                if _HAS_SENDMSG:
+                    sent = self.sock.sendmsg(views, [], _DONTWAIT)
+                    self.stats["sendmsg_calls"] += 1
+                else:
+                    sent = self.sock.send(views[0], _DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return False
+            except OSError as e:
+                self.close()
+                if self.on_error:
+                    self.on_error(e)
+                return True
+
+            self.stats["bytes_sent"] += sent
+            if self.metrics:
+                self.metrics.bytes_sent.inc(sent)
+                self.metrics.queued_bytes.dec(sent)
+            with self.lock:
+                if self.closed:
+                    return True
+                self.queued_bytes -= sent
+                remaining = sent
+                while remaining and self.frames:
+                    head = self.frames[0]
+                    if remaining < len(head):
+                        self.frames[0] = head[remaining:]
+                        break
+                    remaining -= len(head)
+                    self.frames.popleft()
+                    self.stats["frames_sent"] += 1
+                if (not self.readable.is_set()
+                        and self.queued_bytes <= self.low_watermark):
+                    self.readable.set()
+
+
+class WriteEngine:
+    """
+    发送引擎
+
+    所有连接共享一个发送线程：有数据的队列被标记为就绪，由发送线程
+    非阻塞地写出；写不完的队列注册到 selector 等待可写事件。
+    """
+
+    def __init__(self, name: str = "write_engine"):
+        # selector 与唤醒套接字在 start() 中创建、stop() 中关闭，
+        # 未启动的服务器不占用文件描述符
+        self.selector: Optional[selectors.BaseSelector] = None
+        self.ready: Set[OutboundQueue] = set()
+        self.waiting: Set[OutboundQueue] = set()
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self._wakeup_r: Optional[socket.socket] = None
+        self._wakeup_w: Optional[socket.socket] = None
+        self.logger = setup_logger(name)
+
+    def start(self):
+        """启动发送线程"""
+        if self.running:
+            return
+        self.selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止发送线程并释放 selector 与唤醒套接字"""
+        if not self.running:
+            return
+        self.running = False
+        self._wakeup()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+        self.selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+    def submit(self, queue: OutboundQueue, frame: bytes) -> bool:
+        """
+        向连接队列追加一帧并通知发送线程
+
+        Returns:
+            bool: 是否入队成功
+        """
+        if not queue.push(frame):
+            return False
+        with self.lock:
+            if queue in self.ready or queue in self.waiting:
+                return True
+            self.ready.add(queue)
+        self._wakeup()
+        return True
+
+    def discard(self, queue: OutboundQueue):
+        """连接关闭时移除队列"""
+        queue.close()
+        with self.lock:
+            self.ready.discard(queue)
+            watched = queue in self.waiting
+        # 必须在套接字关闭前注销，否则复用同一 fd 的新连接无法注册
+        if watched:
+            self._unwatch(queue)
+
+    def _wakeup(self):
+        if self._wakeup_w is None:
+            return
+        try:
+            self._wakeup_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        """发送主循环"""
+        while self.running:
+            try:
+                events = self.selector.select(timeout=1.0)
+            except OSError:
+                continue
+
+            writable = []
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        while self._wakeup_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                else:
+                    writable.append(key.data)
+
+            with self.lock:
+                ready = self.ready
+                self.ready = set()
+
+            for queue in writable:
+                self._unwatch(queue)
+                ready.add(queue)
+
+            for queue in ready:
+                try:
+                    drained = queue.flush()
+                except Exception as e:
+                    self.logger.error(f"发送队列刷新出错: {e}")
+                    drained = True
+                if drained:
+                    # 刷新期间可能有新帧入队但未被标记就绪
+                    if queue.depth and not queue.closed:
+                        with self.lock:
+                            self.ready.add(queue)
+                    continue
+                self._watch(queue)
+
+            with self.lock:
+                has_ready = bool(self.ready)
+            if has_ready:
+                self._wakeup()
+
+        for queue in list(self.waiting):
+            self._unwatch(queue)
+
+    def _watch(self, queue: OutboundQueue):
+        """等待套接字可写"""
+        try:
+            self.selector.register(queue.sock, selectors.EVENT_WRITE, queue)
+        except KeyError:
+            # 已在等待可写
+            return
+        except (ValueError, OSError):
+            # 套接字已关闭
+            queue.close()
+            return
+        with self.lock:
+            self.waiting.add(queue)
+
+    def _unwatch(self, queue: OutboundQueue):
+        try:
+            self.selector.unregister(queue.sock)
+        except (AttributeError, KeyError, ValueError, OSError):
+            # 引擎未启动或已停止
+            pass
+        with self.lock:
+            self.waiting.discard(queue)